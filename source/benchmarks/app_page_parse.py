@@ -0,0 +1,55 @@
+"""Items/s of GamesFull.parse extraction, compiled field table vs BeautifulSoup.
+
+Every page is parsed with both implementations and their items are compared
+before timing. Saved app pages can be given as arguments, otherwise synthetic
+pages (benchmarks.pages.app_page) are used.
+
+Usage (from the source folder):
+    python -m benchmarks.app_page_parse [saved_page.html ...] [--pages 50]
+"""
+import argparse
+import time
+
+from benchmarks import legacy
+from benchmarks.pages import app_page
+from games_scraper.extractors import parse_html
+from games_scraper.spiders.games_full import APP_PAGE_FIELDS
+
+
+def compiled(body:str) -> dict:
+    return APP_PAGE_FIELDS.extract(parse_html(body))
+
+
+def items_per_second(parse, pages:list, rounds:int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for body in pages:
+            parse(body)
+    return len(pages) * rounds / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="Saved app pages")
+    parser.add_argument("--pages", type=int, default=50, help="Synthetic pages if no files are given")
+    parser.add_argument("--padding-kb", type=int, default=300, help="Size of the synthetic pages filler")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.files:
+        pages = []
+        for path in args.files:
+            with open(path, encoding="utf-8") as page_file:
+                pages.append(page_file.read())
+    else:
+        pages = [app_page(1000 + i, padding_kb=args.padding_kb) for i in range(args.pages)]
+
+    for body in pages:
+        assert compiled(body) == legacy.parse_app_page(body), "Items differ"
+
+    size = sum(len(body) for body in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size:.0f} KiB/page")
+    baseline = items_per_second(legacy.parse_app_page, pages, args.rounds)
+    print(f"bs4       {baseline:8.1f} items/s")
+    result = items_per_second(compiled, pages, args.rounds)
+    print(f"compiled  {result:8.1f} items/s  (x{result / baseline:.1f})")
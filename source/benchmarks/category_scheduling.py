@@ -0,0 +1,145 @@
+"""GamesReduced category scheduling: every page of a category requested upfront,
+category after category, vs the round-robin scheduler following categories
+page by page.
+
+A local MockStore serves the JSON listings of --categories categories of
+different sizes whose games overlap (so some pages only have games found in
+other categories). Every crawl asks for --pages pages of each category, more
+than most of them have. Wasted requests are listings past the end of a
+category, t90 is the time to find 90% of the games. Every crawl runs in a
+separate process.
+
+Usage (from the source folder):
+    python -m benchmarks.category_scheduling [--categories 8] [--pages 30]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+
+
+def sequential_spider():
+    from games_scraper.spiders.games_reduced import GamesReduced
+
+    class SequentialGamesReduced(GamesReduced):
+        """start_requests before the round-robin scheduler"""
+
+        def start_requests(self):
+            self.in_flight = {}
+            self.last_page = {}
+            self.new_games_rate = {}
+            for cat in self.cat_dict:
+                for page in range(self.state.get(cat, 0) + 1, self.n_pages_per_cat + 1):
+                    if self.state.get(cat, 0) < 0:
+                        break
+                    self.journal.set(cat, page)
+                    yield self.page_request(cat, page)
+
+        def follow_category(self, cat):
+            return iter(())
+
+        def category_end(self, cat, page=None, wasted=False):
+            # The end was only found with a page past it.
+            if wasted:
+                super().category_end(cat, page, wasted)
+
+    return SequentialGamesReduced
+
+
+def crawl(store_url:str, folder:str, scheduler:str, pages:int, pages_ahead:int) -> dict:
+    """Runs the crawl in this process and returns its stats."""
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_reduced import GamesReduced
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("CONCURRENT_REQUESTS", 8)
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", 8)
+    settings.set("LINKS", {name: url.replace("https://store.steampowered.com", store_url)
+                           for name, url in settings["LINKS"].items()})
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(sequential_spider() if scheduler == "sequential" else GamesReduced)
+    found = []
+    # Signal receivers are weak references, on_item lives until the crawl ends.
+    def on_item(item):
+        found.append(time.perf_counter())
+    crawler.signals.connect(on_item, signal=signals.item_scraped)
+    process.crawl(
+        crawler,
+        use_test_dict="False",
+        input_file=os.path.join(folder, "categories.json"),
+        state_file=os.path.join(folder, "state.json"),
+        seen_file=os.path.join(folder, "seen.bin"),
+        ids_file=os.path.join(folder, "ids.txt"),
+        n_pages_per_cat=pages,
+        pages_ahead=pages_ahead,
+    )
+    t0 = time.perf_counter()
+    process.start()
+    stats = crawler.stats
+    return {
+        "seconds": time.perf_counter() - t0,
+        "t90": found[int(len(found) * 0.9)] - t0 if found else None,
+        "games": len(found),
+        "requests": stats.get_value("downloader/request_count", 0),
+        "new_ratio": {
+            key.split("/")[2]: value for key, value in stats.get_stats().items() if key.endswith("/new_ids_ratio")
+        },
+    }
+
+
+def run(store:MockStore, scheduler:str, pages:int, pages_ahead:int = 1):
+    store.wasted_requests = 0
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, "categories.json"), "w") as input_file:
+            json.dump([{"name": slug, "url": f"https://store.steampowered.com/category/{slug}/"}
+                       for slug in store.categories], input_file)
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.category_scheduling", "--child", store.url, folder, scheduler,
+             str(pages), str(pages_ahead)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    name = scheduler if scheduler == "sequential" else f"{scheduler} ({pages_ahead} ahead)"
+    print(
+        f"{name:>22}  {result['seconds']:6.1f} s  t90 {result['t90']:5.1f} s  {result['games']:>5} games  "
+        f"{result['requests']:>4} requests  {store.wasted_requests:>4} wasted"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=30, help="Pages requested of each category")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--child", nargs=5, metavar=("STORE_URL", "FOLDER", "SCHEDULER", "PAGES", "PAGES_AHEAD"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        store_url, folder, scheduler, pages, pages_ahead = args.child
+        print(json.dumps(crawl(store_url, folder, scheduler, int(pages), int(pages_ahead))))
+        sys.exit()
+
+    store = MockStore(latency=args.latency).start()
+    # Sizes from 2 to args.pages pages, every category starts in the middle of the previous one.
+    for i in range(args.categories):
+        size = 12 * (2 + (args.pages - 2) * i // max(1, args.categories - 1))
+        store.categories[f"category_{i}"] = (10000 + 100 * i, size)
+
+    print(f"{args.categories} categories, {args.pages} pages requested of each one, {args.latency} s latency")
+    run(store, "sequential", args.pages)
+    run(store, "round-robin", args.pages, 1)
+    result = run(store, "round-robin", args.pages, 2)
+    print("new ids ratio by category:", result["new_ratio"])
+    store.stop()
@@ -0,0 +1,128 @@
+"""GamesFull crawl of the mock store over TLS with scrapy's HTTP/1.1 download
+handler and with PooledDownloadHandler.
+
+The store closes every connection after --keepalive-requests requests (as
+nginx does), so the crawl keeps opening connections. Cases:
+
+    scrapy + cookies   scrapy's handler, cookies set by CookiesMiddleware (as before)
+    scrapy             scrapy's handler, precomputed Cookie header
+    pooled             PooledDownloadHandler (TLS contexts per host, session resumption)
+    pooled + http2     same, with the store over HTTP/2 (only if h2 is installed;
+                       the mock store speaks HTTP/1.1 only, so it is not run here)
+
+The store counts the connections and the resumed TLS sessions, the pooled
+cases also report the ones they counted as resumed. Every run is a separate
+process.
+
+Usage (from the source folder):
+    python -m benchmarks.connection_pool [--pages 400] [--keepalive-requests 20]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore, self_signed_cert
+from benchmarks.parse_offload import CRAWL_SETTINGS
+
+SCRAPY_HANDLER = "scrapy.core.downloader.handlers.http11.HTTP11DownloadHandler"
+CASES = ("scrapy + cookies", "scrapy", "pooled")
+
+
+def cookies_spider():
+    from scrapy import Request
+    from games_scraper.spiders.games_full import GamesFull
+
+    class CookiesGamesFull(GamesFull):
+        """Requests with cookies=, built by CookiesMiddleware for every request"""
+
+        def requests_for(self, ids):
+            for id in ids:
+                if id not in self.seen:
+                    yield Request(url=self.get_url(id), callback=self.parse, cookies=self.cookie, meta={'app_id': id})
+
+    return CookiesGamesFull
+
+
+def crawl(store_url:str, input_file:str, case:str, concurrency:int) -> dict:
+    """Runs the crawl in this process and returns its stats."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("INSTRUMENTATION_ENABLED", False)
+    settings.set("CONCURRENT_REQUESTS", concurrency)
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", concurrency)
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+    if case.startswith("scrapy"):
+        settings.set("DOWNLOAD_HANDLERS", {"http": SCRAPY_HANDLER, "https": SCRAPY_HANDLER})
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(cookies_spider() if case == "scrapy + cookies" else GamesFull)
+    process.crawl(crawler, input_file=input_file)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    process.start()
+    seconds = time.perf_counter() - t0
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    stats = crawler.stats.get_stats()
+    return {
+        "seconds": seconds,
+        "cpu": after.ru_utime + after.ru_stime - usage.ru_utime - usage.ru_stime,
+        "items": stats.get("item_scraped_count", 0),
+        "pool": {key.split("/", 1)[1]: value for key, value in stats.items() if key.startswith("connection_pool/")},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--keepalive-requests", type=int, default=20, help="Requests per connection of the store")
+    parser.add_argument("--app-padding-kb", type=int, default=50)
+    parser.add_argument("--child", nargs=4, metavar=("STORE_URL", "INPUT_FILE", "CASE", "CONCURRENCY"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        store_url, input_file, case, concurrency = args.child
+        print(json.dumps(crawl(store_url, input_file, case, int(concurrency))))
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MockStore(
+            app_padding_kb=args.app_padding_kb,
+            certfile=self_signed_cert(os.path.join(tmp, "store.pem")),
+            keepalive_requests=args.keepalive_requests,
+        ).start()
+        ids = list(range(1000, 1000 + args.pages))
+        for app_id in ids:
+            store.app(str(app_id))
+        input_file = os.path.join(tmp, "ids.txt")
+        with open(input_file, "w") as ids_file:
+            ids_file.writelines(f"{id}\n" for id in ids)
+
+        print(f"{args.pages} pages over TLS, {args.keepalive_requests} requests per connection")
+        for case in CASES:
+            store.connections = store.resumed_sessions = 0
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.connection_pool", "--child", store.url, input_file, case,
+                 str(args.concurrency)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            pool = result["pool"]
+            reuse = f"reuse ratio {pool['reuse_ratio']:.2f}" if "reuse_ratio" in pool else ""
+            client = f"(client: {pool['tls_resumed']})" if "tls_resumed" in pool else ""
+            print(
+                f"{case:>16}  {result['items']:>5} items  {result['items'] / result['seconds']:7.1f} items/s  "
+                f"CPU {1000 * result['cpu'] / max(1, result['items']):5.2f} ms/item  "
+                f"{store.connections:>4} connections  {store.resumed_sessions:>4} resumed {client}  {reuse}"
+            )
+        store.stop()
@@ -0,0 +1,117 @@
+"""Distributed GamesFull crawl: several worker processes sharing a SQLite work
+queue, crawling a local MockStore.
+
+The IDs are added to a new queue and --workers processes crawl it, each one
+limited to --concurrency requests (as a node would be by its politeness
+budget) to a store with --latency seconds of latency. With --kill
+the first worker is killed after --kill-after seconds, its leased shard is
+reclaimed by the others once the lease expires. Each worker logs the IDs it
+scrapes, so coverage and duplicates can be checked at the end.
+
+Usage (from the source folder):
+    python -m benchmarks.distributed [--pages 600] [--workers 1 3] [--kill]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+from games_scraper.id_log import IdLogReader
+from games_scraper.work_queue import SqliteWorkQueue
+
+
+def crawl(store_url:str, queue:str, worker:str, scraped_file:str, lease_ttl:float, concurrency:int):
+    """Runs a worker in this process, writing the scraped ids to scraped_file."""
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.id_log import IdLogWriter
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+    settings.set("WORK_QUEUE_LEASE_TTL", lease_ttl)
+    settings.set("CONCURRENT_REQUESTS", concurrency)
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", concurrency)
+
+    scraped = IdLogWriter(scraped_file)
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(GamesFull)
+    # Signal receivers are weak references, on_item lives until the crawl ends.
+    def on_item(item):
+        scraped.write(item.app_id)
+    crawler.signals.connect(on_item, signal=signals.item_scraped)
+    process.crawl(crawler, queue=queue, worker=worker)
+    process.start()
+    scraped.close()
+
+
+def run(store:MockStore, ids:list, workers:int, shards:int, lease_ttl:float, concurrency:int, kill_after:float = None):
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = os.path.join(tmp, "queue.db")
+        work_queue = SqliteWorkQueue(queue, shards)
+        work_queue.add(ids)
+
+        t0 = time.perf_counter()
+        children = []
+        for i in range(workers):
+            scraped_file = os.path.join(tmp, f"scraped_{i}.txt")
+            children.append((scraped_file, subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.distributed", "--child",
+                 store.url, queue, f"worker_{i}", scraped_file, str(lease_ttl), str(concurrency)],
+            )))
+        if kill_after is not None:
+            time.sleep(kill_after)
+            children[0][1].kill()
+        for _, child in children:
+            child.wait()
+        seconds = time.perf_counter() - t0
+
+        scraped = []
+        for scraped_file, _ in children:
+            scraped.extend(IdLogReader(scraped_file).read_new())
+        status = work_queue.status()
+        work_queue.close()
+
+    missing = len(set(ids) - set(scraped))
+    print(
+        f"{workers} workers{' (1 killed)' if kill_after is not None else '':<11}  {seconds:6.1f} s  "
+        f"{len(scraped) / seconds:6.1f} items/s  missing {missing}  duplicates {len(scraped) - len(set(scraped))}  "
+        f"shards {status}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=600)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5, help="Latency of the store")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests of each worker")
+    parser.add_argument("--lease-ttl", type=float, default=6)
+    parser.add_argument("--kill", action="store_true", help="Also run the biggest worker count killing one worker")
+    parser.add_argument("--kill-after", type=float, default=6)
+    parser.add_argument("--child", nargs=6, metavar=("STORE_URL", "QUEUE", "WORKER", "SCRAPED_FILE", "LEASE_TTL", "CONCURRENCY"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        store_url, queue, worker, scraped_file, lease_ttl, concurrency = args.child
+        crawl(store_url, queue, worker, scraped_file, float(lease_ttl), int(concurrency))
+        sys.exit()
+
+    store = MockStore(app_padding_kb=20, latency=args.latency).start()
+    ids = list(range(1000, 1000 + args.pages))
+    for app_id in ids:
+        store.app(str(app_id))
+
+    for workers in args.workers:
+        run(store, ids, workers, args.shards, args.lease_ttl, args.concurrency)
+    if args.kill:
+        run(store, ids, max(args.workers), args.shards, args.lease_ttl, args.concurrency, kill_after=args.kill_after)
+    store.stop()
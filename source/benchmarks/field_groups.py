@@ -0,0 +1,135 @@
+"""GamesFull field groups (-a field_groups=...): extraction time and crawl
+throughput of every combination of groups.
+
+    extraction   extract_app_page of --pages synthetic app pages in this
+                 process, for each combination: the page is parsed only up
+                 to the end of its last group (stop_markers).
+    crawl        a crawl of the mock store per combination, each in its own
+                 process. Combinations without core stop the downloads at the
+                 end of their last group (PartialDownloadMiddleware). Reports
+                 items/s, CPU, bytes received and stopped downloads. With
+                 --gzip the app pages are sent compressed: the filler script
+                 at the start of the synthetic pages hardly compresses and
+                 the description after the prices does, stopping saves less
+                 of the compressed bytes than of the page.
+
+Usage (from the source folder):
+    python -m benchmarks.field_groups [--pages 400] [--combinations core,reviews pricing] [--gzip]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import pages
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+from games_scraper.extractors import truncate_at
+from games_scraper.spiders.games_full import DEFAULT_FIELD_GROUPS, FIELD_GROUPS, extract_app_page, stop_markers
+
+COMBINATIONS = [
+    ",".join(FIELD_GROUPS),
+    ",".join(DEFAULT_FIELD_GROUPS),
+    "core",
+    "reviews",
+    "pricing",
+    "pricing,dlc",
+    "media",
+    "languages",
+]
+
+
+def extraction(bodies:list, groups:tuple) -> dict:
+    t0 = time.perf_counter()
+    for body in bodies:
+        extract_app_page(body, groups=groups)
+    seconds = time.perf_counter() - t0
+    markers = stop_markers(groups)
+    return {
+        "seconds": seconds,
+        "read": sum(len(truncate_at(body, markers)) for body in bodies) / sum(len(body) for body in bodies),
+    }
+
+
+def crawl(store_url:str, input_file:str, groups:str) -> dict:
+    """Runs the crawl in this process and returns its measures."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("INSTRUMENTATION_ENABLED", False)
+    settings.set("DOWNLOADER_MIDDLEWARES", dict(CRAWL_SETTINGS["DOWNLOADER_MIDDLEWARES"], **{
+        "games_scraper.middlewares.PartialDownloadMiddleware": 585,
+    }))
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(GamesFull)
+    process.crawl(crawler, input_file=input_file, field_groups=groups)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    process.start()
+    seconds = time.perf_counter() - t0
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    stats = crawler.stats
+    return {
+        "seconds": seconds,
+        "cpu": after.ru_utime + after.ru_stime - usage.ru_utime - usage.ru_stime,
+        "items": stats.get_value("item_scraped_count", 0),
+        "bytes": stats.get_value("downloader/response_bytes", 0),
+        "stopped": stats.get_value("partial_downloads/stopped", 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--combinations", nargs="+", default=COMBINATIONS,
+                        help="Comma separated groups of each run")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latency of the store")
+    parser.add_argument("--app-padding-kb", type=int, default=300)
+    parser.add_argument("--gzip", action="store_true", help="Send the app pages gzip compressed")
+    parser.add_argument("--child", nargs=3, metavar=("STORE_URL", "INPUT_FILE", "GROUPS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(crawl(*args.child)))
+        sys.exit()
+
+    bodies = [pages.app_page(app_id, padding_kb=args.app_padding_kb) for app_id in range(1000, 1000 + args.pages)]
+    print(f"Extraction, {args.pages} app pages of {sum(map(len, bodies)) / len(bodies) / 1024:.0f} KiB")
+    print(f"{'groups':<42} {'time':>8} {'pages/s':>9} {'read':>6}")
+    full = None
+    for combination in args.combinations:
+        groups = tuple(group for group in FIELD_GROUPS if group in combination.split(","))
+        result = extraction(bodies, groups)
+        full = full or result["seconds"]
+        print(f"{combination:<42} {result['seconds']:7.2f}s {args.pages / result['seconds']:9.0f} "
+              f"{result['read']:6.0%}  x{full / result['seconds']:.1f}")
+
+    store = MockStore(app_padding_kb=args.app_padding_kb, latency=args.latency, gzip=args.gzip).start()
+    # Pages are generated once, before the first crawl is timed.
+    for app_id in range(1000, 1000 + args.pages):
+        store.app(str(app_id))
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "ids.txt")
+        with open(input_file, "w") as ids_file:
+            ids_file.writelines(f"{id}\n" for id in range(1000, 1000 + args.pages))
+
+        print(f"\nCrawl, {args.pages} games{', gzip' if args.gzip else ''}")
+        print(f"{'groups':<42} {'time':>8} {'items/s':>8} {'CPU':>8} {'received':>10} {'stopped':>8}")
+        for combination in args.combinations:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.field_groups", "--child", store.url, input_file, combination],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{combination:<42} {result['seconds']:7.2f}s {result['items'] / result['seconds']:8.0f} "
+                  f"{result['cpu']:7.2f}s {result['bytes'] / 2 ** 20:7.1f} MiB {result['stopped']:>8}")
+    store.stop()
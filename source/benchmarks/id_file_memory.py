@@ -0,0 +1,117 @@
+"""Peak memory (RSS) and time of loading an ids file of --ids IDs.
+
+Each case runs in its own process, so its peak RSS is its own. The old way of
+loading the games_reduced output (json.load of the whole "[1, 2, 3]" list,
+then a set of it, and eval of it with --eval) is compared with streaming it
+through games_scraper.data_io into an IdBitmap, for the old list format and
+for plain and gzip IdLogWriter logs.
+
+Usage (from the source folder):
+    python -m benchmarks.id_file_memory [--ids 10000000] [--eval]
+"""
+import argparse
+import gzip
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+CASES = {
+    'json.load + set': "list",
+    'eval + set': "list",
+    'iter_records -> bitmap': "list",
+    'IdLogReader -> bitmap': "log",
+    'IdLogReader .gz -> bitmap': "log.gz",
+}
+
+
+def load(case:str, path:str):
+    """Loads path the way of case, printing the number of IDs, seconds and peak RSS."""
+    from games_scraper.data_io import iter_records
+    from games_scraper.id_index import IdBitmap
+    from games_scraper.id_log import IdLogReader
+
+    t0 = time.perf_counter()
+    if case == 'json.load + set':
+        with open(path) as ids_file:
+            ids = set(json.load(ids_file))
+    elif case == 'eval + set':
+        with open(path) as ids_file:
+            ids = set(eval(ids_file.read()))
+    elif case == 'iter_records -> bitmap':
+        ids = IdBitmap()
+        for id in iter_records(path):
+            ids.add(id)
+    else:
+        ids = IdBitmap()
+        for id in IdLogReader(path).read_new():
+            ids.add(id)
+    seconds = time.perf_counter() - t0
+    # ru_maxrss is in KiB on Linux.
+    print(len(ids), seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def write_files(folder:str, count:int) -> dict:
+    """Writes count IDs in the old list format and as plain and gzip logs."""
+    ids = range(10, 10 + count)
+    paths = {
+        'list': os.path.join(folder, "ids.json"),
+        'log': os.path.join(folder, "ids.txt"),
+        'log.gz': os.path.join(folder, "ids.txt.gz"),
+    }
+    with open(paths['list'], "w") as ids_file:
+        ids_file.write("[")
+        for start in range(0, count, 100_000):
+            if start:
+                ids_file.write(", ")
+            ids_file.write(", ".join(map(str, ids[start:start + 100_000])))
+        ids_file.write("]")
+    for name, opener in (('log', open), ('log.gz', gzip.open)):
+        with opener(paths[name], "wt") as ids_file:
+            for start in range(0, count, 100_000):
+                ids_file.write("".join(f"{id}\n" for id in ids[start:start + 100_000]))
+    return paths
+
+
+def baseline_rss() -> int:
+    """Peak RSS (KiB) of a process importing what the cases import, without loading anything."""
+    code = ("import resource, json, games_scraper.data_io, games_scraper.id_index, games_scraper.id_log; "
+            "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+    return int(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ids", type=int, default=10_000_000)
+    parser.add_argument("--eval", action="store_true", help="Also run eval (slow and memory hungry)")
+    parser.add_argument("--child", nargs=2, metavar=("CASE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        load(*args.child)
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_files(tmp, args.ids)
+        for name, path in paths.items():
+            print(f"{os.path.basename(path):<12} {os.path.getsize(path) / 2 ** 20:8.1f} MiB")
+        baseline = baseline_rss()
+        print(f"baseline RSS {baseline / 1024:.1f} MiB (interpreter and imports)")
+        for case, file in CASES.items():
+            if case == 'eval + set' and not args.eval:
+                continue
+            child = subprocess.run(
+                [sys.executable, "-m", "benchmarks.id_file_memory", "--child", case, paths[file]],
+                capture_output=True, text=True,
+            )
+            # eval of millions of IDs can be killed for running out of memory.
+            if child.returncode:
+                print(f"{case:<26} failed with exit code {child.returncode}")
+                continue
+            output = child.stdout.split()
+            count, seconds, rss = int(output[0]), float(output[1]), int(output[2])
+            print(f"{case:<26} {count:>10} ids  {seconds:6.1f} s  peak RSS {rss / 1024:8.1f} MiB "
+                  f"(+{(rss - baseline) / 1024:.1f} MiB)")
@@ -0,0 +1,121 @@
+"""GamesFull crawl of the mock store downloading the header image of every game
+with scrapy's FilesPipeline and with ContentImagesPipeline.
+
+The store serves --images different contents for --pages games (games share
+images), each pipeline crawls twice into the same store folder, every run in
+its own process:
+
+    run 1   empty store, every image is downloaded
+    run 2   same pages again, images already stored
+
+For each run it reports items/s, CPU, the image requests the store received
+and the files and bytes in the store folder. (scrapy's ImagesPipeline requires
+Pillow, FilesPipeline stores the same files without converting them.)
+
+Usage (from the source folder):
+    python -m benchmarks.image_pipeline [--pages 400] [--images 50]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+
+PIPELINES = {
+    "files": "scrapy.pipelines.files.FilesPipeline",
+    "content": "games_scraper.pipelines.ContentImagesPipeline",
+}
+
+
+def crawl(store_url:str, input_file:str, pipeline:str, folder:str, run:str) -> dict:
+    """Runs the crawl in this process and returns its measures."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("INSTRUMENTATION_ENABLED", False)
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+    settings.set("ITEM_PIPELINES", {PIPELINES[pipeline]: 1})
+    settings.set("FILES_STORE", os.path.join(folder, "store"))
+    settings.set("FILES_URLS_FIELD", "image_urls")
+    settings.set("FILES_RESULT_FIELD", "images")
+    settings.set("IMAGES_STORE", os.path.join(folder, "store"))
+    settings.set("IMAGES_INDEX_FILE", os.path.join(folder, "images.db"))
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(GamesFull)
+    process.crawl(crawler, input_file=input_file, seen_file=os.path.join(folder, f"seen-{run}.bin"),
+                  download_images="True")
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    process.start()
+    seconds = time.perf_counter() - t0
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    stats = crawler.stats.get_stats()
+    return {
+        "seconds": seconds,
+        "cpu": after.ru_utime + after.ru_stime - usage.ru_utime - usage.ru_stime,
+        "items": stats.get("item_scraped_count", 0),
+        "images": {key.split("/", 1)[1]: value for key, value in stats.items() if key.startswith("images/")},
+    }
+
+
+def folder_size(folder:str) -> tuple:
+    """Files and bytes in a folder."""
+    files = size = 0
+    for root, _, names in os.walk(folder):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--images", type=int, default=50, help="Different image contents")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latency of the store")
+    parser.add_argument("--app-padding-kb", type=int, default=50)
+    parser.add_argument("--child", nargs=5, metavar=("STORE_URL", "INPUT_FILE", "PIPELINE", "FOLDER", "RUN"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(crawl(*args.child)))
+        sys.exit()
+
+    store = MockStore(app_padding_kb=args.app_padding_kb, latency=args.latency, images=args.images).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "ids.txt")
+        with open(input_file, "w") as ids_file:
+            ids_file.writelines(f"{id}\n" for id in range(1000, 1000 + args.pages))
+
+        print(f"{args.pages} pages, {args.images} different images")
+        for pipeline in PIPELINES:
+            folder = os.path.join(tmp, pipeline)
+            for run in ("1", "2"):
+                store.image_requests = 0
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.image_pipeline", "--child", store.url, input_file,
+                     pipeline, folder, run],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                files, size = folder_size(os.path.join(folder, "store"))
+                images = result["images"]
+                dedup = (f"  {images.get('new_contents', 0)} new, {images.get('duplicates', 0)} duplicates, "
+                         f"{images.get('url_hits', 0)} url hits") if images else ""
+                print(
+                    f"{pipeline:>8} run {run}  {result['items']:>5} items {result['items'] / result['seconds']:7.1f}/s  "
+                    f"CPU {1000 * result['cpu'] / max(1, result['items']):5.2f} ms/item  "
+                    f"{store.image_requests:>5} image requests  {files:>5} files {size / 2 ** 20:6.1f} MiB{dedup}"
+                )
+    store.stop()
@@ -0,0 +1,101 @@
+"""GamesFull re-crawl with and without the IncrementalMiddleware.
+
+Crawls --pages app pages from a local MockStore, changes --changed of them and
+crawls again with the same page cache, once with a store answering
+If-None-Match and once with a store without ETags (only the body hash is
+compared). Every crawl runs in a separate process.
+
+Usage (from the source folder):
+    python -m benchmarks.incremental [--pages 400] [--changed 0.1]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+
+
+def crawl(store_url:str, input_file:str, cache_file:str) -> dict:
+    """Runs the crawl in this process and returns its stats. An empty cache_file
+    disables the incremental mode."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    middlewares = dict(settings["DOWNLOADER_MIDDLEWARES"], **CRAWL_SETTINGS["DOWNLOADER_MIDDLEWARES"])
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("DOWNLOADER_MIDDLEWARES", middlewares)
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+    settings.set("INCREMENTAL_ENABLED", bool(cache_file))
+    settings.set("INCREMENTAL_CACHE_FILE", cache_file)
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(GamesFull)
+    process.crawl(crawler, input_file=input_file)
+    t0 = time.perf_counter()
+    process.start()
+    stats = crawler.stats
+    return {
+        "seconds": time.perf_counter() - t0,
+        "bytes": stats.get_value("downloader/response_bytes", 0),
+        "parsed": stats.get_value("item_scraped_count", 0) - stats.get_value("incremental/not_modified", 0)
+                  - stats.get_value("incremental/same_hash", 0),
+        "not_modified": stats.get_value("incremental/not_modified", 0),
+        "same_hash": stats.get_value("incremental/same_hash", 0),
+    }
+
+
+def run_child(store:MockStore, input_file:str, cache_file:str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.incremental", "--child", store.url, input_file, cache_file],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def report(label:str, result:dict):
+    print(
+        f"{label:>22}  {result['seconds']:6.2f} s  {result['bytes'] / 2 ** 20:8.1f} MiB  "
+        f"parsed {result['parsed']:>5}  304 {result['not_modified']:>5}  same hash {result['same_hash']:>5}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--changed", type=float, default=0.1, help="Fraction of pages changed between runs")
+    parser.add_argument("--child", nargs=3, metavar=("STORE_URL", "INPUT_FILE", "CACHE_FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        store_url, input_file, cache_file = args.child
+        print(json.dumps(crawl(store_url, input_file, cache_file)))
+        sys.exit()
+
+    ids = list(range(1000, 1000 + args.pages))
+    changed = random.Random(0).sample(ids, int(len(ids) * args.changed))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "ids.txt")
+        with open(input_file, "w") as ids_file:
+            ids_file.writelines(f"{id}\n" for id in ids)
+
+        for etags in (True, False):
+            store = MockStore(etags=etags).start()
+            for app_id in ids:
+                store.app(str(app_id))
+            cache_file = os.path.join(tmp, f"cache_{etags}.db")
+            label = "etag" if etags else "hash only"
+            report("full", run_child(store, input_file, ""))
+            report(f"{label}, cold cache", run_child(store, input_file, cache_file))
+            for app_id in changed:
+                store.change(app_id)
+            report(f"{label}, {len(changed)} changed", run_child(store, input_file, cache_file))
+            store.stop()
@@ -0,0 +1,92 @@
+"""Overhead and output of InstrumentationMiddleware in a GamesFull crawl of the
+mock store.
+
+Runs the crawl without instrumentation, with it and with it plus the sampling
+profiler, each in its own process, then prints the histograms of the last run
+(count, mean and p95 from the JSON snapshot) and the profiler report.
+
+Usage (from the source folder):
+    python -m benchmarks.instrumentation [--pages 400] [--latency 0.05]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+
+MODES = ("off", "on", "profile")
+
+
+def crawl(store_url:str, input_file:str, mode:str, folder:str) -> dict:
+    """Runs the crawl in this process, writing the metrics files to folder."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+    settings.set("INSTRUMENTATION_ENABLED", mode != "off")
+    settings.set("INSTRUMENTATION_PROFILE", mode == "profile")
+    settings.set("INSTRUMENTATION_JSON_FILE", os.path.join(folder, "%(spider)s.json"))
+    settings.set("INSTRUMENTATION_PROMETHEUS_FILE", os.path.join(folder, "%(spider)s.prom"))
+    settings.set("INSTRUMENTATION_PROFILE_FILE", os.path.join(folder, "%(spider)s.profile.txt"))
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(GamesFull)
+    process.crawl(crawler, input_file=input_file)
+    t0 = time.perf_counter()
+    process.start()
+    return {
+        "seconds": time.perf_counter() - t0,
+        "items": crawler.stats.get_value("item_scraped_count", 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05, help="Latency of the store")
+    parser.add_argument("--child", nargs=4, metavar=("STORE_URL", "INPUT_FILE", "MODE", "FOLDER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(crawl(*args.child)))
+        sys.exit()
+
+    store = MockStore(latency=args.latency).start()
+    ids = list(range(1000, 1000 + args.pages))
+    for app_id in ids:
+        store.app(str(app_id))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "ids.txt")
+        with open(input_file, "w") as ids_file:
+            ids_file.writelines(f"{id}\n" for id in ids)
+
+        for mode in MODES:
+            folder = os.path.join(tmp, mode)
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.instrumentation", "--child", store.url, input_file, mode, folder],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>8}  {result['items']:>5} items  {result['items'] / result['seconds']:7.1f} items/s")
+
+        with open(os.path.join(folder, "games_full.json")) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        print()
+        for name, histograms in snapshot["metrics"].items():
+            for histogram in histograms:
+                labels = ",".join(map(str, histogram["labels"].values()))
+                print(f"{name:<22} {labels:<12} {histogram['count']:>6}  "
+                      f"mean {histogram['mean']:9.4f}  p95 {histogram['p95']:9.4f}")
+        print()
+        with open(os.path.join(folder, "games_full.profile.txt")) as profile_file:
+            print(profile_file.read())
+    store.stop()
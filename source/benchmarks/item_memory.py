@@ -0,0 +1,59 @@
+"""Memory of 1M items held as dicts and as the slotted item classes.
+
+Items are built from the values of a parsed synthetic page (benchmarks.pages),
+the same value objects are shared by every item so only the containers are
+measured (plus the id and the tags/platforms lists, new in every item).
+
+Usage (from the source folder):
+    python -m benchmarks.item_memory [--items 1000000]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from attr import asdict
+
+from benchmarks import pages
+from benchmarks.listing_parse import new_spider
+from games_scraper.extractors import parse_html
+from games_scraper.spiders.games_full import extract_app_page
+from games_scraper.spiders.games_reduced import GAME_CARDS
+
+
+def allocated(build, n:int) -> float:
+    """Bytes allocated per item by n calls to build(i), holding every item."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(i) for i in range(n)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del items
+    return size / n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    reduced = new_spider().parse_game(GAME_CARDS(parse_html(pages.listing_page(1000, 1)))[0])
+    full = extract_app_page(pages.app_page(1000, padding_kb=1))
+    full.app_id = 1000
+
+    for label, item in (("games_reduced", reduced), ("games_full", full)):
+        cls = type(item)
+        values = asdict(item, recurse=False)
+        id_field = "id" if "id" in values else "app_id"
+
+        def as_dict(i):
+            return dict(values, **{id_field: 10 ** 6 + i, "tags": list(values["tags"])})
+
+        def as_item(i):
+            return cls(**dict(values, **{id_field: 10 ** 6 + i, "tags": list(values["tags"])}))
+
+        print(f"{label} ({len(values)} fields), {args.items} items")
+        dict_size = allocated(as_dict, args.items)
+        item_size = allocated(as_item, args.items)
+        print(f"  {'dict':<16} {dict_size:6.0f} B/item  {dict_size * args.items / 2 ** 20:7.0f} MiB")
+        print(f"  {cls.__name__:<16} {item_size:6.0f} B/item  {item_size * args.items / 2 ** 20:7.0f} MiB  ({dict_size / item_size:.1f}x less)")
@@ -0,0 +1,213 @@
+"""Extraction code the spiders used before the compiled field tables, kept as
+the baseline of the parsing benchmarks."""
+import logging
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+
+def parse_app_page(body:str) -> dict:
+    """GamesFull.parse with BeautifulSoup"""
+    soup = BeautifulSoup(body, features="lxml")
+
+    def get_game_content(el):
+        content = el.findChildren("a", recursive=False)
+        return [
+            {
+                "name": content_el.findChildren("div", recursive=False)[0].text.strip(),
+                "price": content_el.findChildren("div", recursive=False)[1].text.strip()
+            }
+            for content_el in content
+        ]
+
+    def get_langs():
+        els = soup.select(".game_language_options > tbody:nth-child(1) > tr")
+        res = []
+        for el in els:
+            chl = el.findChildren("td", recursive=False)
+            if len(chl) < 4:
+                continue
+            res.append({
+                'name': chl[0].text.strip(),
+                'interface' : True if chl[1].findChildren("span", recursive=False) else False,
+                'voices': True if chl[2].findChildren("span", recursive=False) else False,
+                'subtitles': True if chl[3].findChildren("span", recursive=False) else False,
+            })
+        return res
+
+    def get_web():
+        res = None
+        try: 
+            res =  soup.select_one("a.linkbar:nth-child(1)").attrs['href'].split("url=")[1]
+        except:
+            pass
+
+        return res
+
+    item = {
+        'is_dlc': True if "Contenido descargable" in soup.select_one(".blockbg").text else False, # Warning: language spanish required.
+        'img_src': soup.select_one(".game_header_image_full").attrs["src"],
+        'short_description': soup.select_one(".game_description_snippet").text.strip()
+            if soup.select_one(".game_description_snippet") else None,
+        'recent_reviews': soup.select_one("#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(1)").text.strip()
+            if soup.select_one("#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(1)") else None,
+        'recent_reviews_count': soup.select_one("#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(2)").text.strip()
+            if soup.select_one("#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(2)") else None,
+        'all_reviews': soup.select_one("#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(1)").text.strip()
+            if soup.select_one("#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(1)") else None,
+        'all_reviews_count': soup.select_one("#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(2)").text.strip()
+            if soup.select_one("#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(2)") else None,
+        'reviews_anomally': True if soup.select_one("span.review_anomaly_icon:nth-child(3)") else False,
+        'release_date': soup.select_one(".date").text
+            if soup.select_one(".date") else None,
+        'developer': soup.select_one("#developers_list > a:nth-child(1)").text
+            if soup.select_one("#developers_list > a:nth-child(1)") else None,
+        'developer_url': soup.select_one("#developers_list > a:nth-child(1)").attrs['href']
+            if soup.select_one("#developers_list > a:nth-child(1)") else None,
+        'publisher': soup.select_one("div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)").text
+            if soup.select_one("div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)") else None,
+        'publisher_url': soup.select_one("div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)").attrs["href"]
+            if soup.select_one("div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)") else None,
+        'tags': [tag.text.strip() for tag in soup.select("a.app_tag")]
+            if soup.select("a.app_tag") else None,
+        # 'content_video': [el.attrs["src"] for el in soup.select_one("#highlight_player_area").findChildren("video", recursive=True)],
+        # 'content_image': [el.attrs["src"] for el in soup.select_one("#highlight_player_area").findChildren("img", recursive=True)[1:]],
+        'discount_original_price': soup.select_one("div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(1)").text
+            if soup.select_one("div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(1)") else None,   
+        'discount_final_price': soup.select_one("div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(2)").text
+            if soup.select_one("div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(2)") else None,
+        'discount': soup.select_one("div.discount_block:nth-child(1) > div:nth-child(1)").text
+            if soup.select_one("div.discount_block:nth-child(1) > div:nth-child(1)") else None,
+        'price': soup.select_one("div.game_purchase_action_bg:nth-child(1) > div:nth-child(1)").text.strip()
+            if soup.select_one("div.game_purchase_action_bg:nth-child(1) > div:nth-child(1)") else None,
+        'game_content': get_game_content(soup.select_one(".gameDlcBlocks"))
+            if soup.select_one(".gameDlcBlocks") else None,
+        # 'lang': get_langs(),
+        'name': soup.select_one("#appHubAppName").text,
+        'genre': soup.select_one("#genresAndManufacturer > span:nth-child(4) > a:nth-child(1)").text,
+        'website': get_web(),
+        'metacritic_score': soup.select_one(".score").text.strip()
+            if soup.select_one(".score") else None,
+        'metacritic_url': soup.select_one("#game_area_metalink > a:nth-child(1)").attrs['href']
+            if soup.select_one("#game_area_metalink > a:nth-child(1)") else None,
+    }
+
+    return item
+
+
+def parse_listing_page(body:str, seen:set, download_images:bool = False) -> list:
+    """GamesReduced.parse with BeautifulSoup, without the end of category check"""
+    soup = BeautifulSoup(body, features="lxml")
+    games = soup.find_all(class_="salepreviewwidgets_SaleItemBrowserRow_y9MSd")
+    return [res for res in (parse_game(game, seen, download_images) for game in games) if res is not None]
+
+
+def parse_game(game, seen:set, download_images:bool = False) -> dict:
+    """GamesReduced.parse_game with BeautifulSoup, crawled ids are kept in seen"""
+    base_selector = "div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > "
+    def clean_selector(sel):
+        return sel.replace(base_selector, "")        
+
+    # Getting url and id. If id in crawled ids return.
+    selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > a:nth-child(1)")
+    url = game.select_one(selector).attrs["href"]
+    id = int(url.split("app/")[1].split("/")[0])
+    if id in seen:
+        return
+
+    # Getting image url
+    selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > a:nth-child(1) > div:nth-child(1) > div:nth-child(2) > img:nth-child(1)")
+    img_src = game.select_one(selector).attrs["src"]
+    image_urls = []
+    if download_images:
+        image_urls = [img_src]
+
+    # Getting name
+    selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(2) > a:nth-child(1) > div:nth-child(1)")
+    name = game.select_one(selector).text
+
+    # Getting description
+    selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(4)")
+    description = game.select_one(selector).text
+
+    # Getting tags
+    selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > div:nth-child(1) > a")
+    tags = [tag.text for tag in game.select(selector)]
+
+    # Getting date
+    selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > div:nth-child(1)")
+    date = game.select_one(selector).text
+
+    # Getting platforms
+    selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > span:nth-child(2) > svg")
+    plat_logos_class_dict = {
+            "SVGIcon_Button SVGIcon_WindowsLogo": "windows",
+            "SVGIcon_Button SVGIcon_AppleLogo": "mac",
+            "SVGIcon_Button SVGIcon_SteamLogo": "steam",
+            "SVGIcon_Button": "vr",
+            "": "linux",
+        }
+
+
+    platforms = []
+    for plat in game.select(selector):
+        icon_class = " ".join(plat.attrs["class"])
+        try:
+            platforms.append(
+                    plat_logos_class_dict[icon_class]
+                )
+        except Exception as e:
+            print(e)
+            print(f"No icon found in game {name} with class {icon_class}")
+
+    # Getting reviews
+    rev_category = None
+    try:
+        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > a:nth-child(3) > div:nth-child(1) > div:nth-child(1)")
+        rev_category = game.select_one(selector).text
+    except Exception as e:
+        logger.error(e)
+        logger.warning(f"rev_category not found for game {id}")
+
+    rev_number = 0
+    try:
+        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > a:nth-child(3) > div:nth-child(1) > div:nth-child(2)")
+        rev_number = game.select_one(selector).text
+        rev_number = int(rev_number.split(" ")[1].replace(".", ""))
+    except Exception as e:
+        logger.error(e)
+        logger.warning(f"rev_number not found for game {id}")
+
+    # Getting prices
+    offert = None
+    offert_price = None
+
+    selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(5) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1)")
+    price = game.select_one(selector).text if game.select_one(selector) else None
+
+    if price and "%" in price:
+        offert = price
+        selector = clean_selector("div.salepreviewwidgets_Discounted_35-Ub:nth-child(2) > div:nth-child(2) > div:nth-child(1)")
+        price = game.select_one(selector).text
+        selector = clean_selector("div.salepreviewwidgets_Discounted_35-Ub:nth-child(2) > div:nth-child(2) > div:nth-child(2)")
+        offert_price = game.select_one(selector).text
+
+    seen.add(id)
+
+    return {
+        "id": id,
+        'image_urls': image_urls,
+        'name': name,
+        'url': url,
+        'img_src': img_src,
+        'description': description,
+        'tags': tags,
+        'reviews_category': rev_category,
+        'reviews_number': rev_number,
+        'date': date,
+        'platforms': platforms,
+        'price': price,
+        'offert': offert,
+        'offert_price':offert_price
+    }
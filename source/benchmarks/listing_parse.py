@@ -0,0 +1,79 @@
+"""Games/s of GamesReduced.parse extraction, compiled card table vs BeautifulSoup.
+
+Runs on a rendered category page of 12 cards and on a synthetic page of 10k
+cards (benchmarks.pages.listing_page). Both implementations must return the
+same items (with the numbers of the bs4 ones parsed as the spider does). BeautifulSoup time grows quadratically with the cards of a page
+(about 20 minutes for 10k), so it is skipped for pages over --baseline-max-cards.
+
+Usage (from the source folder):
+    python -m benchmarks.listing_parse [--big-cards 10000]
+"""
+import argparse
+import tempfile
+import time
+
+from scrapy.utils.test import get_crawler
+
+from benchmarks import legacy
+from benchmarks.pages import listing_page
+from games_scraper.extractors import parse_html, parse_percent, parse_price
+from games_scraper.items import GamesReducedItem
+from games_scraper.seen_ids import SeenIds
+from games_scraper.spiders.games_reduced import GAME_CARDS, GamesReduced
+
+
+def new_spider() -> GamesReduced:
+    """A GamesReduced with an empty in-memory seen ids store and no input file"""
+    spider = GamesReduced.from_crawler(
+        get_crawler(GamesReduced),
+        use_test_dict="True",
+        state_file=tempfile.mktemp(),
+        seen_file=tempfile.mktemp(),
+        ids_file=tempfile.mktemp(),
+    )
+    spider.seen = SeenIds()
+    return spider
+
+
+def compiled(body:str) -> list:
+    spider = new_spider()
+    return [spider.parse_game(game) for game in GAME_CARDS(parse_html(body))]
+
+
+def bs4(body:str) -> list:
+    return legacy.parse_listing_page(body, set())
+
+
+def typed(item:dict) -> GamesReducedItem:
+    """A bs4 item as a GamesReducedItem"""
+    return GamesReducedItem(**dict(
+        item,
+        price=parse_price(item['price']),
+        offert=parse_percent(item['offert']),
+        offert_price=parse_price(item['offert_price']),
+    ))
+
+
+def games_per_second(parse, body:str, cards:int, rounds:int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        parse(body)
+    return cards * rounds / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--big-cards", type=int, default=10_000)
+    parser.add_argument("--baseline-max-cards", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=1, help="Rounds over the big page, x100 for the small one")
+    args = parser.parse_args()
+
+    for cards, rounds in ((12, args.rounds * 100), (args.baseline_max_cards, args.rounds), (args.big_cards, args.rounds)):
+        body = listing_page(1000, cards)
+        result = games_per_second(compiled, body, cards, rounds)
+        if cards > args.baseline_max_cards:
+            print(f"{cards:>6} cards  bs4   skipped        compiled {result:9.0f} games/s")
+            continue
+        assert compiled(body) == [typed(item) for item in bs4(body)], "Items differ"
+        baseline = games_per_second(bs4, body, cards, rounds)
+        print(f"{cards:>6} cards  bs4 {baseline:9.0f} games/s  compiled {result:9.0f} games/s  (x{result / baseline:.1f})")
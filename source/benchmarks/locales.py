@@ -0,0 +1,120 @@
+"""GamesFull prices for several store regions against the mock store: a crawl
+per locale one after the other, as a single locale crawl has to be run, against
+one crawl in the multi-locale mode (-a locales=es,de,us,gb).
+
+The mock store converts the prices of the app pages to the currency of the cc
+parameter (benchmarks.pages.REGIONS). es and de share the euro, the
+multi-locale crawl requests their page once. Every crawl runs in its own
+process, for each one it reports the time, the app page requests the store
+received by region and the items. The regional_prices of the multi-locale
+items are checked against the prices of the serial crawls.
+
+Usage (from the source folder):
+    python -m benchmarks.locales [--pages 400] [--locales es de us gb]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+
+
+def crawl(store_url:str, input_file:str, locales:str) -> dict:
+    """Runs the crawl in this process and returns its measures and the final
+    price of every locale of every item."""
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("INSTRUMENTATION_ENABLED", False)
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+
+    prices = {}
+
+    def item_scraped(item):
+        prices[item.app_id] = {entry["locale"]: str(entry["final_price"]) for entry in item.regional_prices}
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(GamesFull)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+    process.crawl(crawler, input_file=input_file, locales=locales)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    process.start()
+    seconds = time.perf_counter() - t0
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "seconds": seconds,
+        "cpu": after.ru_utime + after.ru_stime - usage.ru_utime - usage.ru_stime,
+        "items": crawler.stats.get_value("item_scraped_count", 0),
+        "prices": prices,
+    }
+
+
+def run(store:MockStore, input_file:str, locales:list) -> dict:
+    store.app_requests.clear()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.locales", "--child", store.url, input_file, ",".join(locales)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["requests"] = dict(store.app_requests)
+    return result
+
+
+def print_result(name:str, result:dict):
+    requests = ", ".join(f"{cc} {count}" for cc, count in sorted(result["requests"].items()))
+    print(f"{name:<24} {result['seconds']:6.2f} s  CPU {result['cpu']:6.2f} s  {result['items']:>5} items  "
+          f"{sum(result['requests'].values()):>5} app page requests ({requests})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--locales", nargs="+", default=["es", "de", "us", "gb"])
+    parser.add_argument("--latency", type=float, default=0.02, help="Latency of the store")
+    parser.add_argument("--app-padding-kb", type=int, default=300)
+    parser.add_argument("--child", nargs=3, metavar=("STORE_URL", "INPUT_FILE", "LOCALES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = crawl(*args.child)
+        print(json.dumps(result))
+        sys.exit()
+
+    store = MockStore(app_padding_kb=args.app_padding_kb, latency=args.latency).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "ids.txt")
+        with open(input_file, "w") as ids_file:
+            ids_file.writelines(f"{id}\n" for id in range(1000, 1000 + args.pages))
+
+        print(f"{args.pages} games, locales {', '.join(args.locales)}")
+        expected = {}
+        serial = {"seconds": 0, "cpu": 0, "items": 0, "requests": {}}
+        for locale in args.locales:
+            result = run(store, input_file, [locale])
+            print_result(f"serial, {locale}", result)
+            for key in ("seconds", "cpu", "items"):
+                serial[key] += result[key]
+            for cc, count in result["requests"].items():
+                serial["requests"][cc] = serial["requests"].get(cc, 0) + count
+            for app_id, prices in result["prices"].items():
+                expected.setdefault(app_id, {}).update(prices)
+        print_result("serial, total", serial)
+
+        result = run(store, input_file, args.locales)
+        print_result("multi-locale", result)
+        mismatches = sum(1 for app_id, prices in expected.items() if result["prices"].get(app_id) != prices)
+        print(f"\nx{serial['seconds'] / result['seconds']:.1f} faster, "
+              f"{sum(serial['requests'].values()) - sum(result['requests'].values())} fewer requests, "
+              f"{mismatches} apps with different prices")
+    store.stop()
@@ -0,0 +1,323 @@
+"""Local HTTP server serving synthetic store pages (benchmarks.pages).
+
+Routes:
+    /              Store index, its genre menu links the categories of
+                   MockStore.categories.
+    /app/<id>?cc=<region>
+                   App page of game <id>, with the prices in the currency of
+                   the region (pages.REGIONS, ES by default). Sent with an
+                   ETag, requests with a matching If-None-Match get a 304
+                   (unless etags=False). Gzip compressed if gzip=True and
+                   the client accepts it.
+    /category/<slug>/?offset=<n>
+                   Category page as rendered by the browser (12 game cards).
+    /contenthub/querypaginated/category/<any>/render/?start=&count=&category=<slug>
+                   JSON listing of a category added to MockStore.categories.
+    /api/appdetails?appids=<id>&filters=basic
+                   Basic details (short description) of game <id>.
+    /cdn/apps/<id>/<name>.jpg
+                   Image of a game (a PNG). The images of the app pages link
+                   here if MockStore.images is set: games whose ids are equal
+                   modulo images share the same image.
+
+Pages saved from the real store can be served instead of the synthetic ones
+(recorded folder): index.html, app/<id>.html, category/<slug>/<offset>.html
+and listing/<slug>/<start>.json. Missing files are generated.
+
+Every response can be delayed (latency) and requests above a rate limit are
+answered with a 429 and a Retry-After header. With a certificate (see
+self_signed_cert) it is served over TLS, counting handshakes and resumed
+sessions.
+
+Usage (from the source folder):
+    python -m benchmarks.mock_store --port 8000
+"""
+import argparse
+import collections
+import functools
+import gzip
+import hashlib
+import os
+import re
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from benchmarks import pages
+
+
+@functools.lru_cache(maxsize=4096)
+def gzipped(body:bytes) -> bytes:
+    return gzip.compress(body, compresslevel=6)
+
+
+class MockStoreHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    routes = (
+        (re.compile(r"^/$"), "index", "text/html; charset=utf-8"),
+        (re.compile(r"^/app/(\d+)/?$"), "app", "text/html; charset=utf-8"),
+        (re.compile(r"^/category/(\w+)/?$"), "category_page", "text/html; charset=utf-8"),
+        (re.compile(r"^/contenthub/querypaginated/category/\w+/render/?$"), "category_listing", "application/json"),
+        (re.compile(r"^/api/appdetails/?$"), "app_details", "application/json"),
+        (re.compile(r"^/cdn/apps/(\d+)/(\w+)\.jpg$"), "image", "image/png"),
+    )
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not self.server.allow_request():
+            return self.send_body(429, b"Too many requests", headers={"Retry-After": str(self.server.retry_after)})
+        path, _, query = self.path.partition("?")
+        for pattern, route, content_type in self.routes:
+            match = pattern.match(path)
+            if match:
+                body = getattr(self.server, route)(*match.groups(), query=dict(parse_qsl(query)))
+                if body is None:
+                    break
+                headers = {}
+                if self.server.etags:
+                    headers["ETag"] = self.server.etag(body)
+                    if self.headers.get("If-None-Match") == headers["ETag"]:
+                        return self.send_body(304, b"", content_type, headers)
+                if self.server.gzip and route == "app" and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzipped(body)
+                    headers["Content-Encoding"] = "gzip"
+                return self.send_body(200, body, content_type, headers)
+        self.send_body(404, b"Not found")
+
+    def send_body(self, status:int, body:bytes, content_type:str = "text/html; charset=utf-8", headers:dict = None):
+        self.requests = getattr(self, "requests", 0) + 1
+        keepalive_requests = self.server.keepalive_requests
+        if keepalive_requests and self.requests >= keepalive_requests:
+            # Like the keepalive_requests limit of nginx, the client has to reconnect.
+            self.close_connection = True
+            headers = dict(headers or {}, Connection="close")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading the body (partial downloads).
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def self_signed_cert(path:str) -> str:
+    """Writes a self-signed certificate for 127.0.0.1 and its key to path (PEM)."""
+    from OpenSSL import crypto
+
+    key = crypto.PKey()
+    key.generate_key(crypto.TYPE_RSA, 2048)
+    cert = crypto.X509()
+    cert.get_subject().CN = "127.0.0.1"
+    cert.set_serial_number(1)
+    cert.gmtime_adj_notBefore(0)
+    cert.gmtime_adj_notAfter(24 * 3600)
+    cert.set_issuer(cert.get_subject())
+    cert.set_pubkey(key)
+    cert.sign(key, "sha256")
+    with open(path, "wb") as pem_file:
+        pem_file.write(crypto.dump_privatekey(crypto.FILETYPE_PEM, key))
+        pem_file.write(crypto.dump_certificate(crypto.FILETYPE_PEM, cert))
+    return path
+
+
+class MockStore(ThreadingHTTPServer):
+    """Mock store server. Pages are generated once and cached.
+
+    Args:
+        port (int): 0 picks a free port.
+        app_padding_kb (int): Filler of the app pages, see benchmarks.pages.app_page.
+        etags (bool): Send ETags and answer conditional requests.
+        latency (float): Seconds every response is delayed.
+        rate_limit (float, optional): Requests per second served, a burst of up to
+            one second of requests is allowed. Others get a 429.
+        retry_after (int): Retry-After of the 429 responses.
+        recorded (str, optional): Folder of saved pages, see the module docstring.
+        certfile (str, optional): PEM file with the certificate and its key, to serve https.
+        keepalive_requests (int, optional): Requests served by a connection before closing it.
+        images (int, optional): Serve the images of the app pages, with this many
+            different contents.
+        gzip (bool): Send the app pages gzip compressed to clients accepting it.
+    """
+    daemon_threads = True
+
+    def __init__(self, port:int = 0, app_padding_kb:int = 300, etags:bool = True,
+                 latency:float = 0, rate_limit:float = None, retry_after:int = 1, recorded:str = None,
+                 certfile:str = None, keepalive_requests:int = None, images:int = None, gzip:bool = False):
+        super().__init__(("127.0.0.1", port), MockStoreHandler)
+        self.tls = certfile is not None
+        if self.tls:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.keepalive_requests = keepalive_requests
+        self.connections = 0
+        self.resumed_sessions = 0
+        self.app_padding_kb = app_padding_kb
+        self.etags = etags
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.recorded = recorded
+        self.rate_limited = 0
+        self._tokens = rate_limit or 0
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        # app_id -> version, changed pages get a different body.
+        self.versions = {}
+        # Category slug -> (first app_id, number of games) of the listings and category pages.
+        self.categories = {}
+        # Category slug -> name in the index.
+        self.category_names = {}
+        self.images = images
+        self.gzip = gzip
+        self.image_requests = 0
+        # Region (cc) -> app page requests.
+        self.app_requests = collections.Counter()
+        self.listing_requests = 0
+        self.details_requests = 0
+        # Listing requests starting past the last game of the category.
+        self.wasted_requests = 0
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f"{'https' if self.tls else 'http'}://127.0.0.1:{self.server_address[1]}"
+
+    def get_request(self):
+        """Accepts a connection, doing the TLS handshake."""
+        connection, address = super().get_request()
+        self.connections += 1
+        if self.tls and connection.session_reused:
+            self.resumed_sessions += 1
+        return connection, address
+
+    def allow_request(self) -> bool:
+        """Token bucket of the rate limit."""
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens < 1:
+                self.rate_limited += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    def saved_page(self, *path:str) -> bytes:
+        """Body of a recorded page, None if there is none."""
+        if self.recorded is None:
+            return None
+        path = os.path.join(self.recorded, *path)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as page_file:
+            return page_file.read()
+
+    def index(self, query:dict = None) -> bytes:
+        saved = self.saved_page("index.html")
+        if saved is not None:
+            return saved
+        return pages.index_page({
+            self.category_names.get(slug, slug): f"{self.url}/category/{slug}/" for slug in self.categories
+        }).encode("utf-8")
+
+    def app(self, app_id:str, query:dict = None) -> bytes:
+        cc = (query or {}).get("cc", "ES").upper()
+        self.app_requests[cc] += 1
+        saved = self.saved_page("app", f"{app_id}.html")
+        if saved is not None:
+            return saved
+        return self.app_version(app_id, self.versions.get(int(app_id), 0), cc)
+
+    @functools.lru_cache(maxsize=4096)
+    def app_version(self, app_id:str, version:int, cc:str = "ES") -> bytes:
+        page = pages.localize_prices(pages.app_page(int(app_id), padding_kb=self.app_padding_kb), cc)
+        if version:
+            page += f"<!-- version {version} -->"
+        if self.images:
+            page = page.replace("https://cdn.example.com/", f"{self.url}/cdn/")
+        return page.encode("utf-8")
+
+    def image(self, app_id:str, name:str, query:dict = None) -> bytes:
+        if not self.images:
+            return None
+        self.image_requests += 1
+        return self.image_content(int(app_id) % self.images, name)
+
+    @functools.lru_cache(maxsize=1024)
+    def image_content(self, seed:int, name:str) -> bytes:
+        return pages.png_image(f"{seed}/{name}")
+
+    def category_page(self, slug:str, query:dict = None) -> bytes:
+        if slug not in self.categories:
+            return None
+        offset = int(query.get("offset", 0))
+        start_id, total = self.categories[slug]
+        self.listing_requests += 1
+        if offset >= total:
+            self.wasted_requests += 1
+        saved = self.saved_page("category", slug, f"{offset}.html")
+        if saved is not None:
+            return saved
+        return pages.listing_page(start_id + offset, max(0, min(12, total - offset))).encode("utf-8")
+
+    def category_listing(self, query:dict) -> bytes:
+        if query.get("category") not in self.categories:
+            return None
+        start_id, total = self.categories[query["category"]]
+        self.listing_requests += 1
+        if int(query.get("start", 0)) >= total:
+            self.wasted_requests += 1
+        saved = self.saved_page("listing", query["category"], f"{int(query.get('start', 0))}.json")
+        if saved is not None:
+            return saved
+        return pages.listing_json(start_id, int(query.get("start", 0)), int(query.get("count", 12)), total).encode("utf-8")
+
+    def app_details(self, query:dict) -> bytes:
+        if not query.get("appids", "").isdigit():
+            return None
+        self.details_requests += 1
+        return pages.app_details(int(query["appids"])).encode("utf-8")
+
+    def change(self, app_id:int):
+        """Changes the page of a game."""
+        self.versions[app_id] = self.versions.get(app_id, 0) + 1
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def etag(body:bytes) -> str:
+        return '"%s"' % hashlib.md5(body).hexdigest()
+
+    def start(self) -> "MockStore":
+        """Serves in a daemon thread."""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--recorded", help="Folder of saved store pages")
+    args = parser.parse_args()
+    store = MockStore(args.port, latency=args.latency, rate_limit=args.rate_limit, recorded=args.recorded)
+    print(f"Serving on {store.url}")
+    store.serve_forever()
@@ -0,0 +1,139 @@
+"""Per-item Python parsing against the vectorized normalization of
+games_scraper.normalize, on synthetic games_reduced rows with Spanish strings
+("1.234,56€", "-35%", "| 1.234 reseñas", "12 ABR 2023").
+
+    per item     extractors.parse_price/parse_int/parse_percent and
+                 normalize.parse_date on every row
+    vectorized   normalize.normalize_frame on frames of --chunk-size rows,
+                 the time to build the frames from the rows is shown apart
+
+Both results are checked to be equal. Before that, a JSON lines feed of the
+rows is normalized into Parquet with normalize_file in a separate process,
+reporting its peak RSS, for every --file-chunk-sizes.
+
+Usage (from the source folder):
+    python -m benchmarks.normalize [--rows 1000000] [--chunk-size 100000]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from games_scraper.data_io import write_records
+from games_scraper.extractors import parse_int, parse_percent, parse_price
+from games_scraper.normalize import normalize_file, normalize_frame, parse_date
+
+MONTHS = ["ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC"]
+
+
+def spanish_price(rng:random.Random) -> str:
+    cents = rng.randrange(99, 500000)
+    units = f"{cents // 100:,}".replace(",", ".")
+    return f"{units},{cents % 100:02d}€"
+
+
+def rows(count:int, seed:int = 0):
+    rng = random.Random(seed)
+    for app_id in range(count):
+        discounted = rng.random() < 0.3
+        yield {
+            "id": app_id,
+            "name": f"Game {app_id}",
+            "price": spanish_price(rng) if rng.random() > 0.05 else "Gratuito",
+            "offert": f"-{rng.choice((10, 25, 35, 50, 75))}%" if discounted else None,
+            "offert_price": spanish_price(rng) if discounted else None,
+            "reviews_number": f"| {rng.randrange(0, 2000000):,} reseñas".replace(",", "."),
+            "date": (f"{rng.randint(1, 28)} {rng.choice(MONTHS)} {rng.randint(2000, 2023)}"
+                     if rng.random() > 0.02 else "Próximamente"),
+        }
+
+
+def cents(price):
+    return None if price is None else int(price * 100)
+
+
+def per_item(records:list) -> list:
+    return [
+        (cents(parse_price(row["price"])), parse_percent(row["offert"]), cents(parse_price(row["offert_price"])),
+         parse_int(row["reviews_number"]), parse_date(row["date"]))
+        for row in records
+    ]
+
+
+def frames(records:list, chunk_size:int) -> list:
+    return [pd.DataFrame.from_records(records[start:start + chunk_size]) for start in range(0, len(records), chunk_size)]
+
+
+def frame_rows(frames:list) -> list:
+    """Rows of the normalized frames as per_item tuples."""
+    result = []
+    for frame in frames:
+        columns = [frame[name].astype(object).where(frame[name].notna(), None)
+                   for name in ("price_cents", "offert", "offert_price_cents", "reviews_number", "date")]
+        result.extend(zip(*columns))
+    return result
+
+
+def child(input_file:str, output_file:str, chunk_size:int) -> dict:
+    t0 = time.perf_counter()
+    count = normalize_file(input_file, output_file, chunk_size)
+    return {
+        "rows": count,
+        "seconds": time.perf_counter() - t0,
+        # ru_maxrss is in KiB on Linux.
+        "rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--file-chunk-sizes", type=int, nargs="+", default=[20000, 100000, 1000000])
+    parser.add_argument("--child", nargs=3, metavar=("INPUT", "OUTPUT", "CHUNK_SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        input_file, output_file, chunk_size = args.child
+        print(json.dumps(child(input_file, output_file, int(chunk_size))))
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The file runs go first: children inherit the peak RSS of the parent.
+        input_file = os.path.join(tmp, "games_reduced.jsonl")
+        write_records(input_file, rows(args.rows), fsync=False)
+        print(f"normalize_file, {args.rows} rows, JSON lines ({os.path.getsize(input_file) / 2 ** 20:.0f} MiB) -> Parquet")
+        for chunk_size in args.file_chunk_sizes:
+            output_file = os.path.join(tmp, f"normalized-{chunk_size}.parquet")
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.normalize", "--child", input_file, output_file, str(chunk_size)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            measures = json.loads(output.strip().splitlines()[-1])
+            print(f"chunks of {chunk_size:>8}  {measures['seconds']:6.2f} s "
+                  f"{measures['rows'] / measures['seconds']:>10,.0f} rows/s  peak RSS {measures['rss_mib']:6.0f} MiB")
+
+    records = list(rows(args.rows))
+    t0 = time.perf_counter()
+    expected = per_item(records)
+    item_seconds = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    chunks = frames(records, args.chunk_size)
+    frames_seconds = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    result = [normalize_frame(chunk) for chunk in chunks]
+    vector_seconds = time.perf_counter() - t0
+    mismatches = sum(1 for a, b in zip(expected, frame_rows(result)) if tuple(a) != tuple(b))
+
+    print(f"\nIn memory, {args.rows} rows")
+    print(f"{'per item':<12} {item_seconds:7.2f} s {args.rows / item_seconds:>12,.0f} rows/s")
+    print(f"{'vectorized':<12} {vector_seconds:7.2f} s {args.rows / vector_seconds:>12,.0f} rows/s  "
+          f"x{item_seconds / vector_seconds:.1f}, {mismatches} mismatches "
+          f"(+{frames_seconds:.2f} s building the frames)")
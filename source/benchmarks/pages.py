@@ -0,0 +1,294 @@
+"""Synthetic store pages with the same structure the spiders' selectors expect.
+
+They are used by the benchmarks when no saved pages are given. The content is
+made up, only the markup around the fields follows the real store pages.
+Images are PNG files of random pixels.
+"""
+import html
+import json
+import random
+import re
+import struct
+import zlib
+
+
+def index_page(categories:dict) -> str:
+    """The store index (store.steampowered.com) with its genre menu.
+
+    Args:
+        categories (dict): Category name -> category page url.
+    """
+    items = "".join(
+        f'<a class="popup_menu_item" href="{html.escape(url)}?snr=1_4_4__12">\n\t\t\t{html.escape(name)}\t\t</a>'
+        for name, url in categories.items()
+    )
+    return f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Bienvenido a Steam</title></head>
+<body><div class="home_page_body_ctn">
+<div class="popup_block_new flyout_tab_flyout" id="genre_flyout"><div class="popup_body popup_menu_twocol_new">
+<div class="popup_menu popup_menu_browse"><a class="popup_menu_item" href="https://store.steampowered.com/search/">Buscar</a></div>
+<div class="popup_menu popup_menu_categories">{items}<div class="popup_menu_item popup_menu_subheader">Temas</div></div>
+</div></div>
+</div></body></html>
+"""
+
+
+def app_page(app_id:int, padding_kb:int = 300, discounted:bool = None, dlc:int = 3) -> str:
+    """An app page (store.steampowered.com/app/<app_id>).
+
+    Args:
+        app_id (int): Game ID, everything else is derived from it.
+        padding_kb (int): Size of the filler (scripts and description) added to
+            get close to real page sizes.
+        discounted (bool, optional): Whether the game has a discount. By default
+            one in three games is discounted.
+        dlc (int): Number of DLC rows.
+
+    Returns:
+        str: Html document.
+    """
+    rng = random.Random(app_id)
+    if discounted is None:
+        discounted = app_id % 3 == 0
+    name = f"Game {app_id}"
+    tags = "".join(
+        f'<a href="https://store.steampowered.com/tags/es/Tag{i}/" class="app_tag">\n\t\tTag {rng.randint(1, 400)}\t\t\t\t\t\t\t\t\t\t\t\t</a>'
+        for i in range(rng.randint(5, 20))
+    )
+    if discounted:
+        purchase = (
+            '<div class="game_purchase_action_bg"><div class="discount_block game_purchase_discount">'
+            f'<div class="discount_pct">-{rng.randint(10, 90)}%</div><div class="discount_prices">'
+            '<div class="discount_original_price">19,99€</div><div class="discount_final_price">12,99€</div>'
+            '</div></div><div class="btn_addtocart"><a class="btnv6_green_white_innerfade">Añadir al carro</a></div></div>'
+        )
+    else:
+        purchase = (
+            '<div class="game_purchase_action_bg"><div class="game_purchase_price price">\n\t\t\t\t\t\t\t\t19,99€\t\t\t\t\t\t\t</div>'
+            '<div class="btn_addtocart"><a class="btnv6_green_white_innerfade">Añadir al carro</a></div></div>'
+        )
+    dlc_rows = "".join(
+        f'<a class="game_area_dlc_row" href="https://store.steampowered.com/app/{app_id + i + 1}/">'
+        f'<div class="game_area_dlc_name">\n\tDLC {i} of {name}\t</div><div class="game_area_dlc_price">\n\t{i},99€\t</div></a>'
+        for i in range(dlc)
+    )
+    languages = "".join(
+        f'<tr><td class="ellipsis">\n\tLanguage {i}\t</td>'
+        f'<td class="checkcol"><span>&#10004;</span></td><td class="checkcol">{"<span>&#10004;</span>" if i % 2 else ""}</td>'
+        f'<td class="checkcol"><span>&#10004;</span></td></tr>'
+        for i in range(rng.randint(1, 25))
+    )
+    media = "".join(
+        f'<div class="highlight_player_item"><img src="https://cdn.example.com/ss_{app_id}_{i}.jpg"></div>'
+        for i in range(rng.randint(4, 20))
+    )
+    filler = "".join(
+        f"<p>Paragraph {i} of the description of {name}. " + "Lorem ipsum dolor sit amet. " * 30 + "</p>"
+        for i in range(max(1, padding_kb * 1024 // 2 // 900))
+    )
+    script = "var g_rgData = [" + ",".join(str(rng.randint(0, 10 ** 6)) for _ in range(padding_kb * 1024 // 2 // 7)) + "];"
+
+    return f"""<!DOCTYPE html>
+<html class="responsive" lang="es">
+<head><meta charset="utf-8"><title>{name} en Steam</title><script>{script}</script></head>
+<body class="v6 app game_bg">
+<div class="page_content_ctn">
+<div class="breadcrumbs"><div class="blockbg"><a href="https://store.steampowered.com/search/">Todos los juegos</a> &gt; <a href="#">Acción</a> &gt; <a href="#"><span itemprop="name">{name}</span></a></div></div>
+<div class="apphub_AppName" id="appHubAppName">{name}</div>
+<div class="leftcol">
+<div id="highlight_player_area"><div class="highlight_movie"><video src="https://cdn.example.com/movie_{app_id}.webm"></video></div>{media}</div>
+</div>
+<div class="rightcol">
+<div class="game_header_image_ctn"><img class="game_header_image_full" src="https://cdn.example.com/apps/{app_id}/header.jpg"></div>
+<div class="game_description_snippet">
+\t\t\t\tShort description of {name}.\t\t\t</div>
+<div class="glance_ctn_responsive_left">
+<div id="userReviews" class="user_reviews">
+<div class="user_reviews_summary_row"><div class="subtitle column">Recientes:</div><div class="summary column"><span class="game_review_summary positive">Muy positivas</span><span class="responsive_hidden">\n\t\t\t\t({rng.randint(10, 9999)})\t\t\t</span><span class="review_anomaly_icon">&nbsp;*</span></div></div>
+<div class="user_reviews_summary_row"><div class="subtitle column all">Todas:</div><div class="summary column"><span class="game_review_summary positive">Mayormente positivas</span><span class="responsive_hidden">\n\t\t\t\t({rng.randint(1, 999)}.{rng.randint(100, 999)})\t\t\t</span></div></div>
+</div>
+<div class="release_date"><div class="subtitle column">Fecha de lanzamiento:</div><div class="date">{rng.randint(1, 28)} ABR {rng.randint(2005, 2023)}</div></div>
+<div class="dev_row"><div class="subtitle column">Desarrollador:</div><div class="summary column" id="developers_list"><a href="https://store.steampowered.com/developer/dev{app_id % 97}">Developer {app_id % 97}</a></div></div>
+<div class="dev_row"><div class="subtitle column">Editor:</div><div class="summary column"><a href="https://store.steampowered.com/publisher/pub{app_id % 53}">Publisher {app_id % 53}</a></div></div>
+</div>
+<div class="glance_tags popular_tags">{tags}</div>
+</div>
+<div class="game_area_purchase"><div class="game_area_purchase_game_wrapper"><div class="game_area_purchase_game"><h1>Comprar {name}</h1><div class="game_purchase_action">{purchase}</div></div></div></div>
+<div class="game_area_dlc_section"><div class="gameDlcBlocks">{dlc_rows}</div></div>
+<div class="game_page_autocollapse game_area_description" id="game_area_description"><h2>Acerca de este juego</h2>{filler}</div>
+<div class="block responsive_apppage_details_right"><table class="game_language_options" cellpadding="0" cellspacing="0"><tbody><tr><th></th><th>Interfaz</th><th>Voces</th><th>Subtítulos</th></tr>{languages}</tbody></table></div>
+<div class="details_block"><div id="genresAndManufacturer"><b>Título:</b><span>{name}</span><b>Género:</b><span data-panel=""><a href="https://store.steampowered.com/genre/Acci%C3%B3n/">Acción</a></span></div>
+<div class="linkbar_ctn"><a class="linkbar" href="https://steamcommunity.com/linkfilter/?url=https://www.example.com/game{app_id}" target="_blank">Visitar el sitio web</a></div></div>
+<div id="game_area_metascore"><div class="score high">\n\t\t\t\t{rng.randint(40, 99)}\t\t\t</div></div>
+<div id="game_area_metalink"><a href="https://www.metacritic.com/game/pc/game-{app_id}" target="_blank">Leer reseñas críticas</a></div>
+</div>
+</body>
+</html>
+"""
+
+
+# Price format and exchange rate (from euros) of the regions of localize_prices.
+REGIONS = {
+    "ES": ("{units},{cents:02d}€", 1.0),
+    "DE": ("{units},{cents:02d}€", 1.0),
+    "US": ("${units}.{cents:02d}", 1.1),
+    "GB": ("£{units}.{cents:02d}", 0.87),
+}
+_EURO_PRICE = re.compile(r"(\d+),(\d\d)€")
+
+
+def localize_prices(page:str, cc:str) -> str:
+    """A page with its prices ("19,99€") in the currency of a region of REGIONS."""
+    price_format, rate = REGIONS.get(cc, REGIONS["ES"])
+    if rate == 1.0:
+        return page
+
+    def convert(match):
+        cents = round((int(match.group(1)) * 100 + int(match.group(2))) * rate)
+        return price_format.format(units=cents // 100, cents=cents % 100)
+    return _EURO_PRICE.sub(convert, page)
+
+
+PLATFORM_SVGS = (
+    '<svg class="SVGIcon_Button SVGIcon_WindowsLogo"></svg>',
+    '<svg class="SVGIcon_Button SVGIcon_AppleLogo"></svg>',
+    '<svg class=""></svg>',
+    '<svg class="SVGIcon_Button SVGIcon_SteamLogo"></svg>',
+)
+
+
+def listing_game(app_id:int) -> dict:
+    """Data of a game in the category listings. The rendered card and the JSON
+    row of a game show the same data, as the store does."""
+    rng = random.Random(app_id)
+    return {
+        "tags": [f"Tag {rng.randint(1, 400)}" for _ in range(rng.randint(1, 5))],
+        # Number of platforms: windows, mac, linux and steam, in that order.
+        "platforms": rng.randint(1, len(PLATFORM_SVGS)),
+        "discount": rng.randint(10, 90) if app_id % 3 == 0 else None,
+        "date": f"{rng.randint(1, 28)} ABR {rng.randint(2005, 2023)}",
+        "reviews": f"{rng.randint(1, 99)}.{rng.randint(100, 999)}",
+        "positive": rng.randint(80, 94),
+        "description": f"Short description of game {app_id}.",
+    }
+
+
+def listing_card(app_id:int) -> str:
+    """A game card of a category page as rendered by the browser."""
+    game = listing_game(app_id)
+    tags = "".join(f'<a href="#">{tag}</a>' for tag in game["tags"])
+    platforms = "".join(PLATFORM_SVGS[:game["platforms"]])
+    if game["discount"] is not None:
+        price = (
+            '<div class="salepreviewwidgets_StoreSaleDiscountedPriceCtn">'
+            '<div class="salepreviewwidgets_BaseDiscount"></div>'
+            f'<div class="salepreviewwidgets_Discounted_35-Ub"><div class="salepreviewwidgets_StoreSaleDiscountBox">-{game["discount"]}%</div>'
+            '<div class="salepreviewwidgets_StoreSalePrices"><div class="salepreviewwidgets_StoreOriginalPrice">19,99€</div>'
+            '<div class="salepreviewwidgets_StoreSalePriceBox">12,99€</div></div></div></div>'
+        )
+    else:
+        price = (
+            '<div class="salepreviewwidgets_StoreSaleDiscountedPriceCtn">'
+            '<div class="salepreviewwidgets_BaseDiscount"></div><div class="salepreviewwidgets_StoreSalePriceBox_Wh0L8">'
+            '<div class="salepreviewwidgets_StoreSalePriceBox">19,99€</div></div></div>'
+        )
+    return (
+        '<div class="salepreviewwidgets_SaleItemBrowserRow_y9MSd"><div class="salepreviewwidgets_SaleItemDefaultCapsuleDisplay">'
+        '<div class="salepreviewwidgets_StoreSaleWidgetOuterContainer"><div class="salepreviewwidgets_StoreSaleWidgetContainer">'
+        f'<div class="salepreviewwidgets_StoreSaleWidgetImage"><a href="https://store.steampowered.com/app/{app_id}/Game_{app_id}/?snr=1_240_4_">'
+        '<div class="salepreviewwidgets_CapsuleImageCtn"><div class="salepreviewwidgets_Overlay"></div>'
+        f'<div class="salepreviewwidgets_CapsuleImage"><img src="https://cdn.example.com/apps/{app_id}/capsule_231x87.jpg"></div>'
+        '</div></a></div>'
+        '<div class="salepreviewwidgets_StoreSaleWidgetRight">'
+        '<div class="salepreviewwidgets_TitleCtn"></div>'
+        f'<div class="salepreviewwidgets_StoreSaleWidgetTitle"><a href="#"><div>Game {app_id}</div></a></div>'
+        f'<div class="salepreviewwidgets_StoreSaleWidgetTags"><div class="salepreviewwidgets_Tags">{tags}</div>'
+        f'<div class="salepreviewwidgets_ReleaseDate"><div>{game["date"]}</div><span>{platforms}</span></div>'
+        '<a class="salepreviewwidgets_ReviewScore" href="#"><div class="salepreviewwidgets_ReviewScoreCtn">'
+        f'<div class="salepreviewwidgets_ReviewScoreValue">Muy positivas</div><div class="salepreviewwidgets_ReviewScoreCount">| {game["reviews"]} reseñas</div>'
+        '</div></a></div>'
+        f'<div class="salepreviewwidgets_StoreSaleWidgetShortDesc">{game["description"]}</div>'
+        f'<div class="salepreviewwidgets_StoreActionWidgetContainer">{price}</div>'
+        '</div></div></div></div></div>'
+    )
+
+
+def listing_page(start_id:int, cards:int = 12) -> str:
+    """A rendered category page with cards for start_id, start_id + 1, ...
+    A page without cards has the "no results" element."""
+    rows = "".join(listing_card(app_id) for app_id in range(start_id, start_id + cards))
+    empty = '<div class="saleitembrowser_EmptyResults_3_IxA">No hay resultados</div>' if cards == 0 else ""
+    return f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Acción</title></head>
+<body><div class="saleitembrowser_SaleItemBrowserContainer">{rows}{empty}</div></body></html>
+"""
+
+
+# Platform classes of the JSON rows, in the order of PLATFORM_SVGS.
+ROW_PLATFORMS = ("win", "mac", "linux", "steamplay")
+
+
+def listing_row(app_id:int) -> str:
+    """A game row of the paged JSON listing (results_html). Rows have the
+    release date and the review summary (in its tooltip), not the description."""
+    game = listing_game(app_id)
+    tags = "".join(f'<span class="top_tag">{", " if i else ""}{tag}</span>' for i, tag in enumerate(game["tags"]))
+    platforms = "".join(f'<span class="platform_img {name}"></span>' for name in ROW_PLATFORMS[:game["platforms"]])
+    if game["discount"] is not None:
+        price = (
+            f'<div class="discount_block"><div class="discount_pct">-{game["discount"]}%</div>'
+            '<div class="discount_prices"><div class="discount_original_price">19,99€</div>'
+            '<div class="discount_final_price">12,99€</div></div></div>'
+        )
+    else:
+        price = (
+            '<div class="discount_block no_discount"><div class="discount_prices">'
+            '<div class="discount_final_price">19,99€</div></div></div>'
+        )
+    return (
+        f'<a href="https://store.steampowered.com/app/{app_id}/Game_{app_id}/?snr=1_241_4" class="tab_item" data-ds-appid="{app_id}">'
+        f'<div class="tab_item_cap"><img class="tab_item_cap_img" src="https://cdn.example.com/apps/{app_id}/capsule_184x69.jpg"></div>'
+        f'{price}<div class="tab_item_content"><div class="tab_item_name">Game {app_id}</div>'
+        f'<div class="tab_item_details">{platforms}<div class="tab_item_top_tags">{tags}</div></div>'
+        f'<div class="search_released">{game["date"]}</div>'
+        '<div class="search_reviewscore"><span class="search_review_summary positive" data-tooltip-html="Muy positivas'
+        f'&lt;br&gt;El {game["positive"]} % de las {game["reviews"]} reseñas de los usuarios sobre este juego son positivas.">'
+        '</span></div></div></a>'
+    )
+
+
+def listing_json(start_id:int, start:int, count:int, total:int) -> str:
+    """A page of the JSON listing of a category with total games, whose ids go
+    from start_id to start_id + total - 1."""
+    rows = "".join(listing_row(start_id + i) for i in range(start, min(start + count, total)))
+    return json.dumps({
+        "success": True,
+        "start": start,
+        "returned_parameters": {"count": count},
+        "total_count": total,
+        "results_html": f'<div id="NewReleasesRows">{rows}</div>',
+    })
+
+
+def app_details(app_id:int) -> str:
+    """Basic app details (store api/appdetails?filters=basic) of a game, its
+    short description is the one of its category card."""
+    return json.dumps({
+        str(app_id): {
+            "success": True,
+            "data": {"type": "game", "name": f"Game {app_id}", "steam_appid": app_id,
+                     "short_description": html.escape(listing_game(app_id)["description"])},
+        },
+    })
+
+
+def png_image(seed, width:int = 230, height:int = 108) -> bytes:
+    """A PNG of random RGB pixels, the same for the same seed."""
+    rng = random.Random(seed)
+    rows = b"".join(b"\x00" + rng.randbytes(3 * width) for _ in range(height))
+
+    def chunk(kind:bytes, data:bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows, 1)) + chunk(b"IEND", b"")
@@ -0,0 +1,110 @@
+"""Exporting and loading a month of GamesFull items as JSON lines and with the
+ParquetPipeline.
+
+Items are extracted from --games synthetic app pages once and repeated for
+--days crawls. Memory is the tracemalloc peak while exporting.
+
+Usage (from the source folder):
+    python -m benchmarks.parquet_export [--games 2000] [--days 30]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pyarrow.parquet as pq
+from scrapy.exporters import JsonLinesItemExporter
+from scrapy.utils.test import get_crawler
+
+from benchmarks import pages
+from games_scraper.pipelines import ParquetPipeline
+from games_scraper.spiders.games_full import GamesFull, extract_app_page
+
+
+def folder_size(folder:str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names)
+
+
+def game_items(games:int) -> list:
+    items = []
+    for app_id in range(1000, 1000 + games):
+        item = extract_app_page(pages.app_page(app_id, padding_kb=1))
+        item.app_id = app_id
+        items.append(item)
+    return items
+
+
+def month_items(items:list, days:int):
+    for _ in range(days):
+        yield from items
+
+
+def export_json_lines(items, path:str):
+    """Same as a "jsonlines" feed"""
+    with open(path, "wb") as feed:
+        exporter = JsonLinesItemExporter(feed, ensure_ascii=False)
+        exporter.start_exporting()
+        for item in items:
+            exporter.export_item(item)
+        exporter.finish_exporting()
+
+
+def export_parquet(items, folder:str, row_group_size:int):
+    crawler = get_crawler(GamesFull)
+    spider = GamesFull.from_crawler(crawler)
+    pipeline = ParquetPipeline(crawler.stats, folder, row_group_size=row_group_size)
+    pipeline.open_spider(spider)
+    for item in items:
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+
+
+def measure(func, *args):
+    """Seconds and peak traced memory (MiB) of func(*args)."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def load_json_lines(path:str) -> int:
+    with open(path, encoding="utf-8") as feed:
+        return len([json.loads(line) for line in feed])
+
+
+def load_parquet(folder:str) -> int:
+    return pq.read_table(folder).num_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--row-group-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "games_full.jl")
+        parquet_folder = os.path.join(tmp, "parquet")
+        total = args.games * args.days
+        items = game_items(args.games)
+
+        write_json = measure(export_json_lines, month_items(items, args.days), json_path)
+        write_parquet = measure(export_parquet, month_items(items, args.days), parquet_folder, args.row_group_size)
+        # Loading is not traced, tracemalloc slows it down.
+        t0 = time.perf_counter()
+        assert load_json_lines(json_path) == total
+        read_json = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        assert load_parquet(os.path.join(parquet_folder, GamesFull.name)) == total
+        read_parquet = time.perf_counter() - t0
+
+        print(f"{total} items ({args.games} games x {args.days} days)")
+        print(f"{'':>10}  {'write s':>8}  {'peak MiB':>8}  {'size MiB':>8}  {'load s':>7}")
+        print(f"{'json lines':>10}  {write_json[0]:8.2f}  {write_json[1]:8.1f}  {os.path.getsize(json_path) / 2 ** 20:8.1f}  {read_json:7.2f}")
+        print(f"{'parquet':>10}  {write_parquet[0]:8.2f}  {write_parquet[1]:8.1f}  {folder_size(parquet_folder) / 2 ** 20:8.1f}  {read_parquet:7.2f}")
@@ -0,0 +1,90 @@
+"""GamesFull crawl throughput against the mock store, parsing in the reactor
+thread and in 1..N ParseOffload processes.
+
+Every run is a separate process crawling --pages app pages from a local
+MockStore with no download delay.
+
+Usage (from the source folder):
+    python -m benchmarks.parse_offload [--pages 400] [--workers 1 2 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+
+# Settings of the benchmark crawls, on top of the project settings.
+CRAWL_SETTINGS = {
+    "LOG_FILE": None,
+    "LOG_LEVEL": "WARNING",
+    "ROBOTSTXT_OBEY": False,
+    "DOWNLOAD_DELAY": 0,
+    "THROTTLE_ENABLED": False,
+    "CONCURRENT_REQUESTS": 32,
+    "CONCURRENT_REQUESTS_PER_DOMAIN": 32,
+    "TELNETCONSOLE_ENABLED": False,
+    "ITEM_PIPELINES": {},
+    "DOWNLOADER_MIDDLEWARES": {"games_scraper.middlewares.BrowserPoolMiddleware": None},
+}
+
+
+def crawl(store_url:str, input_file:str, workers:int) -> dict:
+    """Runs the crawl in this process and returns its stats. workers=0 parses
+    in the reactor thread."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+    settings.set("PARSE_OFFLOAD_ENABLED", workers > 0)
+    settings.set("PARSE_OFFLOAD_WORKERS", workers)
+    settings.set("PARSE_OFFLOAD_MAX_INFLIGHT", 4 * workers)
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(GamesFull)
+    process.crawl(crawler, input_file=input_file)
+    t0 = time.perf_counter()
+    process.start()
+    return {
+        "seconds": time.perf_counter() - t0,
+        "items": crawler.stats.get_value("item_scraped_count", 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--child", nargs=3, metavar=("STORE_URL", "INPUT_FILE", "WORKERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        store_url, input_file, workers = args.child
+        print(json.dumps(crawl(store_url, input_file, int(workers))))
+        sys.exit()
+
+    store = MockStore().start()
+    ids = list(range(1000, 1000 + args.pages))
+    for app_id in ids:
+        store.app(str(app_id))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "ids.txt")
+        with open(input_file, "w") as ids_file:
+            ids_file.writelines(f"{id}\n" for id in ids)
+
+        for workers in [0] + sorted(set(args.workers)):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.parse_offload", "--child", store.url, input_file, str(workers)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            label = "reactor" if workers == 0 else f"{workers} procs"
+            print(f"{label:>9}  {result['items']:>5} items  {result['items'] / result['seconds']:7.1f} items/s")
+    store.stop()
@@ -0,0 +1,91 @@
+"""Per-item cost of the crawled ids dedup.
+
+Compares SeenIds (index + append-only log) with the list based approach the
+spiders used before, `id in ids` followed by `ids = ids + [id]`, and the
+memory and false positives of the SeenIds indexes (a set, the default bitmap
+and a Bloom filter) with --max-ids ids below 4 * --max-ids.
+
+Usage (from the source folder):
+    python -m benchmarks.seen_ids --max-ids 5000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from games_scraper.id_index import new_id_index
+from games_scraper.seen_ids import SeenIds
+
+
+def bench_seen_ids(max_ids: int, step: int, path: str, index: str):
+    """Adds max_ids random ids reporting the mean cost per id of every step."""
+    seen = SeenIds(path, index=new_id_index(index, max_ids))
+    ids = random.sample(range(max_ids * 4), max_ids)
+    for start in range(0, max_ids, step):
+        t0 = time.perf_counter()
+        for id in ids[start:start + step]:
+            if id not in seen:
+                seen.add(id)
+        elapsed = time.perf_counter() - t0
+        print(f"{index:<9} {start + step:>10} ids  {elapsed / step * 1e9:8.0f} ns/id")
+    seen.close()
+
+    t0 = time.perf_counter()
+    reloaded = SeenIds(path, index=new_id_index(index, max_ids))
+    print(f"reload    {len(reloaded):>10} ids  {time.perf_counter() - t0:8.3f} s with the saved index "
+          f"({os.path.getsize(path) / 2 ** 20:.1f} MiB log)")
+    os.remove(reloaded.index_path)
+    t0 = time.perf_counter()
+    SeenIds(path, index=new_id_index(index, max_ids))
+    print(f"reload    {len(reloaded):>10} ids  {time.perf_counter() - t0:8.3f} s from the log")
+    reloaded.close()
+    os.remove(path)
+    os.remove(reloaded.index_path)
+
+
+def set_bytes(ids) -> int:
+    """Memory of a set of ids: the table and the int objects."""
+    table = set(ids)
+    return sys.getsizeof(table) + sum(sys.getsizeof(id) for id in table)
+
+
+def bench_indexes(max_ids: int, fp_rate: float):
+    ids = random.sample(range(max_ids * 4), max_ids)
+    print(f"{'set':<9} {set_bytes(ids) / 2 ** 20:8.1f} MiB")
+    known = set(ids)
+    unseen = [id for id in random.sample(range(max_ids * 4), 200_000) if id not in known][:100_000]
+    for kind in ("bitmap", "bloom"):
+        index = new_id_index(kind, max_ids, fp_rate)
+        for id in ids:
+            index.add(id)
+        false_positives = sum(1 for id in unseen if id in index)
+        print(f"{kind:<9} {index.nbytes / 2 ** 20:8.1f} MiB  false positives {false_positives / len(unseen):.4f}")
+
+
+def bench_list(max_ids: int, step: int):
+    """Same loop with the old list state. Quadratic, keep max_ids small."""
+    state = {}
+    ids = random.sample(range(max_ids * 4), max_ids)
+    for start in range(0, max_ids, step):
+        t0 = time.perf_counter()
+        for id in ids[start:start + step]:
+            if id not in state.get('ids', []):
+                state['ids'] = state.get('ids', []) + [id]
+        elapsed = time.perf_counter() - t0
+        print(f"list      {start + step:>10} ids  {elapsed / step * 1e9:8.0f} ns/id")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-ids", type=int, default=5_000_000)
+    parser.add_argument("--list-max-ids", type=int, default=20_000)
+    parser.add_argument("--fp-rate", type=float, default=0.001, help="Of the Bloom filter")
+    args = parser.parse_args()
+
+    bench_list(args.list_max_ids, args.list_max_ids // 5)
+    with tempfile.TemporaryDirectory() as tmp:
+        for index in ("bitmap", "bloom"):
+            bench_seen_ids(args.max_ids, args.max_ids // 5, os.path.join(tmp, "seen_ids.bin"), index)
+    bench_indexes(args.max_ids, args.fp_rate)
@@ -0,0 +1,130 @@
+"""Insertion and query speed of GameDatabase (SQLitePipeline) with synthetic
+games_reduced items.
+
+    row by row, rollback journal   a transaction per item, SQLite defaults
+                                   (journal_mode=DELETE, synchronous=FULL)
+    row by row, WAL                a transaction per item, WAL
+    batched, WAL                   SQLITE_BATCH_SIZE items per transaction,
+                                   as SQLitePipeline does
+
+The row by row cases write --sample items, the batched one --rows items. A
+second crawl of the --rows games follows, with --changed of them at a new
+price: only those get a price_history row. Then it times the "latest price of
+an app" and "price over time" queries and prints their query plans.
+
+Usage (from the source folder):
+    python -m benchmarks.sqlite_storage [--rows 1000000] [--batch-size 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+from games_scraper.game_db import GameDatabase, game_record
+from games_scraper.items import GamesReducedItem
+
+TAGS = ["Action", "Indie", "Adventure", "RPG", "Strategy", "Simulation", "Casual", "Puzzle", "Multiplayer", "Singleplayer"]
+PLATFORMS = ["windows", "mac", "linux"]
+
+
+def items(count:int, day:int = 0, changed:float = 0.0, seed:int = 0):
+    """Games 1..count as seen on a day, changed of them with a price changed since day 0."""
+    rng = random.Random(seed + day)
+    for app_id in range(1, count + 1):
+        game = random.Random(app_id)
+        price = Decimal(game.randrange(99, 6000)) / 100
+        offert = offert_price = None
+        if day and rng.random() < changed:
+            offert = rng.choice((10, 25, 50, 75))
+            offert_price = (price * (100 - offert) / 100).quantize(Decimal("0.01"))
+        yield GamesReducedItem(
+            id=app_id,
+            name=f"Game {app_id}",
+            url=f"https://store.steampowered.com/app/{app_id}/",
+            img_src=f"https://cdn.example.com/apps/{app_id}/capsule_231x87.jpg",
+            tags=game.sample(TAGS, 3),
+            platforms=PLATFORMS[:game.randint(1, 3)],
+            reviews_number=game.randrange(0, 100000),
+            price=price,
+            offert=offert,
+            offert_price=offert_price,
+        )
+
+
+def write(db:GameDatabase, items, batch_size:int, day:int) -> dict:
+    """Writes the items as SQLitePipeline does, returns the counts and the time."""
+    observed_at = 86400.0 * day
+    written = {'games': 0, 'history': 0}
+    batch = []
+    t0 = time.perf_counter()
+    for item in items:
+        batch.append(game_record(item, observed_at))
+        if len(batch) >= batch_size:
+            for key, value in db.write(batch).items():
+                written[key] += value
+            batch = []
+    if batch:
+        for key, value in db.write(batch).items():
+            written[key] += value
+    written['seconds'] = time.perf_counter() - t0
+    return written
+
+
+def time_queries(db:GameDatabase, rows:int, queries:int) -> dict:
+    rng = random.Random(1)
+    times = {}
+    for name, query in (("latest price", db.latest_price), ("price over time", db.price_history)):
+        app_ids = [rng.randint(1, rows) for _ in range(queries)]
+        t0 = time.perf_counter()
+        for app_id in app_ids:
+            query(app_id)
+        times[name] = (time.perf_counter() - t0) / queries
+    return times
+
+
+def print_result(name:str, rows:int, result:dict):
+    print(f"{name:<30} {rows:>9} items {result['seconds']:8.2f} s {rows / result['seconds']:>10,.0f} items/s  "
+          f"{result['games']:>9} games  {result['history']:>8} history rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="Games written batched")
+    parser.add_argument("--sample", type=int, default=5000, help="Games written row by row")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--changed", type=float, default=0.1, help="Games with a new price in the second crawl")
+    parser.add_argument("--queries", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = GameDatabase(os.path.join(tmp, "journal.db"))
+        db.db.execute("PRAGMA journal_mode=DELETE")
+        db.db.execute("PRAGMA synchronous=FULL")
+        print_result("row by row, rollback journal", args.sample, write(db, items(args.sample), 1, 0))
+        db.close()
+
+        db = GameDatabase(os.path.join(tmp, "wal.db"))
+        print_result("row by row, WAL", args.sample, write(db, items(args.sample), 1, 0))
+        db.close()
+
+        path = os.path.join(tmp, "games.db")
+        db = GameDatabase(path)
+        print_result("batched, WAL", args.rows, write(db, items(args.rows), args.batch_size, 0))
+        print_result("batched, WAL, second crawl", args.rows,
+                     write(db, items(args.rows, day=1, changed=args.changed), args.batch_size, 1))
+        rows = {table: db.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("games", "price_history", "tags", "platforms")}
+        print("rows: " + ", ".join(f"{table} {count}" for table, count in rows.items())
+              + f", file {os.path.getsize(path) / 2 ** 20:.0f} MiB")
+
+        print()
+        for name, seconds in time_queries(db, args.rows, args.queries).items():
+            print(f"{name:<16} {1e6 * seconds:8.1f} µs/query")
+        for sql in ("SELECT price, discount, final_price FROM games WHERE app_id = ?",
+                    "SELECT observed_at, price, discount, final_price FROM price_history WHERE app_id = ? ORDER BY observed_at",
+                    "SELECT * FROM price_history WHERE observed_at >= ?"):
+            plan = db.db.execute(f"EXPLAIN QUERY PLAN {sql}", (1,)).fetchall()
+            print(f"{sql}\n    {'; '.join(row[-1] for row in plan)}")
+        db.close()
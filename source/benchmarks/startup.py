@@ -0,0 +1,100 @@
+"""Start-up time of every spider: from launching the interpreter until the
+engine starts (every extension, middleware and pipeline loaded and the spider
+opened), with the project settings as `scrapy crawl` uses them.
+
+Each start is a new process run in a temporary folder, so the data/ files of
+the crawl go there. The store links point to a closed local port and the
+spider is closed as soon as the engine starts, nothing is crawled. For each
+spider it reports the median of --repeat starts, the modules imported and
+which of the heavy dependencies were, and whether the browser pool started.
+
+Usage (from the source folder):
+    python -m benchmarks.startup [--repeat 5] [--spiders categories games_full]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SPIDERS = ("categories", "games_reduced", "games_full")
+HEAVY_MODULES = ("selenium", "scrapy_selenium", "bs4", "pandas", "numpy", "pyarrow", "PIL")
+# Nothing listens there, requests sent before the spider closes fail at once.
+CLOSED_PORT_URL = "http://127.0.0.1:9"
+
+
+def start(spider_name:str, launched:float) -> dict:
+    """Starts the crawl of a spider in this process, stopping it when the engine
+    starts, and returns its measures."""
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    settings.set("LOG_LEVEL", "CRITICAL")
+    settings.set("INSTRUMENTATION_ENABLED", False)
+    settings.set("LINKS", {name: url.replace("https://store.steampowered.com", CLOSED_PORT_URL)
+                           .replace("https://steamcommunity.com", CLOSED_PORT_URL)
+                           for name, url in settings["LINKS"].items()})
+    kwargs = {
+        "categories": {},
+        "games_reduced": {"use_test_dict": "True"},
+        "games_full": {"input_file": "ids.txt"},
+    }[spider_name]
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(spider_name)
+    measures = {}
+
+    def engine_started():
+        from twisted.internet import reactor
+        measures["ready_s"] = time.time() - launched
+        measures["modules"] = len(sys.modules)
+        measures["heavy"] = [name for name in HEAVY_MODULES if name in sys.modules]
+        pool = [middleware for middleware in crawler.engine.downloader.middleware.middlewares
+                if type(middleware).__name__ == "BrowserPoolMiddleware"]
+        measures["browser_pool"] = "started" if pool and pool[0].started else "idle" if pool else "disabled"
+        # The engine is running once the handlers of engine_started return.
+        reactor.callLater(0, crawler.engine.close_spider, crawler.spider, "startup_benchmark")
+
+    crawler.signals.connect(engine_started, signal=signals.engine_started)
+    process.crawl(crawler, **kwargs)
+    process.start()
+    return measures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--spiders", nargs="+", choices=SPIDERS, default=list(SPIDERS))
+    parser.add_argument("--child", nargs=2, metavar=("SPIDER", "LAUNCHED"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        spider_name, launched = args.child
+        print(json.dumps(start(spider_name, float(launched))))
+        sys.exit()
+
+    source = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, SCRAPY_SETTINGS_MODULE="games_scraper.settings",
+               PYTHONPATH=os.pathsep.join(filter(None, [source, os.environ.get("PYTHONPATH")])))
+    print(f"{'spider':<14} {'ready':>8} {'process':>8} {'modules':>8}  browser pool  heavy modules")
+    for spider_name in args.spiders:
+        ready, total = [], []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                with open(os.path.join(tmp, "ids.txt"), "w") as ids_file:
+                    ids_file.writelines(f"{id}\n" for id in range(1000, 1010))
+                launched = time.time()
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.startup", "--child", spider_name, str(launched)],
+                    capture_output=True, text=True, check=True, cwd=tmp, env=env,
+                ).stdout
+                total.append(time.time() - launched)
+            measures = json.loads(output.strip().splitlines()[-1])
+            ready.append(measures["ready_s"])
+        print(f"{spider_name:<14} {statistics.median(ready):7.2f}s {statistics.median(total):7.2f}s "
+              f"{measures['modules']:>8}  {measures['browser_pool']:<12}  {', '.join(measures['heavy']) or '-'}")
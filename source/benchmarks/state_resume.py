@@ -0,0 +1,174 @@
+"""Killing a GamesReduced crawl and resuming it from its state journal.
+
+A local MockStore serves the JSON listings of --categories categories of
+--games games. A crawl to the end of every category runs uninterrupted once,
+then again being killed (SIGKILL) --kills times, at random times after
+--kill-after seconds (process start up included), restarting it each time.
+Items are exported to a JSON lines feed. The resumed crawl must export every
+game, log the same ids, each one once, and end with the same state. Games
+exported twice (scraped after the last checkpoint before a kill) are counted
+as duplicate items, pages parsed again after a kill as repeated requests.
+
+Replay is timed on a journal of --replay-records changes, the most a journal
+can have before it is compacted.
+
+Usage (from the source folder):
+    python -m benchmarks.state_resume [--flush-items 1 100] [--kills 3] [--checkpoint-seconds 1]
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+from games_scraper.id_log import IdLogReader
+from games_scraper.state_journal import StateJournal
+
+
+def crawl(store_url:str, folder:str, flush_items:int, checkpoint_seconds:float = 1):
+    """Runs the crawl in this process, with every file in folder."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_reduced import GamesReduced
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("CONCURRENT_REQUESTS", 4)
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", 4)
+    settings.set("LINKS", {name: url.replace("https://store.steampowered.com", store_url)
+                           for name, url in settings["LINKS"].items()})
+    settings.set("FEEDS", {os.path.join(folder, "items.jsonl"): {"format": "jsonlines"}})
+
+    process = CrawlerProcess(settings)
+    process.crawl(
+        GamesReduced,
+        input_file=os.path.join(folder, "categories.json"),
+        state_file=os.path.join(folder, "state.json"),
+        seen_file=os.path.join(folder, "seen.bin"),
+        ids_file=os.path.join(folder, "ids.txt"),
+        use_test_dict="False",
+        engine="json",
+        n_pages_per_cat=1000,
+        journal_flush_items=flush_items,
+        checkpoint_seconds=checkpoint_seconds,
+    )
+    process.start()
+
+
+def new_folder(tmp:str, name:str, categories:dict) -> str:
+    folder = os.path.join(tmp, name)
+    os.makedirs(folder)
+    with open(os.path.join(folder, "categories.json"), "w") as input_file:
+        json.dump([{"name": slug, "url": f"https://store.steampowered.com/category/{slug}/"} for slug in categories],
+                  input_file)
+    return folder
+
+
+def child(store_url:str, folder:str, flush_items:int, checkpoint_seconds:float = 1) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "benchmarks.state_resume", "--child", store_url, folder,
+                             str(flush_items), str(checkpoint_seconds)], stderr=subprocess.DEVNULL)
+
+
+def exported_ids(folder:str) -> list:
+    """Ids of the exported items, a partial last line left by a kill is skipped."""
+    ids = []
+    path = os.path.join(folder, "items.jsonl")
+    if not os.path.isfile(path):
+        return ids
+    with open(path, "rb") as items_file:
+        for line in items_file:
+            if line.endswith(b"\n"):
+                ids.append(json.loads(line)["id"])
+    return ids
+
+
+def results(folder:str) -> tuple:
+    """Exported ids, logged ids and final state of a crawl."""
+    with open(os.path.join(folder, "state.json")) as state_file:
+        state = json.load(state_file)
+    return exported_ids(folder), list(IdLogReader(os.path.join(folder, "ids.txt")).read_new()), state
+
+
+def run(store:MockStore, tmp:str, flush_items:int, kills:int, kill_after:float, checkpoint_seconds:float, seed:int):
+    rng = random.Random(seed)
+    store.listing_requests = 0
+    folder = new_folder(tmp, f"reference_{flush_items}", store.categories)
+    t0 = time.perf_counter()
+    child(store.url, folder, flush_items, checkpoint_seconds).wait()
+    seconds = time.perf_counter() - t0
+    _, reference_ids, reference_state = results(folder)
+    reference_requests = store.listing_requests
+
+    store.listing_requests = 0
+    folder = new_folder(tmp, f"killed_{flush_items}", store.categories)
+    for _ in range(kills):
+        process = child(store.url, folder, flush_items, checkpoint_seconds)
+        time.sleep(kill_after + rng.uniform(0, 1))
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+    child(store.url, folder, flush_items, checkpoint_seconds).wait()
+    items, ids, state = results(folder)
+
+    missing = len(set(reference_ids) - set(ids))
+    missing_items = len(set(reference_ids) - set(items))
+    duplicates = len(ids) - len(set(ids))
+    print(
+        f"flush every {flush_items:>4} items  {seconds:5.1f} s uninterrupted  {kills:>2} kills  "
+        f"missing {missing}  missing items {missing_items}  duplicates {duplicates}  "
+        f"duplicate items {len(items) - len(set(items))}  same state {state == reference_state}  "
+        f"repeated requests {store.listing_requests - reference_requests - kills}"
+    )
+    return missing == 0 and missing_items == 0 and duplicates == 0 and state == reference_state
+
+
+def replay_time(tmp:str, records:int) -> float:
+    """Seconds to open a journal of records changes."""
+    path = os.path.join(tmp, "replay", "state.json")
+    journal = StateJournal(path, flush_items=records, compact_every=records + 1)
+    for i in range(records // 2):
+        journal.add("pending/cat", i)
+        journal.discard("pending/cat", i)
+    journal.flush()
+    # Not closed, as if the process had been killed.
+    t0 = time.perf_counter()
+    StateJournal(path)
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=3)
+    parser.add_argument("--games", type=int, default=600, help="Games of each category")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--flush-items", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--kills", type=int, default=3)
+    parser.add_argument("--kill-after", type=float, default=3)
+    parser.add_argument("--checkpoint-seconds", type=float, default=1)
+    parser.add_argument("--replay-records", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", nargs=4, metavar=("STORE_URL", "FOLDER", "FLUSH_ITEMS", "CHECKPOINT_SECONDS"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        store_url, folder, flush_items, checkpoint_seconds = args.child
+        crawl(store_url, folder, int(flush_items), float(checkpoint_seconds))
+        sys.exit()
+
+    store = MockStore(latency=args.latency).start()
+    for i in range(args.categories):
+        store.categories[f"category_{i}"] = (10000 * (i + 1), args.games - 37 * i)
+
+    exact = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for flush_items in args.flush_items:
+            exact &= run(store, tmp, flush_items, args.kills, args.kill_after, args.checkpoint_seconds, args.seed)
+        print(f"replay of {args.replay_records} journal records: {replay_time(tmp, args.replay_records):.2f} s")
+    store.stop()
+    sys.exit(0 if exact else 1)
@@ -0,0 +1,237 @@
+"""End-to-end benchmark of the three spiders against the mock store.
+
+A local MockStore serves the store index, --categories categories (names taken
+from a categories file of a previous crawl, data/final-test4 by default) and
+the app pages of their games. The pipeline is run as in production, each
+spider in its own process:
+
+    categories              index -> categories.json
+    games_reduced           categories.json -> ids log (JSON listings)
+    games_reduced_rendered  same, parsing the rendered category pages (the
+                            browser is replaced by plain requests)
+    games_full              ids log -> app pages
+
+For each stage it reports pages/s, items/s, CPU seconds (user + system of the
+crawl) and peak RSS. Results are appended to --results (JSON lines, with the
+git commit) and compared with the last stored run with the same parameters,
+changes beyond --threshold are flagged. --history prints the stored runs.
+
+Usage (from the source folder):
+    python -m benchmarks.suite [--categories 8] [--pages 10] [--stages games_full]
+    python -m benchmarks.suite --history
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+from games_scraper.data_io import iter_records
+
+STAGES = ("categories", "games_reduced", "games_reduced_rendered", "games_full")
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), "results", "suite.jsonl")
+DEFAULT_CATEGORIES_FILE = os.path.join("data", "final-test4", "categories.json")
+# Metric: True if higher is better.
+METRICS = {"pages_s": True, "items_s": True, "cpu_s": False, "rss_mib": False}
+
+
+def crawl(stage:str, store_url:str, folder:str, pages:int) -> dict:
+    """Runs a stage in this process and returns its measures."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("INSTRUMENTATION_ENABLED", False)
+    links = {name: url.replace("https://store.steampowered.com", store_url) for name, url in settings["LINKS"].items()}
+    settings.set("LINKS", links)
+
+    kwargs = {}
+    if stage == "categories":
+        from games_scraper.spiders.categories import Categories as spider
+        settings.set("FEEDS", {os.path.join(folder, "categories.json"): {"format": "json"}})
+    elif stage.startswith("games_reduced"):
+        from games_scraper.spiders.games_reduced import GamesReduced as spider
+        run_folder = os.path.join(folder, stage)
+        kwargs = dict(
+            use_test_dict="False",
+            input_file=os.path.join(folder, "categories.json"),
+            state_file=os.path.join(run_folder, "state.json"),
+            seen_file=os.path.join(run_folder, "seen.bin"),
+            ids_file=os.path.join(run_folder, "ids.txt"),
+            n_pages_per_cat=pages,
+            engine="selenium" if stage == "games_reduced_rendered" else "json",
+        )
+    else:
+        from games_scraper.spiders.games_full import GamesFull as spider
+        kwargs = dict(
+            input_file=os.path.join(folder, "games_reduced", "ids.txt"),
+            seen_file=os.path.join(folder, "games_full_seen.bin"),
+        )
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(spider)
+    process.crawl(crawler, **kwargs)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    process.start()
+    seconds = time.perf_counter() - t0
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    stats = crawler.stats
+    return {
+        "seconds": round(seconds, 3),
+        "pages": stats.get_value("downloader/response_count", 0),
+        "items": stats.get_value("item_scraped_count", 0),
+        "pages_s": round(stats.get_value("downloader/response_count", 0) / seconds, 2),
+        "items_s": round(stats.get_value("item_scraped_count", 0) / seconds, 2),
+        "cpu_s": round(after.ru_utime + after.ru_stime - usage.ru_utime - usage.ru_stime, 3),
+        # ru_maxrss is in KiB on Linux.
+        "rss_mib": round(after.ru_maxrss / 1024, 1),
+    }
+
+
+def load_categories(path:str, count:int) -> dict:
+    """Slug -> name of the first count categories of a categories file, made up
+    ones if there is no file or it has fewer."""
+    names = {}
+    if path and os.path.isfile(path):
+        for record in iter_records(path):
+            for name, url in ([(record['name'], record['url'])] if 'url' in record else record.items()):
+                names.setdefault(url.split("?")[0].rstrip("/").split("/")[-1], name)
+    categories = dict(list(names.items())[:count])
+    for i in range(len(categories), count):
+        categories[f"category_{i}"] = f"Category {i}"
+    return categories
+
+
+def git_commit() -> dict:
+    """Commit of the working tree and whether it has uncommitted changes."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit.stdout.strip(), "dirty": bool(status.stdout.strip())}
+
+
+def read_results(path:str) -> list:
+    if not os.path.isfile(path):
+        return []
+    return list(iter_records(path))
+
+
+def compare(result:dict, previous:dict, threshold:float):
+    """Prints the changes of every stage against a previous run."""
+    print(f"\nChanges since {previous['commit']}{' (dirty)' if previous['dirty'] else ''} ({previous['time']}):")
+    for stage, measures in result["stages"].items():
+        before = previous["stages"].get(stage)
+        if before is None:
+            continue
+        changes = []
+        for metric, higher_is_better in METRICS.items():
+            if not before.get(metric):
+                continue
+            change = measures[metric] / before[metric] - 1
+            worse = -change if higher_is_better else change
+            flag = " REGRESSION" if worse > threshold else ""
+            changes.append(f"{metric} {change:+6.1%}{flag}")
+        print(f"{stage:<24} " + "  ".join(changes))
+
+
+def print_history(results:list):
+    for result in results:
+        commit = f"{result['commit']}{'+' if result['dirty'] else ''}"
+        stages = "  ".join(
+            f"{stage} {measures['pages_s']:.1f} p/s {measures['items_s']:.1f} i/s {measures['rss_mib']:.0f} MiB"
+            for stage, measures in result["stages"].items()
+        )
+        print(f"{result['time']}  {commit:<10} {stages}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=10, help="Pages of each category, n_pages_per_cat")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latency of the store")
+    parser.add_argument("--app-padding-kb", type=int, default=300, help="Size of the app pages filler")
+    parser.add_argument("--categories-file", default=DEFAULT_CATEGORIES_FILE, help="Names of the categories")
+    parser.add_argument("--recorded", help="Folder of saved store pages, see benchmarks.mock_store")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                        help="Stages to report, the ones they depend on are run anyway")
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--no-save", action="store_true", help="Don't store the results")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Change flagged as regression")
+    parser.add_argument("--history", action="store_true", help="Print the stored results and exit")
+    parser.add_argument("--child", nargs=4, metavar=("STAGE", "STORE_URL", "FOLDER", "PAGES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        stage, store_url, folder, pages = args.child
+        print(json.dumps(crawl(stage, store_url, folder, int(pages))))
+        sys.exit()
+
+    if args.history:
+        print_history(read_results(args.results))
+        sys.exit()
+
+    store = MockStore(app_padding_kb=args.app_padding_kb, latency=args.latency, recorded=args.recorded).start()
+    categories = load_categories(args.categories_file, args.categories)
+    # Sizes from half the requested pages to all of them, every category
+    # shares games with the previous one.
+    for i, (slug, name) in enumerate(categories.items()):
+        size = 12 * max(1, args.pages // 2 + args.pages * i // (2 * max(1, args.categories - 1)))
+        store.categories[slug] = (10000 + 100 * i, size)
+        store.category_names[slug] = name
+
+    params = {key: getattr(args, key) for key in ("categories", "pages", "latency", "app_padding_kb", "recorded")}
+    result = dict(
+        time=datetime.datetime.now().isoformat(timespec="seconds"),
+        **git_commit(),
+        python=platform.python_version(),
+        params=params,
+        stages={},
+    )
+    # games_full reads the ids of games_reduced, both read the categories.
+    needed = set(args.stages)
+    if needed & {"games_reduced", "games_reduced_rendered", "games_full"}:
+        needed.add("categories")
+    if "games_full" in needed:
+        needed.add("games_reduced")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for stage in STAGES:
+            if stage not in needed:
+                continue
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.suite", "--child", stage, store.url, tmp, str(args.pages)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            measures = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{stage:<24} {measures['seconds']:6.1f} s  {measures['pages']:>5} pages {measures['pages_s']:7.1f}/s  "
+                f"{measures['items']:>5} items {measures['items_s']:7.1f}/s  CPU {measures['cpu_s']:6.1f} s  "
+                f"peak RSS {measures['rss_mib']:6.1f} MiB"
+            )
+            if stage in args.stages:
+                result["stages"][stage] = measures
+    store.stop()
+
+    previous = [
+        stored for stored in read_results(args.results)
+        if stored["params"] == params and set(result["stages"]) & set(stored["stages"])
+    ]
+    if previous:
+        compare(result, previous[-1], args.threshold)
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+        with open(args.results, "a", encoding="utf-8") as results_file:
+            results_file.write(json.dumps(result) + "\n")
+        print(f"\nSaved in {args.results}")
@@ -0,0 +1,92 @@
+"""GamesFull crawl rate against a mock store that adds latency and rate limits,
+with the old fixed DOWNLOAD_DELAY and with the AdaptiveThrottleMiddleware.
+
+The mock store host gets the store.steampowered.com budget of THROTTLE_HOSTS
+(with --min-delay). Every crawl runs in a separate process.
+
+Usage (from the source folder):
+    python -m benchmarks.throttle [--pages 300] [--rate-limit 10] [--latency 0.1]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_store import MockStore
+from benchmarks.parse_offload import CRAWL_SETTINGS
+
+
+def crawl(store_url:str, input_file:str, fixed_delay:float, min_delay:float) -> dict:
+    """Runs the crawl in this process and returns its stats. fixed_delay > 0
+    disables the adaptive throttle."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from games_scraper.spiders.games_full import GamesFull
+
+    settings = get_project_settings()
+    middlewares = dict(settings["DOWNLOADER_MIDDLEWARES"], **CRAWL_SETTINGS["DOWNLOADER_MIDDLEWARES"])
+    budget = dict(settings.getdict("THROTTLE_HOSTS")["store.steampowered.com"], min_delay=min_delay)
+    settings.setdict(CRAWL_SETTINGS)
+    settings.set("DOWNLOADER_MIDDLEWARES", middlewares)
+    settings.set("LINKS", dict(settings["LINKS"], app=f"{store_url}/app/%APP_ID%"))
+    settings.set("THROTTLE_ENABLED", not fixed_delay)
+    settings.set("THROTTLE_HOSTS", {"127.0.0.1": budget})
+    settings.set("DOWNLOAD_DELAY", fixed_delay)
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", 8)
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(GamesFull)
+    process.crawl(crawler, input_file=input_file)
+    t0 = time.perf_counter()
+    process.start()
+    stats = crawler.stats
+    return {
+        "seconds": time.perf_counter() - t0,
+        "items": stats.get_value("item_scraped_count", 0),
+        "429": stats.get_value("downloader/response_status_count/429", 0),
+        "backoffs": stats.get_value("throttle/127.0.0.1/backoff", 0),
+        "concurrency": stats.get_value("throttle/127.0.0.1/concurrency"),
+        "delay": stats.get_value("throttle/127.0.0.1/delay"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--fixed-pages", type=int, default=20, help="Pages crawled with the fixed delay")
+    parser.add_argument("--fixed-delay", type=float, default=2.5)
+    parser.add_argument("--min-delay", type=float, default=0.05)
+    parser.add_argument("--rate-limit", type=float, default=10, help="Requests per second served by the store")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--child", nargs=4, metavar=("STORE_URL", "INPUT_FILE", "FIXED_DELAY", "MIN_DELAY"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        store_url, input_file, fixed_delay, min_delay = args.child
+        print(json.dumps(crawl(store_url, input_file, float(fixed_delay), float(min_delay))))
+        sys.exit()
+
+    store = MockStore(app_padding_kb=20, latency=args.latency, rate_limit=args.rate_limit).start()
+    print(f"Store: {args.latency}s latency, {args.rate_limit} requests/s")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, pages, fixed_delay in (
+            (f"fixed {args.fixed_delay}s delay", args.fixed_pages, args.fixed_delay),
+            ("adaptive", args.pages, 0),
+        ):
+            input_file = os.path.join(tmp, f"ids_{pages}.txt")
+            with open(input_file, "w") as ids_file:
+                ids_file.writelines(f"{id}\n" for id in range(1000, 1000 + pages))
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.throttle", "--child", store.url, input_file, str(fixed_delay), str(args.min_delay)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{label:>18}  {result['items']:>4} items  {result['items'] / result['seconds']:6.2f} items/s  "
+                f"429s {result['429']:>4}  backoffs {result['backoffs']:>3}  "
+                f"final concurrency {result['concurrency']}  delay {result['delay']}"
+            )
+    store.stop()
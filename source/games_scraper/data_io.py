@@ -0,0 +1,187 @@
+"""Reading and writing the data/ files of the spiders (categories, ids, state).
+
+Files are opened by extension: ".gz" is gzip, ".zst" is zstandard (requires
+the zstandard package) and anything else is plain. JSON arrays and JSON lines
+are read one record at a time, so memory does not depend on the size of the
+file. Whole files are written to a temporary file that is renamed over the
+old one, a crash leaves either the old or the new file. checkpoint_outputs
+makes the items a crawl has written so far durable.
+"""
+import gzip
+import json
+import os
+import re
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 2 ** 16
+SEPARATORS = re.compile(r"[\s,]*")
+
+
+def open_data(path:str, mode:str = "rt"):
+    """Opens a file, compressed or not depending on its extension.
+
+    Args:
+        path (str): File path.
+        mode (str): As in open(). Text modes use utf-8.
+
+    Returns:
+        File object.
+    """
+    encoding = None if "b" in mode else "utf-8"
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding=encoding)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to open {path}")
+        return zstandard.open(path, mode, encoding=encoding)
+    return open(path, mode, encoding=encoding)
+
+
+def iter_records(path:str):
+    """Yields the values of a JSON array or of a JSON lines file, one at a time.
+    A file whose first character is "[" is an array, anything else is JSON lines.
+
+    Args:
+        path (str): File path, see open_data.
+
+    Yields:
+        The decoded values.
+    """
+    with open_data(path, "rt") as data_file:
+        first = data_file.read(1)
+        while first.isspace():
+            first = data_file.read(1)
+        if first == "[":
+            yield from _iter_array(data_file)
+            return
+        buffer = first
+        for line in data_file:
+            line = buffer + line
+            buffer = ""
+            if line.strip():
+                yield json.loads(line)
+        if buffer.strip():
+            yield json.loads(buffer)
+
+
+def _iter_array(data_file):
+    """Values of a JSON array whose "[" has already been read."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    while True:
+        # Skipping whitespace and the comma between values.
+        position = SEPARATORS.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer):
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                end = None
+            # A value ending the buffer may continue in the next chunk (a number).
+            if end is not None and (end < len(buffer) or eof):
+                yield value
+                position = end
+                continue
+        if eof:
+            raise ValueError("Unterminated JSON array")
+        chunk = data_file.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+@contextmanager
+def atomic_write(path:str, mode:str = "wt", fsync:bool = True):
+    """Context manager giving a file that replaces path when the block ends
+    without errors. It is written to a ".tmp" file next to it first.
+
+    Args:
+        path (str): File path, see open_data.
+        mode (str): Write mode ("wt" or "wb").
+        fsync (bool): Sync the file before renaming it.
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    # The temporary file keeps the extension, so it gets the same compression.
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{extension}"
+    try:
+        with open_data(tmp_path, mode) as data_file:
+            yield data_file
+        if fsync:
+            with open(tmp_path, "rb") as written:
+                os.fsync(written.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json(path:str, value, fsync:bool = True):
+    """Writes a JSON value atomically."""
+    with atomic_write(path, fsync=fsync) as data_file:
+        json.dump(value, data_file)
+
+
+def read_json(path:str):
+    """Reads a (small) JSON value, see open_data."""
+    with open_data(path, "rt") as data_file:
+        return json.load(data_file)
+
+
+def write_records(path:str, records, fsync:bool = True) -> int:
+    """Writes records as JSON lines atomically.
+
+    Returns:
+        int: Number of records.
+    """
+    count = 0
+    with atomic_write(path, fsync=fsync) as data_file:
+        for record in records:
+            data_file.write(json.dumps(record, ensure_ascii=False))
+            data_file.write("\n")
+            count += 1
+    return count
+
+
+def checkpoint_outputs(crawler, spider, pipelines:bool = True):
+    """Makes the items processed so far durable: the files of the feed exports
+    are flushed and fsynced, the pipelines with a checkpoint method write what
+    they buffer. Crawl state that depends on the items being stored (crawled
+    ids) is persisted after this.
+
+    Args:
+        crawler (Crawler): Running crawler.
+        spider (Spider): Spider of the items.
+        pipelines (bool): Checkpoint the pipelines too. Once the spider is
+            closed they have already written everything and closed.
+    """
+    # Imported here, the files of the spiders are read without scrapy too.
+    from scrapy.extensions.feedexport import FeedExporter
+
+    for extension in crawler.extensions.middlewares:
+        if not isinstance(extension, FeedExporter):
+            continue
+        for slot in extension.slots:
+            if slot.file.closed:
+                continue
+            slot.file.flush()
+            try:
+                os.fsync(slot.file.fileno())
+            except (AttributeError, OSError, ValueError):
+                # Not a local file (storages uploading on close).
+                pass
+    if not pipelines or crawler.engine is None:
+        return
+    for pipeline in crawler.engine.scraper.itemproc.middlewares:
+        if hasattr(pipeline, 'checkpoint'):
+            pipeline.checkpoint(spider)
@@ -0,0 +1,195 @@
+import re
+from decimal import Decimal
+
+from cssselect import HTMLTranslator
+from lxml import etree, html
+
+_translator = HTMLTranslator()
+_number = re.compile(r"\d[\d.,]*")
+_cents = Decimal("0.01")
+
+
+class MissingFieldError(ValueError):
+    """A required field selector matched nothing"""
+
+    def __init__(self, field:str, css:str):
+        super().__init__(field, css)
+        self.field = field
+        self.css = css
+
+    def __str__(self):
+        return f"{self.field} not found ({self.css})"
+
+
+def compile_css(css:str, prefix:str = "descendant-or-self::") -> etree.XPath:
+    """Compiles a css selector to an XPath evaluator.
+
+    Args:
+        css (str): Css selector.
+        prefix (str): XPath axis the selector is evaluated from, see FieldTable.
+
+    Returns:
+        etree.XPath: Callable returning the list of matched elements under the given one.
+    """
+    return etree.XPath(_translator.css_to_xpath(css, prefix=prefix))
+
+
+def text(el) -> str:
+    """Same as bs4 Tag.text: every text node under el, joined."""
+    return str(el.text_content())
+
+
+def stripped(el) -> str:
+    return str(el.text_content()).strip()
+
+
+def attr(name:str):
+    """Returns a getter of the attribute name of an element."""
+    def get(el):
+        return el.attrib[name]
+    return get
+
+
+def exists(el) -> bool:
+    return True
+
+
+def parse_int(value:str) -> int:
+    """Integer in a localized text, ignoring thousands separators: "(1.234)" -> 1234.
+    None if value is None or has no digits."""
+    if value is None:
+        return None
+    digits = re.sub(r"\D", "", value)
+    return int(digits) if digits else None
+
+
+def parse_percent(value:str) -> int:
+    """Discount percentage: "-35%" -> 35. None if there is no number."""
+    return parse_int(value)
+
+
+def parse_price(value:str) -> Decimal:
+    """Price in a localized text: "1.234,56€" and "$1,234.56" -> Decimal("1234.56").
+
+    The last "," or "." is the decimal separator, unless it is followed by
+    three digits ("1.234€"). Prices without digits are 0 if they say the game
+    is free ("Gratuito", "Free To Play") and None otherwise.
+    """
+    if value is None:
+        return None
+    match = _number.search(value)
+    if match is None:
+        lower = value.lower()
+        return Decimal("0.00") if "grat" in lower or "free" in lower else None
+
+    number = match.group().rstrip(".,")
+    separator = max(number.rfind(","), number.rfind("."))
+    if separator == -1 or len(number) - separator - 1 == 3:
+        units, cents = number, "0"
+    else:
+        units, cents = number[:separator], number[separator + 1:]
+    units = re.sub(r"\D", "", units) or "0"
+    return Decimal(f"{units}.{cents}").quantize(_cents)
+
+
+class Field:
+    """A field of an item, read from the elements matched by a css selector.
+
+    Args:
+        name (str): Key of the field in the item.
+        css (str): Css selector, relative to the element the table is evaluated on.
+        value (callable): Gets the value from the first matched element (or from
+            the list of all matched elements if many=True).
+        default: Value if nothing matches.
+        many (bool): Pass every matched element to value.
+        required (bool): Raise MissingFieldError if nothing matches.
+    """
+
+    def __init__(self, name:str, css:str, value=text, default=None, many=False, required=False):
+        self.name = name
+        self.css = css
+        self.value = value
+        self.default = default
+        self.many = many
+        self.required = required
+
+
+class FieldTable:
+    """A set of fields whose selectors are compiled to XPath once, when the table
+    is created. Every distinct selector is evaluated once per extraction even if
+    many fields read it.
+
+    Args:
+        fields (list[Field]): Fields of the item, in order.
+        prefix (str): XPath axis the selectors are evaluated from. "descendant-or-self::"
+            searches the whole document, "descendant::" only under the given element
+            (as bs4 Tag.select does).
+    """
+
+    def __init__(self, fields:list, prefix:str = "descendant-or-self::"):
+        self.fields = list(fields)
+        self.selectors = {}
+        for field in self.fields:
+            if field.css not in self.selectors:
+                self.selectors[field.css] = compile_css(field.css, prefix)
+
+    def extract(self, root, on_missing=None) -> dict:
+        """Evaluates the table on an element.
+
+        Args:
+            root (HtmlElement): Document or element the selectors are evaluated on.
+            on_missing (callable, optional): Called with the name of every field
+                that is not found (required or not).
+
+        Returns:
+            dict: field name -> value
+
+        Raises:
+            MissingFieldError: If a required field is not found.
+        """
+        matches = {css: selector(root) for css, selector in self.selectors.items()}
+        item = {}
+        for field in self.fields:
+            els = matches[field.css]
+            if not els:
+                if on_missing is not None:
+                    on_missing(field.name)
+                if field.required:
+                    raise MissingFieldError(field.name, field.css)
+                item[field.name] = field.default
+            else:
+                item[field.name] = field.value(els if field.many else els[0])
+        return item
+
+
+def truncate_at(body, markers):
+    """Start of a page, up to the first of the markers found in it.
+
+    Args:
+        body (str | bytes): Page.
+        markers (list[str]): Pieces of the page, None or empty for the whole page.
+
+    Returns:
+        str | bytes: body up to the earliest marker (excluded), the whole body
+            if there is none.
+    """
+    if not markers:
+        return body
+    positions = []
+    for marker in markers:
+        position = body.find(marker.encode("utf-8") if isinstance(body, bytes) else marker)
+        if position != -1:
+            positions.append(position)
+    return body[:min(positions)] if positions else body
+
+
+def parse_html(body) -> html.HtmlElement:
+    """Parses a whole document with lxml.
+
+    Args:
+        body (str | bytes): Html document.
+
+    Returns:
+        HtmlElement: Root of the document.
+    """
+    return html.document_fromstring(body)
@@ -0,0 +1,290 @@
+import os
+import sqlite3
+import time
+from decimal import Decimal
+
+from itemadapter import ItemAdapter
+
+# Descriptive columns of games, a record without one keeps the stored value.
+GAME_COLUMNS = (
+    'name', 'url', 'img_src', 'description', 'is_dlc', 'release_date', 'developer', 'developer_url',
+    'publisher', 'publisher_url', 'genre', 'website', 'metacritic_score', 'metacritic_url',
+    'reviews_category', 'recent_reviews_category',
+)
+# Values whose changes are kept in price_history. Prices are in cents,
+# final_price is the price paid (the discounted one if there is a discount).
+TRACKED_COLUMNS = ('price', 'discount', 'final_price', 'reviews', 'recent_reviews')
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS games ("
+    " app_id INTEGER PRIMARY KEY,"
+    + "".join(f" {name}," for name in GAME_COLUMNS + TRACKED_COLUMNS) +
+    " first_seen REAL NOT NULL,"
+    " last_seen REAL NOT NULL,"
+    " changed_at REAL)",
+    "CREATE TABLE IF NOT EXISTS price_history ("
+    " app_id INTEGER NOT NULL,"
+    " observed_at REAL NOT NULL,"
+    + "".join(f" {name}," for name in TRACKED_COLUMNS) +
+    " PRIMARY KEY (app_id, observed_at)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS price_history_observed_at ON price_history (observed_at)",
+    "CREATE TABLE IF NOT EXISTS tags ("
+    " app_id INTEGER NOT NULL,"
+    " position INTEGER NOT NULL,"
+    " tag TEXT NOT NULL,"
+    " PRIMARY KEY (app_id, position)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag)",
+    "CREATE TABLE IF NOT EXISTS platforms ("
+    " app_id INTEGER NOT NULL,"
+    " platform TEXT NOT NULL,"
+    " PRIMARY KEY (app_id, platform)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS game_content ("
+    " app_id INTEGER NOT NULL,"
+    " position INTEGER NOT NULL,"
+    " name TEXT,"
+    " price INTEGER,"
+    " PRIMARY KEY (app_id, position)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS regional_prices ("
+    " app_id INTEGER NOT NULL,"
+    " locale TEXT NOT NULL,"
+    " currency TEXT,"
+    " price INTEGER,"
+    " discount INTEGER,"
+    " final_price INTEGER,"
+    " PRIMARY KEY (app_id, locale)) WITHOUT ROWID",
+)
+
+
+def cents(price):
+    """Price in cents, None stays None."""
+    if price is None:
+        return None
+    return int(round(Decimal(str(price)) * 100))
+
+
+def game_record(item, observed_at:float = None) -> dict:
+    """Record of a GamesReducedItem or GamesFullItem for GameDatabase.write.
+
+    Returns:
+        dict: {'app_id', 'observed_at', 'game': {column: value}, 'tracked': {column: value},
+            'tags': list or None, 'platforms': list or None, 'content': list or None,
+            'regional': list or None}.
+            Only the values the item has are set: tracked holds the values its
+            spider sees, None lists are left as stored. None for other items.
+    """
+    adapter = ItemAdapter(item)
+    record = {'observed_at': observed_at or time.time(), 'game': {}, 'tracked': {},
+              'tags': None, 'platforms': None, 'content': None, 'regional': None}
+    if 'app_id' in adapter.field_names():
+        # GamesFullItem, pages skipped by the incremental crawl have only app_id
+        # (and the regional prices of a multi-locale crawl).
+        record['app_id'] = adapter.get('app_id')
+        record['regional'] = [
+            (prices['locale'], prices['currency'], cents(prices['price']), prices['discount'],
+             cents(prices['final_price']))
+            for prices in adapter.get('regional_prices') or []
+        ] or None
+        if adapter.get('unchanged'):
+            return record
+        game = {name: adapter.get(name) for name in (
+            'name', 'img_src', 'is_dlc', 'release_date', 'developer', 'developer_url', 'publisher',
+            'publisher_url', 'genre', 'website', 'metacritic_score', 'metacritic_url',
+        )}
+        game['description'] = adapter.get('short_description')
+        game['reviews_category'] = adapter.get('all_reviews')
+        game['recent_reviews_category'] = adapter.get('recent_reviews')
+        # Items read with some field groups only (empty field_groups: all of
+        # them) leave the values of the others as stored.
+        groups = adapter.get('field_groups') or ('reviews', 'pricing', 'dlc')
+        if 'pricing' in groups:
+            discounted = adapter.get('discount_final_price')
+            record['tracked'].update({
+                'price': cents(adapter.get('price')),
+                'discount': adapter.get('discount'),
+                'final_price': cents(discounted if discounted is not None else adapter.get('price')),
+            })
+        if 'reviews' in groups:
+            record['tracked'].update({
+                'reviews': adapter.get('all_reviews_count'),
+                'recent_reviews': adapter.get('recent_reviews_count'),
+            })
+        if 'dlc' in groups:
+            record['content'] = [(content['name'], cents(content['price']))
+                                 for content in adapter.get('game_content') or []]
+    elif 'id' in adapter.field_names():
+        # GamesReducedItem
+        record['app_id'] = adapter.get('id')
+        game = {name: adapter.get(name) for name in ('name', 'url', 'img_src', 'description', 'reviews_category')}
+        game['release_date'] = adapter.get('date')
+        discounted = adapter.get('offert_price')
+        record['tracked'] = {
+            'price': cents(adapter.get('price')),
+            'discount': adapter.get('offert'),
+            'final_price': cents(discounted if discounted is not None else adapter.get('price')),
+        }
+        # Listing rows and cards whose count couldn't be read have no reviews
+        # number, the stored one is kept.
+        if adapter.get('reviews_number') is not None:
+            record['tracked']['reviews'] = adapter.get('reviews_number')
+        record['platforms'] = adapter.get('platforms') or None
+    else:
+        return None
+    if record['app_id'] is None:
+        return None
+    record['game'] = {name: value for name, value in game.items() if value is not None}
+    record['tags'] = adapter.get('tags') or None
+    return record
+
+
+class GameDatabase:
+    """Games, their tags, platforms, DLCs and prices in other regions and the
+    history of their prices and review counts, in a SQLite file.
+
+    games has the last known values of every game (upserted on app_id),
+    price_history a row for every change of the TRACKED_COLUMNS values of a
+    game, with all of them. Queries:
+
+        latest price of an app    SELECT price, final_price FROM games WHERE app_id = ?
+        price over time           SELECT observed_at, final_price FROM price_history
+                                  WHERE app_id = ? ORDER BY observed_at
+        changes since a date      SELECT * FROM price_history WHERE observed_at >= ?
+
+    are answered from the primary keys and the observed_at index.
+
+    Args:
+        path (str): SQLite file, created if it doesn't exist.
+        cache_mib (int): Page cache of the connection, the indexes of big
+            databases don't fit in SQLite's default 2 MiB.
+    """
+
+    def __init__(self, path:str, cache_mib:int = 64):
+        self.path = path
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(f"PRAGMA cache_size=-{cache_mib * 1024}")
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        self.db.commit()
+
+        columns = ('app_id',) + GAME_COLUMNS + TRACKED_COLUMNS + ('first_seen', 'last_seen', 'changed_at')
+        updates = [f"{name} = COALESCE(excluded.{name}, {name})" for name in GAME_COLUMNS]
+        updates += [f"{name} = excluded.{name}" for name in TRACKED_COLUMNS]
+        updates += ["last_seen = excluded.last_seen", "changed_at = COALESCE(excluded.changed_at, changed_at)"]
+        self.upsert_sql = (
+            f"INSERT INTO games ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            f" ON CONFLICT (app_id) DO UPDATE SET {', '.join(updates)}"
+        )
+        self.history_sql = (
+            f"INSERT OR REPLACE INTO price_history (app_id, observed_at, {', '.join(TRACKED_COLUMNS)})"
+            f" VALUES ({', '.join('?' * (2 + len(TRACKED_COLUMNS)))})"
+        )
+
+    def current(self, app_ids) -> dict:
+        """Stored TRACKED_COLUMNS values of the given games.
+
+        Returns:
+            dict: app_id -> {column: value}, games not stored are missing.
+        """
+        app_ids = list(app_ids)
+        current = {}
+        # Below SQLITE_MAX_VARIABLE_NUMBER of old SQLite versions (999).
+        for start in range(0, len(app_ids), 900):
+            chunk = app_ids[start:start + 900]
+            rows = self.db.execute(
+                f"SELECT app_id, {', '.join(TRACKED_COLUMNS)} FROM games WHERE app_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for row in rows:
+                current[row[0]] = dict(zip(TRACKED_COLUMNS, row[1:]))
+        return current
+
+    def write(self, records:list) -> dict:
+        """Writes game_record() records in a transaction, in order.
+
+        Tracked values a record doesn't have keep their stored value, a
+        price_history row is added when any of them changes (and for new games).
+
+        Returns:
+            dict: {'games': games upserted, 'history': price_history rows added}
+        """
+        states = self.current({record['app_id'] for record in records})
+        stored = set(states)
+        games, history, seen = [], [], []
+        tags, platforms, content, regional = {}, {}, {}, {}
+        for record in records:
+            app_id, observed_at = record['app_id'], record['observed_at']
+            if record['regional'] is not None:
+                regional[app_id] = record['regional']
+            if not record['game'] and not record['tracked']:
+                seen.append((observed_at, app_id))
+                continue
+            state = states.get(app_id)
+            new_state = dict(state or dict.fromkeys(TRACKED_COLUMNS), **record['tracked'])
+            changed = None
+            if new_state != state:
+                changed = observed_at
+                states[app_id] = new_state
+                history.append((app_id, observed_at) + tuple(new_state[name] for name in TRACKED_COLUMNS))
+            game = record['game']
+            games.append(
+                (app_id,) + tuple(game.get(name) for name in GAME_COLUMNS)
+                + tuple(new_state[name] for name in TRACKED_COLUMNS) + (observed_at, observed_at, changed)
+            )
+            if record['tags'] is not None:
+                tags[app_id] = record['tags']
+            if record['platforms'] is not None:
+                platforms[app_id] = record['platforms']
+            if record['content'] is not None:
+                content[app_id] = record['content']
+
+        with self.db:
+            self.db.executemany(self.upsert_sql, games)
+            self.db.executemany(self.history_sql, history)
+            self.db.executemany("UPDATE games SET last_seen = ? WHERE app_id = ?", seen)
+            self._replace('tags', "INSERT INTO tags (app_id, position, tag) VALUES (?, ?, ?)", (
+                (app_id, position, tag) for app_id, values in tags.items() for position, tag in enumerate(values)
+            ), tags, stored)
+            self._replace('platforms', "INSERT OR IGNORE INTO platforms (app_id, platform) VALUES (?, ?)", (
+                (app_id, platform) for app_id, values in platforms.items() for platform in values
+            ), platforms, stored)
+            self._replace('game_content', "INSERT INTO game_content (app_id, position, name, price) VALUES (?, ?, ?, ?)", (
+                (app_id, position, name, price) for app_id, values in content.items()
+                for position, (name, price) in enumerate(values)
+            ), content, stored)
+            self._replace('regional_prices', "INSERT OR REPLACE INTO regional_prices"
+                          " (app_id, locale, currency, price, discount, final_price) VALUES (?, ?, ?, ?, ?, ?)", (
+                (app_id,) + prices for app_id, values in regional.items() for prices in values
+            ), regional, stored)
+        return {'games': len(games), 'history': len(history)}
+
+    def _replace(self, table:str, insert_sql:str, rows, app_ids, stored:set):
+        """Replaces the rows of the given games in a child table. Games not
+        stored before the batch have none to delete."""
+        if not app_ids:
+            return
+        self.db.executemany(
+            f"DELETE FROM {table} WHERE app_id = ?", ((app_id,) for app_id in app_ids if app_id in stored)
+        )
+        self.db.executemany(insert_sql, rows)
+
+    def latest_price(self, app_id:int):
+        """Last known (price, discount, final_price) of a game, None if it is not stored."""
+        return self.db.execute(
+            "SELECT price, discount, final_price FROM games WHERE app_id = ?", (app_id,)
+        ).fetchone()
+
+    def price_history(self, app_id:int) -> list:
+        """(observed_at, price, discount, final_price) of every change of a game, oldest first."""
+        return self.db.execute(
+            "SELECT observed_at, price, discount, final_price FROM price_history WHERE app_id = ? ORDER BY observed_at",
+            (app_id,),
+        ).fetchall()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,202 @@
+"""Download handler keeping persistent connections to the store.
+
+Scrapy's HTTP/1.1 handler already keeps connections alive, but it builds an
+SSL context for every request and every new connection does a full TLS
+handshake. PooledDownloadHandler reuses one TLS connection creator (and
+context) per host, offers the session of the last connection to a host to
+the next one (TLS session resumption), counts how often connections are
+reused and can send the requests of some hosts over HTTP/2, multiplexed in
+one connection (requires the h2 package).
+
+It relies on private attributes of scrapy's handler (_pool, _contextFactory)
+and of Twisted (HTTPConnectionPool._connections and _factory,
+ClientTLSOptions._identityVerifyingInfoCallback, _sslverify._tolerateErrors),
+as of Scrapy 2.8, Twisted 22.10 and pyOpenSSL 23.3. Missing ones only turn
+off the features or counters that need them.
+"""
+import logging
+import weakref
+
+from OpenSSL import SSL
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.interfaces import IOpenSSLClientConnectionCreator
+from twisted.web.client import HTTPConnectionPool
+from twisted.web.iweb import IPolicyForHTTPS
+from zope.interface import implementer
+
+try:
+    from twisted.internet._sslverify import _tolerateErrors
+except ImportError:
+    _tolerateErrors = None
+
+logger = logging.getLogger(__name__)
+
+
+class CountingConnectionPool(HTTPConnectionPool):
+    """HTTPConnectionPool counting the requests sent over a cached connection
+    (reused) and over a new one."""
+
+    def __init__(self, reactor, persistent=True):
+        super().__init__(reactor, persistent)
+        self.reused = 0
+        self.new = 0
+
+    def getConnection(self, key, endpoint):
+        # Cached connections are removed from the pool when they are lost.
+        if getattr(self, '_connections', {}).get(key):
+            self.reused += 1
+        else:
+            self.new += 1
+        return super().getConnection(key, endpoint)
+
+
+@implementer(IPolicyForHTTPS)
+class TLSSessionCache:
+    """Wraps a context factory (DOWNLOADER_CLIENTCONTEXTFACTORY), keeping one
+    connection creator per host and port, and resuming TLS sessions.
+
+    The session is read from the last connection to the host when the next
+    one is created. TLS 1.3 sends the session tickets after the handshake,
+    so they can't be read when the handshake ends.
+
+    Connections offered a session are counted as resumed if the server
+    accepted it, checked when their handshake ends. pyOpenSSL has no
+    SSL_session_reused, a resumed connection keeps the offered session, so
+    its master key is still the one of the session offered (a full handshake
+    makes a new session). Counting needs the host verification callback of
+    Twisted's ClientTLSOptions to chain to, resumed is None without it.
+    """
+
+    def __init__(self, context_factory):
+        self.context_factory = context_factory
+        self.creators = {}
+        self.connections = 0
+        self.offered = 0
+        self.resumed = 0 if _tolerateErrors is not None else None
+
+    def creatorForNetloc(self, hostname, port):
+        creator = self.creators.get((hostname, port))
+        if creator is None:
+            creator = self.creators[(hostname, port)] = _ResumingCreator(
+                self, self.context_factory.creatorForNetloc(hostname, port)
+            )
+        return creator
+
+
+@implementer(IOpenSSLClientConnectionCreator)
+class _ResumingCreator:
+
+    def __init__(self, cache:TLSSessionCache, creator):
+        self.cache = cache
+        self.creator = creator
+        self.last = None
+        # Connection -> master key of the session it was offered.
+        self.offered = weakref.WeakKeyDictionary()
+        self.verify = getattr(creator, '_identityVerifyingInfoCallback', None)
+        self.counting = False
+
+    def clientConnectionForTLS(self, tlsProtocol):
+        connection = self.creator.clientConnectionForTLS(tlsProtocol)
+        self.cache.connections += 1
+        if not self.counting and self.verify is not None and self.cache.resumed is not None:
+            # The context is the creator's own, its callback is replaced once
+            # by one calling the creator's and then counting.
+            connection.get_context().set_info_callback(_tolerateErrors(self.info_callback))
+            self.counting = True
+        session = self.last.get_session() if self.last is not None else None
+        if session is not None:
+            try:
+                connection.set_session(session)
+                self.cache.offered += 1
+                self.offered[connection] = self.last.master_key()
+            except SSL.Error:
+                pass
+        self.last = connection
+        return connection
+
+    def info_callback(self, connection, where, ret):
+        self.verify(connection, where, ret)
+        if where & SSL.SSL_CB_HANDSHAKE_DONE:
+            offered = self.offered.pop(connection, None)
+            if offered is not None and connection.master_key() == offered:
+                self.cache.resumed += 1
+
+
+class PooledDownloadHandler(HTTP11DownloadHandler):
+    """HTTP/1.1 handler with a counted connection pool and TLS session
+    resumption. Requests to CONNECTION_POOL_HTTP2_HOSTS (https only) are sent
+    with scrapy's HTTP/2 handler if h2 is installed.
+
+    Pool settings:
+        CONNECTION_POOL_MAX_PER_HOST: idle connections kept per host
+            (CONCURRENT_REQUESTS_PER_DOMAIN by default).
+        CONNECTION_POOL_IDLE_TIMEOUT: seconds an idle connection is kept.
+
+    Stats (connection_pool/*): requests, reused and new connections, their
+    reuse_ratio, TLS connections, the ones offered a session to resume and
+    the ones resumed (tls_resumption_ratio), and HTTP/2 requests.
+    """
+
+    def __init__(self, settings, crawler=None):
+        super().__init__(settings, crawler)
+        from twisted.internet import reactor
+
+        # Same attributes as HTTP11DownloadHandler.__init__ sets.
+        self._pool = CountingConnectionPool(reactor, persistent=True)
+        self._pool.maxPersistentPerHost = (
+            settings.getint('CONNECTION_POOL_MAX_PER_HOST') or settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN')
+        )
+        self._pool.cachedConnectionTimeout = settings.getint('CONNECTION_POOL_IDLE_TIMEOUT', 240)
+        if hasattr(self._pool, '_factory'):
+            self._pool._factory.noisy = False
+        if hasattr(self, '_contextFactory'):
+            self._contextFactory = TLSSessionCache(self._contextFactory)
+        else:
+            logger.warning("HTTP11DownloadHandler has no _contextFactory, TLS sessions are not resumed")
+
+        self.http2_hosts = set(settings.getlist('CONNECTION_POOL_HTTP2_HOSTS'))
+        self.http2 = None
+        self.http2_requests = 0
+        if self.http2_hosts:
+            try:
+                from scrapy.core.downloader.handlers.http2 import H2DownloadHandler
+            except ImportError:
+                logger.warning("CONNECTION_POOL_HTTP2_HOSTS needs the h2 package, using HTTP/1.1")
+            else:
+                self.http2 = H2DownloadHandler(settings, crawler)
+
+    def download_request(self, request, spider):
+        if self.http2 is not None:
+            url = urlparse_cached(request)
+            if url.scheme == 'https' and url.hostname in self.http2_hosts:
+                self.http2_requests += 1
+                return self.http2.download_request(request, spider)
+        return super().download_request(request, spider)
+
+    def close(self):
+        self.set_stats()
+        if self.http2 is not None:
+            self.http2.close()
+        return super().close()
+
+    def set_stats(self):
+        if self._crawler is None:
+            return
+        stats = self._crawler.stats
+        pool, tls = self._pool, getattr(self, '_contextFactory', None)
+        requests = pool.reused + pool.new
+        stats.set_value('connection_pool/requests', requests)
+        stats.set_value('connection_pool/reused', pool.reused)
+        stats.set_value('connection_pool/new', pool.new)
+        if requests:
+            stats.set_value('connection_pool/reuse_ratio', round(pool.reused / requests, 4))
+        if isinstance(tls, TLSSessionCache):
+            stats.set_value('connection_pool/tls_connections', tls.connections)
+            stats.set_value('connection_pool/tls_resumptions_offered', tls.offered)
+            if tls.resumed is not None:
+                stats.set_value('connection_pool/tls_resumed', tls.resumed)
+                if tls.connections:
+                    stats.set_value('connection_pool/tls_resumption_ratio', round(tls.resumed / tls.connections, 4))
+        if self.http2 is not None:
+            stats.set_value('connection_pool/http2_requests', self.http2_requests)
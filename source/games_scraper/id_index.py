@@ -0,0 +1,160 @@
+"""Compact membership indexes of game IDs, used by SeenIds instead of a set.
+
+Steam app IDs are dense integers below a few millions, IdBitmap keeps one bit
+per possible ID (5M IDs below 2^25 take 4 MiB, a set of them takes hundreds).
+BloomFilter is for sparse IDs: its size depends on the number of IDs and the
+false positive rate, not on the largest ID. A false positive is a new ID taken
+as already seen, so that game is not crawled.
+"""
+import math
+import struct
+
+
+class IdBitmap:
+    """Exact set of non-negative integers as a bitmap, growing as needed.
+
+    Args:
+        size (int): Initial number of bits.
+        max_id (int): Largest accepted ID, so a wrong ID can't grow the bitmap to GiBs.
+    """
+
+    kind = "bitmap"
+
+    def __init__(self, size:int = 0, max_id:int = 2 ** 30):
+        self.bits = bytearray((size + 7) // 8)
+        self.max_id = max_id
+        self.count = 0
+
+    def add(self, id:int) -> bool:
+        """Adds an ID.
+
+        Returns:
+            bool: True if it was not in the bitmap.
+        """
+        byte, bit = id >> 3, 1 << (id & 7)
+        if byte >= len(self.bits):
+            if id > self.max_id or id < 0:
+                raise ValueError(f"ID {id} out of the bitmap range [0, {self.max_id}]")
+            self.bits.extend(bytes(max(byte + 1, 2 * len(self.bits)) - len(self.bits)))
+        if self.bits[byte] & bit:
+            return False
+        self.bits[byte] |= bit
+        self.count += 1
+        return True
+
+    def __contains__(self, id) -> bool:
+        byte = id >> 3
+        return 0 <= byte < len(self.bits) and bool(self.bits[byte] & (1 << (id & 7)))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        """IDs in increasing order."""
+        bits = self.bits
+        for byte in range(len(bits)):
+            if bits[byte]:
+                for bit in range(8):
+                    if bits[byte] & (1 << bit):
+                        yield byte * 8 + bit
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def to_bytes(self) -> bytes:
+        return struct.pack("<Q", self.count) + bytes(self.bits)
+
+    def load_bytes(self, data:bytes):
+        self.count = struct.unpack_from("<Q", data)[0]
+        self.bits = bytearray(data[8:])
+
+
+class BloomFilter:
+    """Bloom filter of integers: no false negatives, false positives at about
+    fp_rate while it holds at most capacity IDs. 5M IDs at 0.001 take 8.6 MiB.
+
+    Args:
+        capacity (int): Expected number of IDs.
+        fp_rate (float): False positive rate at capacity.
+    """
+
+    kind = "bloom"
+
+    def __init__(self, capacity:int = 5_000_000, fp_rate:float = 0.001):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, id:int):
+        """Bit positions of an ID, by double hashing of a splitmix64 mix of it."""
+        h = (id + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        h ^= h >> 31
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, id:int) -> bool:
+        """Adds an ID.
+
+        Returns:
+            bool: True if it was not in the filter (a false positive returns False).
+        """
+        new = False
+        bits = self.bits
+        for position in self.positions(id):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not bits[byte] & bit:
+                bits[byte] |= bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, id) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self.positions(id))
+
+    def __len__(self) -> int:
+        """IDs added, not counting the false positives."""
+        return self.count
+
+    def __iter__(self):
+        raise TypeError("The IDs of a BloomFilter can't be listed")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def to_bytes(self) -> bytes:
+        return struct.pack("<QdQ", self.capacity, self.fp_rate, self.count) + bytes(self.bits)
+
+    def load_bytes(self, data:bytes):
+        capacity, fp_rate, count = struct.unpack_from("<QdQ", data)
+        if (capacity, fp_rate) != (self.capacity, self.fp_rate):
+            raise ValueError(f"Bloom filter of capacity {capacity} and fp rate {fp_rate}, "
+                             f"expected {self.capacity} and {self.fp_rate}")
+        self.count = count
+        self.bits = bytearray(data[struct.calcsize("<QdQ"):])
+
+
+def new_id_index(kind:str = "bitmap", capacity:int = 5_000_000, fp_rate:float = 0.001):
+    """Index of a kind ("bitmap" or "bloom")."""
+    if kind == "bitmap":
+        return IdBitmap()
+    if kind == "bloom":
+        return BloomFilter(capacity, fp_rate)
+    raise ValueError(f"Unknown id index {kind}, use bitmap or bloom")
+
+
+def id_index_from_settings(settings):
+    """Index configured by SEEN_IDS_INDEX, SEEN_IDS_CAPACITY and SEEN_IDS_FP_RATE."""
+    return new_id_index(
+        settings.get("SEEN_IDS_INDEX", "bitmap"),
+        settings.getint("SEEN_IDS_CAPACITY", 5_000_000),
+        settings.getfloat("SEEN_IDS_FP_RATE", 0.001),
+    )
@@ -0,0 +1,104 @@
+import os
+
+from games_scraper.data_io import iter_records, open_data
+
+
+class IdLogWriter:
+    """Appends game IDs to a text file as they are found, one per line. Every
+    line is flushed so readers see IDs while the writer is still running.
+
+    While the writer is open "<path>.done" does not exist. It is created on
+    close, telling readers that no more IDs will come.
+
+    Compressed logs (".gz", ".zst", see games_scraper.data_io) are buffered by
+    the compressor, they can only be read once the writer is closed.
+    """
+
+    def __init__(self, path:str):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        if os.path.exists(self.done_path):
+            os.remove(self.done_path)
+        if path.endswith((".gz", ".zst")):
+            self._file = open_data(path, "at")
+        else:
+            self._file = open(path, "a", buffering=1)
+
+    @property
+    def done_path(self) -> str:
+        return f"{self.path}.done"
+
+    def write(self, id:int):
+        self._file.write(f"{id}\n")
+
+    def close(self):
+        """Closes the log and marks it as done."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            open(self.done_path, "w").close()
+
+
+class IdLogReader:
+    """Reads the game IDs of an IdLogWriter log, remembering where it stopped, so
+    the log can be followed while it is being written. Only complete lines are
+    read. Memory does not depend on the size of the log.
+
+    Files in the old format (a "[1, 2, 3]" list) are also accepted, those are
+    streamed at once. Compressed logs are read through games_scraper.data_io.
+    """
+
+    def __init__(self, path:str):
+        self.path = path
+        self.offset = 0
+        self.legacy = False
+
+    @property
+    def done(self) -> bool:
+        """True if the writer has closed the log. Old format files are always done."""
+        return self.legacy or os.path.exists(f"{self.path}.done")
+
+    @staticmethod
+    def last_id(path:str) -> int:
+        """Last complete ID of a log, None if it is missing, empty or in the old format."""
+        if not os.path.isfile(path):
+            return None
+        if path.endswith((".gz", ".zst")):
+            last = None
+            for last in IdLogReader(path).read_new():
+                pass
+            return last
+        with open(path, "rb") as log_file:
+            log_file.seek(max(0, os.path.getsize(path) - 64))
+            lines = log_file.read().split(b"\n")[:-1]
+        if not lines or not lines[-1].strip().isdigit():
+            return None
+        return int(lines[-1])
+
+    def read_new(self):
+        """Yields the IDs added since the last call."""
+        if not os.path.isfile(self.path):
+            return
+
+        if self.offset == 0:
+            with open_data(self.path, "rb") as log_file:
+                self.legacy = log_file.read(64).lstrip().startswith(b"[")
+            if self.legacy:
+                self.offset = os.path.getsize(self.path)
+                yield from iter_records(self.path)
+                return
+        elif self.legacy:
+            return
+
+        with open_data(self.path, "rb") as log_file:
+            # Compressed files emulate the seek reading up to the offset.
+            log_file.seek(self.offset)
+            for line in log_file:
+                if not line.endswith(b"\n"):
+                    break
+                self.offset += len(line)
+                line = line.strip()
+                if line:
+                    yield int(line)
@@ -0,0 +1,148 @@
+"""Content-addressed image store of ContentImagesPipeline.
+
+Images are stored once per content, named by the SHA-1 of their bytes and
+sharded by its first characters: full/ab/cd/abcd....jpg and
+thumbs/<name>/ab/cd/abcd....jpg. An ImageIndex remembers which content every
+url had, so urls already stored are not downloaded again in later runs.
+"""
+import hashlib
+import io
+import mimetypes
+import os
+import sqlite3
+import time
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/webp': '.webp'}
+
+
+def content_path(checksum:str, extension:str, folder:str = "full") -> str:
+    """Store path of a content, relative to IMAGES_STORE."""
+    return f"{folder}/{checksum[:2]}/{checksum[2:4]}/{checksum}{extension}"
+
+
+def image_extension(url:str, content_type:str = None) -> str:
+    """Extension of an image from its Content-Type, or its url."""
+    if content_type:
+        extension = EXTENSIONS.get(content_type.split(';')[0].strip().lower())
+        if extension:
+            return extension
+    extension = os.path.splitext(url.split('?')[0])[1].lower()
+    if extension in mimetypes.types_map:
+        return '.jpg' if extension == '.jpeg' else extension
+    return ''
+
+
+def process_image(body:bytes, thumbs:dict = None) -> dict:
+    """Hashes an image and makes its thumbnails. Runs in a pool thread (hashlib
+    and Pillow release the GIL on big buffers).
+
+    Args:
+        body (bytes): Image file.
+        thumbs (dict): Thumbnail name -> (width, height). Needs Pillow, without it
+            no thumbnails are made.
+
+    Returns:
+        dict: {'checksum': sha1 hex, 'width': int, 'height': int, 'thumbs': {name: jpeg bytes}}
+            width and height are None without Pillow.
+    """
+    result = {'checksum': hashlib.sha1(body).hexdigest(), 'width': None, 'height': None, 'thumbs': {}}
+    if Image is None:
+        return result
+    with Image.open(io.BytesIO(body)) as image:
+        result['width'], result['height'] = image.size
+        if not thumbs:
+            return result
+        image = image.convert('RGB')
+        for name, size in thumbs.items():
+            thumb = image.copy()
+            thumb.thumbnail(size, Image.LANCZOS)
+            buffer = io.BytesIO()
+            thumb.save(buffer, 'JPEG', quality=85)
+            result['thumbs'][name] = buffer.getvalue()
+    return result
+
+
+class ImageIndex:
+    """Url -> content and content -> stored path of the images, in a SQLite file.
+
+    Args:
+        path (str): SQLite file, created if it doesn't exist.
+        commit_every (int): Changes written in each transaction.
+    """
+
+    def __init__(self, path:str, commit_every:int = 500):
+        self.path = path
+        self.commit_every = commit_every
+        self._pending = 0
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS contents ("
+            " checksum TEXT PRIMARY KEY,"
+            " path TEXT NOT NULL,"
+            " size INTEGER,"
+            " width INTEGER,"
+            " height INTEGER)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url_hash BLOB PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " checksum TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def url_hash(url:str) -> bytes:
+        return hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+
+    def lookup(self, url:str):
+        """Stored content of a url.
+
+        Returns:
+            tuple: (checksum, path, fetched_at) or None if the url is not stored.
+        """
+        return self.db.execute(
+            "SELECT urls.checksum, contents.path, urls.fetched_at FROM urls"
+            " JOIN contents ON contents.checksum = urls.checksum WHERE urls.url_hash = ?",
+            (self.url_hash(url),),
+        ).fetchone()
+
+    def content(self, checksum:str) -> str:
+        """Stored path of a content, None if it is not stored."""
+        row = self.db.execute("SELECT path FROM contents WHERE checksum = ?", (checksum,)).fetchone()
+        return row[0] if row else None
+
+    def add_content(self, checksum:str, path:str, size:int, width:int = None, height:int = None):
+        self.db.execute(
+            "INSERT OR IGNORE INTO contents (checksum, path, size, width, height) VALUES (?, ?, ?, ?, ?)",
+            (checksum, path, size, width, height),
+        )
+        self._written()
+
+    def add_url(self, url:str, checksum:str):
+        self.db.execute(
+            "INSERT OR REPLACE INTO urls (url_hash, url, checksum, fetched_at) VALUES (?, ?, ?, ?)",
+            (self.url_hash(url), url, checksum, time.time()),
+        )
+        self._written()
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.db.commit()
+            self._pending = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
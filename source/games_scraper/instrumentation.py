@@ -0,0 +1,222 @@
+"""Histograms of the request timings and a sampling profiler, used by
+InstrumentationMiddleware.
+
+Metrics are Prometheus style histograms (cumulative buckets, sum and count)
+with labels, exported as Prometheus text (for the textfile collector of
+node_exporter) or as a JSON snapshot with estimated quantiles.
+"""
+import collections
+import sys
+import threading
+import time
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+# name: (buckets, help)
+HISTOGRAMS = {
+    'queue_wait_seconds': (SECONDS_BUCKETS, "Seconds from scheduling a request to starting its download or render."),
+    'download_seconds': (SECONDS_BUCKETS, "Seconds downloading a response (download_latency)."),
+    'render_seconds': (SECONDS_BUCKETS, "Seconds rendering a SeleniumRequest in a browser."),
+    'parse_seconds': (SECONDS_BUCKETS, "Wall seconds in a callback, awaits included."),
+    'items_per_response': (COUNT_BUCKETS, "Items yielded by a callback for a response."),
+    'requests_per_response': (COUNT_BUCKETS, "Requests yielded by a callback for a response."),
+}
+
+
+class Histogram:
+    """Counts of observed values by bucket (upper bounds), plus their sum."""
+
+    def __init__(self, buckets:tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value:float):
+        # Few buckets, a linear scan is as fast as bisect.
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """(upper bound, observations <= bound) pairs, the last bound is +Inf."""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q:float) -> float:
+        """Estimated quantile, interpolating inside the bucket (as histogram_quantile).
+        Values above the last bucket are reported as the last bound."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0.0
+        previous = 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                if bound == float('inf'):
+                    return self.buckets[-1]
+                inside = total - previous
+                return lower + (bound - lower) * ((rank - previous) / inside if inside else 0)
+            lower, previous = bound, total
+        return self.buckets[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else None
+
+
+class Metrics:
+    """Histograms of HISTOGRAMS by name and labels.
+
+    Args:
+        prefix (str): Prefix of the exported metric names.
+        labels (dict): Labels of every metric (the spider name).
+    """
+
+    def __init__(self, prefix:str = "games_scraper", labels:dict = None):
+        self.prefix = prefix
+        self.labels = labels or {}
+        self.histograms = {}
+
+    def observe(self, name:str, value:float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(HISTOGRAMS[name][0])
+        histogram.observe(value)
+
+    def __iter__(self):
+        """(name, labels, histogram) sorted by name and labels."""
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            yield name, dict(labels), histogram
+
+    def prometheus_text(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+        current = None
+        for name, labels, histogram in self:
+            metric = f"{self.prefix}_{name}"
+            if name != current:
+                current = name
+                lines.append(f"# HELP {metric} {HISTOGRAMS[name][1]}")
+                lines.append(f"# TYPE {metric} histogram")
+            labels = dict(self.labels, **labels)
+            for bound, total in histogram.cumulative():
+                le = "+Inf" if bound == float('inf') else repr(float(bound))
+                lines.append(f"{metric}_bucket{_labels_text(dict(labels, le=le))} {total}")
+            lines.append(f"{metric}_sum{_labels_text(labels)} {histogram.sum!r}")
+            lines.append(f"{metric}_count{_labels_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Metrics as a JSON serializable dict, with mean and estimated quantiles."""
+        metrics = {}
+        for name, labels, histogram in self:
+            metrics.setdefault(name, []).append({
+                'labels': labels,
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'mean': histogram.mean,
+                'p50': histogram.quantile(0.5),
+                'p95': histogram.quantile(0.95),
+                'p99': histogram.quantile(0.99),
+                'buckets': [["+Inf" if bound == float('inf') else bound, total]
+                            for bound, total in histogram.cumulative()],
+            })
+        return {'time': time.time(), 'labels': self.labels, 'metrics': metrics}
+
+
+def _labels_text(labels:dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class SamplingProfiler:
+    """Samples the stack of a thread every interval seconds from a background
+    thread, counting the functions running inside the given callbacks.
+
+    A sample whose stack has one of the functions is attributed to the
+    innermost one. Every function between it and the top of the stack counts
+    one cumulative sample, the top one also counts one self sample. Only the
+    code of this process is seen (not ParseOffload workers).
+
+    Args:
+        functions (list): Names of the profiled functions ("parse", "parse_game").
+        interval (float): Seconds between samples.
+        thread_id (int): Sampled thread, the reactor (main) thread by default.
+    """
+
+    def __init__(self, functions, interval:float = 0.005, thread_id:int = None):
+        self.functions = set(functions)
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.samples = 0
+        self.hits = collections.Counter()
+        self.self_samples = collections.Counter()
+        self.cumulative = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling_profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.sample(frame)
+
+    def sample(self, frame):
+        self.samples += 1
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            if code.co_name in self.functions:
+                break
+            frame = frame.f_back
+        else:
+            return
+        self.hits[stack[-1][2]] += 1
+        self.self_samples[stack[0]] += 1
+        for function in set(stack):
+            self.cumulative[function] += 1
+
+    def report(self, top:int = 25) -> str:
+        """Hottest functions by self samples, as a text table."""
+        profiled = sum(self.hits.values())
+        lines = [
+            f"{self.samples} samples every {self.interval * 1000:g} ms, {profiled} in "
+            + ", ".join(f"{name} ({count})" for name, count in self.hits.most_common()),
+            f"{'self %':>7} {'cum %':>7}  function",
+        ]
+        for function, count in self.self_samples.most_common(top):
+            filename, line, name = function
+            lines.append(
+                f"{100 * count / profiled:7.1f} {100 * self.cumulative[function] / profiled:7.1f}  "
+                f"{name} ({filename}:{line})"
+            )
+        return "\n".join(lines)
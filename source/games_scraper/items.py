@@ -2,11 +2,95 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
+#
+# Items are slotted attrs classes: a fixed set of typed fields without a
+# per-item __dict__. ItemAdapter (exporters, pipelines) supports them as items.
+
+from decimal import Decimal
+from typing import List, Optional
+
+from attr import Factory, define
+
+
+@define
+class Category:
+    """A store category, from the categories spider"""
+    name: str
+    url: str
+
+
+@define
+class GamesReducedItem:
+    """A game of a category listing, from the games_reduced spider.
+
+    Prices are in the store currency. If the game is discounted price is the
+    original price, offert the discount percentage (35 for "-35%") and
+    offert_price the discounted price.
+    """
+    id: int
+    name: Optional[str] = None
+    url: Optional[str] = None
+    img_src: Optional[str] = None
+    description: Optional[str] = None
+    tags: List[str] = Factory(list)
+    reviews_category: Optional[str] = None
+    reviews_number: Optional[int] = None
+    date: Optional[str] = None
+    platforms: List[str] = Factory(list)
+    price: Optional[Decimal] = None
+    offert: Optional[int] = None
+    offert_price: Optional[Decimal] = None
+    # Used by the ContentImagesPipeline
+    image_urls: List[str] = Factory(list)
+    images: List[dict] = Factory(list)
 
-import scrapy
 
+@define
+class GamesFullItem:
+    """An app page, from the games_full spider.
 
-class GamesScraperItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+    Review counts, prices, discount (percentage) and metacritic score are
+    numbers. If the game is discounted price is the original price, as in
+    GamesReducedItem. game_content lists the DLCs as {'name': str, 'price': Decimal}.
+    Pages skipped by the incremental crawl only have app_id and unchanged=True.
+    In multi-locale crawls regional_prices has the prices of every locale as
+    {'locale': str, 'currency': str, 'price': Decimal, 'discount': int,
+    'final_price': Decimal}. languages lists the supported languages as
+    {'name': str, 'interface': bool, 'voices': bool, 'subtitles': bool}.
+    field_groups are the groups of fields read from the page (see
+    games_full.FIELD_GROUPS), fields of the others keep their defaults.
+    """
+    app_id: Optional[int] = None
+    unchanged: bool = False
+    name: Optional[str] = None
+    is_dlc: Optional[bool] = None
+    img_src: Optional[str] = None
+    short_description: Optional[str] = None
+    recent_reviews: Optional[str] = None
+    recent_reviews_count: Optional[int] = None
+    all_reviews: Optional[str] = None
+    all_reviews_count: Optional[int] = None
+    reviews_anomally: bool = False
+    release_date: Optional[str] = None
+    developer: Optional[str] = None
+    developer_url: Optional[str] = None
+    publisher: Optional[str] = None
+    publisher_url: Optional[str] = None
+    tags: List[str] = Factory(list)
+    discount_original_price: Optional[Decimal] = None
+    discount_final_price: Optional[Decimal] = None
+    discount: Optional[int] = None
+    price: Optional[Decimal] = None
+    game_content: List[dict] = Factory(list)
+    languages: List[dict] = Factory(list)
+    content_video: List[str] = Factory(list)
+    content_image: List[str] = Factory(list)
+    genre: Optional[str] = None
+    website: Optional[str] = None
+    metacritic_score: Optional[int] = None
+    metacritic_url: Optional[str] = None
+    regional_prices: List[dict] = Factory(list)
+    field_groups: List[str] = Factory(list)
+    # Used by the ContentImagesPipeline
+    image_urls: List[str] = Factory(list)
+    images: List[dict] = Factory(list)
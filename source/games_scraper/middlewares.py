@@ -3,101 +3,895 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import logging
+import queue
+import sys
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from importlib import import_module
+
+from itemadapter import ItemAdapter
 from scrapy import signals
+from scrapy.core.downloader import Slot
+from scrapy.exceptions import IgnoreRequest, NotConfigured, StopDownload
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+
+from games_scraper.data_io import atomic_write, write_json
+from games_scraper.extractors import truncate_at
+from games_scraper.instrumentation import Metrics, SamplingProfiler
+from games_scraper.page_cache import PageCache
+from twisted.internet import task, threads
+from twisted.internet.error import TCPTimedOutError, TimeoutError
+from twisted.python.threadpool import ThreadPool
+
+logger = logging.getLogger(__name__)
+
 
-# useful for handling different item types with a single interface
-from itemadapter import is_item, ItemAdapter
+class InstrumentationMiddleware:
+    """Spider middleware recording the timings of every request in histograms
+    (see games_scraper.instrumentation):
 
+        queue_wait_seconds{host}: from being scheduled to starting its download
+            (or its render, waiting for an idle browser included).
+        download_seconds{host}: download_latency of the response.
+        render_seconds{host}: render time of SeleniumRequests (BrowserPoolMiddleware).
+        parse_seconds{callback}: wall time in the callback, awaits included.
+            Callbacks are timed while their output is iterated, which is when
+            generator callbacks (all the ones of this project) run.
+        items_per_response{callback}, requests_per_response{callback}.
 
-class GamesScraperSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    Download timings come from signals, so they cover the requests scheduled
+    from signal handlers too. It should be the closest middleware to the
+    spider (the highest order), so parse times don't include other middlewares.
+
+    Metrics are written every INSTRUMENTATION_INTERVAL seconds and when the
+    spider closes to INSTRUMENTATION_JSON_FILE and INSTRUMENTATION_PROMETHEUS_FILE
+    (%(spider)s is the spider name). Count, mean and p95 of each histogram are
+    also set in the instrumentation/* stats at the end.
+
+    With INSTRUMENTATION_PROFILE a SamplingProfiler samples the reactor thread
+    while it runs INSTRUMENTATION_PROFILE_FUNCTIONS, the hottest functions are
+    logged and written to INSTRUMENTATION_PROFILE_FILE when the spider closes.
+    """
+
+    def __init__(self, crawler, interval=60, json_file=None, prometheus_file=None, profiler=None,
+                 profile_file=None, profile_top=25):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval = interval
+        self.json_file = json_file
+        self.prometheus_file = prometheus_file
+        self.profiler = profiler
+        self.profile_file = profile_file
+        self.profile_top = profile_top
+        self.metrics = None
+        self.exporter = None
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
+        settings = crawler.settings
+        if not settings.getbool('INSTRUMENTATION_ENABLED'):
+            raise NotConfigured
+        profiler = None
+        if settings.getbool('INSTRUMENTATION_PROFILE'):
+            profiler = SamplingProfiler(
+                settings.getlist('INSTRUMENTATION_PROFILE_FUNCTIONS', ['parse', 'parse_game']),
+                interval=settings.getfloat('INSTRUMENTATION_PROFILE_INTERVAL', 0.005),
+            )
+        middleware = cls(
+            crawler,
+            interval=settings.getfloat('INSTRUMENTATION_INTERVAL', 60),
+            json_file=settings.get('INSTRUMENTATION_JSON_FILE'),
+            prometheus_file=settings.get('INSTRUMENTATION_PROMETHEUS_FILE'),
+            profiler=profiler,
+            profile_file=settings.get('INSTRUMENTATION_PROFILE_FILE'),
+            profile_top=settings.getint('INSTRUMENTATION_PROFILE_TOP', 25),
+        )
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(middleware.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(middleware.response_received, signal=signals.response_received)
+        return middleware
 
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+    def spider_opened(self, spider):
+        self.metrics = Metrics(labels={'spider': spider.name})
+        if self.interval and (self.json_file or self.prometheus_file):
+            self.exporter = task.LoopingCall(self.export, spider)
+            self.exporter.start(self.interval, now=False)
+        if self.profiler is not None:
+            self.profiler.start()
 
-        # Should return None or raise an exception.
-        return None
+    def spider_closed(self, spider):
+        if self.exporter is not None and self.exporter.running:
+            self.exporter.stop()
+        self.export(spider)
+        for name, labels, histogram in self.metrics:
+            prefix = '/'.join(['instrumentation', name, *map(str, labels.values())])
+            self.stats.set_value(f'{prefix}/count', histogram.count, spider=spider)
+            self.stats.set_value(f'{prefix}/mean', round(histogram.mean, 4), spider=spider)
+            self.stats.set_value(f'{prefix}/p95', round(histogram.quantile(0.95), 4), spider=spider)
+
+        if self.profiler is not None:
+            self.profiler.stop()
+            report = self.profiler.report(self.profile_top)
+            logger.info(f"Hottest functions of {spider.name}:\n{report}")
+            if self.profile_file:
+                with atomic_write(self.profile_file % {'spider': spider.name}, fsync=False) as profile_file:
+                    profile_file.write(report + "\n")
+
+    def export(self, spider):
+        """Writes the metrics files."""
+        if self.json_file:
+            write_json(self.json_file % {'spider': spider.name}, self.metrics.snapshot(), fsync=False)
+        if self.prometheus_file:
+            with atomic_write(self.prometheus_file % {'spider': spider.name}, fsync=False) as prometheus_file:
+                prometheus_file.write(self.metrics.prometheus_text())
+
+    def request_scheduled(self, request, spider):
+        # Epoch time, requests may be kept in a JOBDIR between runs.
+        request.meta['scheduled_at'] = time.time()
+
+    def response_received(self, response, request, spider):
+        host = urlparse_cached(request).hostname or ''
+        duration = request.meta.get('render_time')
+        if duration is not None:
+            self.metrics.observe('render_seconds', duration, host=host)
+        else:
+            duration = request.meta.get('download_latency')
+            if duration is not None:
+                self.metrics.observe('download_seconds', duration, host=host)
+        scheduled_at = request.meta.pop('scheduled_at', None)
+        if scheduled_at is not None:
+            wait = time.time() - (duration or 0) - scheduled_at
+            self.metrics.observe('queue_wait_seconds', max(0.0, wait), host=host)
 
     def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+        parse_time = 0.0
+        items = requests = 0
+        result = iter(result)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    r = next(result)
+                except StopIteration:
+                    break
+                finally:
+                    parse_time += time.perf_counter() - start
+                if isinstance(r, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield r
+        finally:
+            self.observe_parse(response, spider, parse_time, items, requests)
+
+    async def process_spider_output_async(self, response, result, spider):
+        parse_time = 0.0
+        items = requests = 0
+        result = result.__aiter__()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    r = await result.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    parse_time += time.perf_counter() - start
+                if isinstance(r, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield r
+        finally:
+            self.observe_parse(response, spider, parse_time, items, requests)
+
+    def observe_parse(self, response, spider, parse_time, items, requests):
+        callback = getattr(response.request, 'callback', None) or spider.parse
+        labels = {'callback': getattr(callback, '__name__', str(callback))}
+        self.metrics.observe('parse_seconds', parse_time, **labels)
+        self.metrics.observe('items_per_response', items, **labels)
+        self.metrics.observe('requests_per_response', requests, **labels)
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
-            yield i
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+class SeenIdsMiddleware:
+    """Drops the requests of games that have already been crawled, before they
+    are scheduled. Requests name their game in meta['app_id'], spiders keep
+    the crawled ids in spider.seen (a SeenIds). Applies to start requests and
+    to requests yielded by callbacks, requests scheduled from signal handlers
+    (spider_idle) don't go through spider middlewares.
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+    Dropped requests are counted in the seen_ids/dropped_requests stat.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('SEEN_IDS_FILTER_ENABLED'):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def known(self, request, spider) -> bool:
+        seen = getattr(spider, 'seen', None)
+        app_id = request.meta.get('app_id')
+        if seen is None or app_id is None or app_id not in seen:
+            return False
+        self.stats.inc_value('seen_ids/dropped_requests', spider=spider)
+        return True
 
     def process_start_requests(self, start_requests, spider):
-        # Called with the start requests of the spider, and works
-        # similarly to the process_spider_output() method, except
-        # that it doesn’t have a response associated.
+        for request in start_requests:
+            if not self.known(request, spider):
+                yield request
+
+    def process_spider_output(self, response, result, spider):
+        for r in result:
+            if not (isinstance(r, Request) and self.known(r, spider)):
+                yield r
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for r in result:
+            if not (isinstance(r, Request) and self.known(r, spider)):
+                yield r
+
+
+class BrowserWorker:
+    """A browser of the pool with its own counters"""
+
+    def __init__(self, index, driver):
+        self.index = index
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPoolMiddleware:
+    """Renders SeleniumRequests in a pool of warm browsers, so pages that need
+    JavaScript are rendered concurrently instead of one at a time.
+
+    Each browser (worker) runs in its own thread. Workers are started with the
+    first SeleniumRequest, so crawls that render no page neither start a
+    browser nor import selenium. They are replaced after BROWSER_POOL_MAX_PAGES
+    pages and whenever the browser crashes. A page that does not load in
+    BROWSER_POOL_PAGE_TIMEOUT seconds fails that request only. When no browser
+    is running nor starting (e.g. none could be started) requests fail at once.
+    Uses the same SELENIUM_* settings as scrapy_selenium.SeleniumMiddleware,
+    drivers are created the Selenium 4 way (options and a Service), or with
+    executable_path on Selenium 3.
+    """
+
+    def __init__(self, crawler, driver_name, driver_executable_path, driver_arguments,
+                 browser_executable_path, pool_size=4, max_pages=50, page_timeout=30,
+                 block_media=True):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.driver_name = driver_name
+        self.driver_executable_path = driver_executable_path
+        self.driver_arguments = driver_arguments or []
+        self.browser_executable_path = browser_executable_path
+        self.pool_size = pool_size
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self.block_media = block_media
+
+        self.idle = queue.Queue()
+        self.workers = {}
+        # Workers being started, guarded by lock.
+        self.starting = 0
+        self.lock = threading.Lock()
+        self.threadpool = ThreadPool(minthreads=pool_size, maxthreads=pool_size, name="browser_pool")
+        self.started = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        driver_name = settings.get('SELENIUM_DRIVER_NAME')
+        driver_executable_path = settings.get('SELENIUM_DRIVER_EXECUTABLE_PATH')
+        if not driver_name or not driver_executable_path:
+            raise NotConfigured('SELENIUM_DRIVER_NAME and SELENIUM_DRIVER_EXECUTABLE_PATH must be set')
+
+        middleware = cls(
+            crawler,
+            driver_name=driver_name,
+            driver_executable_path=driver_executable_path,
+            driver_arguments=settings.getlist('SELENIUM_DRIVER_ARGUMENTS'),
+            browser_executable_path=settings.get('SELENIUM_BROWSER_EXECUTABLE_PATH'),
+            pool_size=settings.getint('BROWSER_POOL_SIZE', 4),
+            max_pages=settings.getint('BROWSER_POOL_MAX_PAGES', 50),
+            page_timeout=settings.getfloat('BROWSER_POOL_PAGE_TIMEOUT', 30),
+            block_media=settings.getbool('BROWSER_POOL_BLOCK_MEDIA', True),
+        )
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def new_driver(self):
+        """Creates a browser the same way scrapy_selenium does, blocking images and
+        web fonts if BROWSER_POOL_BLOCK_MEDIA is set."""
+        webdriver_base_path = f'selenium.webdriver.{self.driver_name}'
+        driver_klass = getattr(import_module(f'{webdriver_base_path}.webdriver'), 'WebDriver')
+        options_klass = getattr(import_module(f'{webdriver_base_path}.options'), 'Options')
+
+        options = options_klass()
+        if self.browser_executable_path:
+            options.binary_location = self.browser_executable_path
+        for argument in self.driver_arguments:
+            options.add_argument(argument)
+
+        if self.block_media:
+            if self.driver_name == 'firefox':
+                options.set_preference('permissions.default.image', 2)
+                options.set_preference('gfx.downloadable_fonts.enabled', False)
+            elif self.driver_name == 'chrome':
+                options.add_argument('--blink-settings=imagesEnabled=false')
+                options.add_experimental_option('prefs', {
+                    'profile.managed_default_content_settings.images': 2,
+                    'profile.managed_default_content_settings.fonts': 2,
+                })
+
+        # Selenium 4 removed the executable_path and <driver>_options arguments,
+        # Selenium 3 drivers don't take a Service.
+        from selenium import __version__ as selenium_version
+        if int(selenium_version.split('.')[0]) < 4:
+            driver = driver_klass(options=options, executable_path=self.driver_executable_path)
+        else:
+            service_klass = getattr(import_module(f'{webdriver_base_path}.service'), 'Service')
+            driver = driver_klass(options=options, service=service_klass(executable_path=self.driver_executable_path))
+        driver.set_page_load_timeout(self.page_timeout)
+        return driver
+
+    def start_worker(self, index):
+        """Starts (or restarts) worker number index and leaves it idle. Runs in a
+        pool thread, the caller has counted it in self.starting."""
+        try:
+            self.workers[index] = BrowserWorker(index, self.new_driver())
+        except Exception as e:
+            logger.error(f"Unable to start browser worker {index}: {e!r}")
+            self.workers.pop(index, None)
+            return
+        finally:
+            with self.lock:
+                self.starting -= 1
+        self.idle.put(self.workers[index])
+
+    @property
+    def alive(self) -> bool:
+        """Whether any worker is running or starting."""
+        with self.lock:
+            return bool(self.workers) or self.starting > 0
+
+    def stop_worker(self, worker):
+        try:
+            worker.driver.quit()
+        except Exception:
+            pass
+
+    def start(self):
+        self.started = True
+        self.threadpool.start()
+        with self.lock:
+            self.starting += self.pool_size
+        for index in range(self.pool_size):
+            self.threadpool.callInThread(self.start_worker, index)
+
+    def spider_closed(self, spider):
+        if not self.started:
+            return
+        while not self.idle.empty():
+            self.stop_worker(self.idle.get())
+        self.threadpool.stop()
+
+    async def process_request(self, request, spider):
+        """Renders SeleniumRequests in the first idle worker, other requests are
+        left to the rest of the downloader."""
+        # SeleniumRequests only exist once the spider has imported scrapy_selenium.
+        scrapy_selenium = sys.modules.get('scrapy_selenium')
+        if scrapy_selenium is None or not isinstance(request, scrapy_selenium.SeleniumRequest):
+            return None
+        if not self.started:
+            self.start()
+        if not self.alive:
+            self.stats.inc_value('browser_pool/no_workers', spider=spider)
+            raise IgnoreRequest(f"No browser worker running to render {request.url}")
+
+        from twisted.internet import reactor
+        deferred = threads.deferToThreadPool(reactor, self.threadpool, self.render, request)
+        response, index, render_time = await maybe_deferred_to_future(deferred)
+
+        prefix = f'browser_pool/worker_{index}'
+        self.stats.inc_value(f'{prefix}/pages', spider=spider)
+        self.stats.inc_value(f'{prefix}/render_time', render_time, spider=spider)
+        self.stats.max_value(f'{prefix}/max_render_time', render_time, spider=spider)
+        request.meta['render_time'] = render_time
+        return response
+
+    def render(self, request):
+        """Runs in a pool thread, blocking until a worker is idle. The worker is
+        always given back: replaced if its browser crashed, idle otherwise.
+
+        Returns:
+            tuple: (HtmlResponse, worker index, render time in seconds)
+        """
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        worker = self.wait_idle(request)
+        driver = worker.driver
+        start = time.monotonic()
+        crashed = False
+        try:
+            driver.get(request.url)
+            for cookie_name, cookie_value in request.cookies.items():
+                driver.add_cookie({'name': cookie_name, 'value': cookie_value})
+
+            if request.wait_until:
+                WebDriverWait(driver, request.wait_time).until(request.wait_until)
+
+            if request.screenshot:
+                request.meta['screenshot'] = driver.get_screenshot_as_png()
+
+            if request.script:
+                driver.execute_script(request.script)
+
+            response = HtmlResponse(
+                driver.current_url,
+                body=str.encode(driver.page_source),
+                encoding='utf-8',
+                request=request
+            )
+            worker.pages += 1
+            return response, worker.index, time.monotonic() - start
+        except TimeoutException:
+            # The page (or the waited element) did not load, the browser is still usable.
+            raise
+        except WebDriverException:
+            crashed = True
+            raise
+        finally:
+            if crashed:
+                self.recycle(worker, crashed=True)
+            else:
+                self.release(worker)
+
+    def wait_idle(self, request) -> BrowserWorker:
+        """Waits for an idle worker. Fails as soon as no worker is running nor
+        starting, or after every worker could have rendered a page."""
+        deadline = time.monotonic() + self.page_timeout * self.pool_size
+        while True:
+            try:
+                return self.idle.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            if not self.alive:
+                raise IgnoreRequest(f"No browser worker running to render {request.url}")
+            if time.monotonic() > deadline:
+                raise IgnoreRequest(f"No browser worker available to render {request.url}")
+
+    def release(self, worker):
+        if worker.pages >= self.max_pages:
+            self.recycle(worker)
+        else:
+            self.idle.put(worker)
+
+    def recycle(self, worker, crashed=False):
+        """Replaces a worker by a fresh browser. Runs in a pool thread."""
+        from twisted.internet import reactor
+        with self.lock:
+            self.starting += 1
+        self.stop_worker(worker)
+        key = 'browser_pool/crashed' if crashed else 'browser_pool/recycled'
+        reactor.callFromThread(self.stats.inc_value, key)
+        self.start_worker(worker.index)
 
-        # Must return only requests (not items).
-        for r in start_requests:
-            yield r
+
+class IncrementalMiddleware:
+    """Skips app pages that haven't changed since the previous run.
+
+    Requests with an 'app_id' meta key are sent with the ETag and Last-Modified
+    of the last downloaded version of the page (If-None-Match and
+    If-Modified-Since headers). A 304 response, or a 200 response whose body
+    hash matches the stored one, is marked with meta['page_unchanged'] = True
+    so the spider doesn't parse it again. Bodies are hashed without their per
+    request tokens (see PageCache.content_hash). Validators and hashes are kept
+    in a PageCache (INCREMENTAL_CACHE_FILE) bounded to
+    INCREMENTAL_CACHE_MAX_ENTRIES pages, evicted when the spider closes.
+
+    A changed page is only stored once the item of its app is scraped, so a
+    page whose parsing or item fails (or a crash before) is parsed again next
+    run instead of being skipped as unchanged.
+    """
+
+    def __init__(self, stats, cache_file, max_entries=200000):
+        self.stats = stats
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.cache = None
+        # app_id -> validators and hash of the changed pages waiting for their item.
+        self.pending = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('INCREMENTAL_ENABLED'):
+            raise NotConfigured
+        middleware = cls(
+            crawler.stats,
+            cache_file=settings.get('INCREMENTAL_CACHE_FILE'),
+            max_entries=settings.getint('INCREMENTAL_CACHE_MAX_ENTRIES', 200000),
+        )
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(middleware.item_scraped, signal=signals.item_scraped)
+        return middleware
+
+    def item_scraped(self, item, spider):
+        """Stores the page of a scraped app."""
+        app_id = ItemAdapter(item).get('app_id')
+        entry = self.pending.pop(app_id, None)
+        if entry is not None:
+            self.cache.put(app_id, *entry)
 
     def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+        self.cache = PageCache(self.cache_file, max_entries=self.max_entries)
+        spider.logger.info(f"Incremental crawl, {len(self.cache)} pages cached in {self.cache_file}")
+
+    def spider_closed(self, spider):
+        if self.pending:
+            self.stats.set_value('incremental/not_stored', len(self.pending), spider=spider)
+            self.pending.clear()
+        evicted = self.cache.evict()
+        if evicted:
+            self.stats.inc_value('incremental/evicted', evicted, spider=spider)
+        self.cache.close()
+
+    def process_request(self, request, spider):
+        app_id = request.meta.get('app_id')
+        if app_id is None:
+            return None
+        entry = self.cache.get(app_id)
+        if entry is None:
+            return None
+
+        etag, last_modified, _ = entry
+        if etag:
+            request.headers.setdefault('If-None-Match', etag)
+        if last_modified:
+            request.headers.setdefault('If-Modified-Since', last_modified)
+        # 304 responses are filtered by HttpErrorMiddleware unless allowed.
+        handled = request.meta.get('handle_httpstatus_list', [])
+        if 304 not in handled:
+            request.meta['handle_httpstatus_list'] = list(handled) + [304]
+        return None
+
+    def process_response(self, request, response, spider):
+        app_id = request.meta.get('app_id')
+        if app_id is None:
+            return response
+
+        if response.status == 304:
+            self.cache.touch(app_id)
+            request.meta['page_unchanged'] = True
+            self.stats.inc_value('incremental/not_modified', spider=spider)
+            return response
+        if response.status != 200:
+            return response
+
+        # Pages read up to meta['stop_at'] (PartialDownloadMiddleware) end where
+        # the download stopped, only the part before the marker is compared.
+        body_hash = PageCache.content_hash(truncate_at(response.body, request.meta.get('stop_at')))
+        entry = self.cache.get(app_id)
+        unchanged = entry is not None and entry[2] == body_hash
+        validators = (self.header(response, b'ETag'), self.header(response, b'Last-Modified'), body_hash)
+        if unchanged:
+            # Its content is already stored, only the validators may be new.
+            self.cache.put(app_id, *validators)
+        else:
+            self.pending[app_id] = validators
+        request.meta['page_unchanged'] = unchanged
+        self.stats.inc_value('incremental/same_hash' if unchanged else 'incremental/changed', spider=spider)
+        return response
+
+    @staticmethod
+    def header(response, name:bytes) -> str:
+        value = response.headers.get(name)
+        return value.decode('latin-1') if value else None
+
+
+class HostThrottle:
+    """Throttling state of a download slot (host).
+
+    Args:
+        host (str): Host name, used in the stats.
+        max_concurrency (int): Upper bound of concurrent requests.
+        min_delay (float): Lower bound of the delay between requests.
+        max_delay (float): Upper bound of the delay between requests.
+        start_delay (float): Delay of the first requests.
+        target_latency (float): Responses slower than this (seconds) increase the delay.
+    """
+
+    def __init__(self, host, max_concurrency=8, min_delay=0.25, max_delay=60, start_delay=1.0, target_latency=2.0):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.start_delay = max(start_delay, min_delay)
+        self.target_latency = target_latency
+
+        self.concurrency = 1
+        self.delay = self.start_delay
+        self.successes = 0
+        self.window_start = time.monotonic()
+        self.window_responses = 0
+        self.rate = 0.0
+
+    def count_response(self):
+        """Updates the responses per second, measured over 10 second windows."""
+        self.window_responses += 1
+        elapsed = time.monotonic() - self.window_start
+        if elapsed >= 10:
+            self.rate = self.window_responses / elapsed
+            self.window_start += elapsed
+            self.window_responses = 0
+
+    def success(self, latency:float):
+        """A response arrived in latency seconds. Fast responses shorten the delay
+        down to min_delay, then add one concurrent request per round of
+        concurrency responses. Slow ones lengthen the delay."""
+        if latency > self.target_latency:
+            self.successes = 0
+            self.delay = min(self.max_delay, max(self.delay, self.min_delay, 0.1) * 1.25)
+            return
+
+        if self.delay > self.min_delay:
+            self.delay *= 0.75
+            if self.delay < max(self.min_delay, 0.01):
+                self.delay = self.min_delay
+            return
+        self.successes += 1
+        if self.successes >= self.concurrency and self.concurrency < self.max_concurrency:
+            self.successes = 0
+            self.concurrency += 1
+
+    def backoff(self, retry_after:float = None) -> float:
+        """The host is rate limiting (or not answering): halves the concurrency and
+        doubles the delay.
+
+        Returns:
+            float: Seconds to wait before the next request.
+        """
+        self.successes = 0
+        self.concurrency = max(1, self.concurrency // 2)
+        self.delay = min(self.max_delay, max(self.delay * 2, self.min_delay, 0.1))
+        wait = self.delay
+        if retry_after is not None:
+            wait = max(wait, min(retry_after, self.max_delay))
+        return wait
 
 
-class GamesScraperDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+class AdaptiveThrottleMiddleware:
+    """Adapts the concurrency and delay of every host to how it is responding.
+
+    Every host (download slot) starts with one request at a time and
+    THROTTLE_START_DELAY. Responses faster than THROTTLE_TARGET_LATENCY shorten
+    the delay and then raise the concurrency, up to the host budget. Slow
+    responses lengthen the delay. THROTTLE_BACKOFF_CODES responses (429, 503)
+    and timeouts halve the concurrency, double the delay and pause the host,
+    for Retry-After seconds if the response has it. Retrying those requests is
+    left to RetryMiddleware.
+
+    Budgets (max_concurrency, min_delay, max_delay, start_delay, target_latency)
+    are given per host in THROTTLE_HOSTS, THROTTLE_DEFAULT is used for other
+    hosts. They are applied to the download slot of every request before it is
+    queued, creating the slot if needed, so the first requests of a host and
+    slots the downloader recreates after dropping them while idle never run
+    at DOWNLOAD_DELAY. Current values are in the throttle/<host>/* stats.
+    """
+
+    def __init__(self, crawler, hosts=None, default=None, backoff_codes=(429, 503), randomize_delay=True):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.hosts = hosts or {}
+        self.default = default or {}
+        self.backoff_codes = set(backoff_codes)
+        self.randomize_delay = randomize_delay
+        self.throttles = {}
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
+        settings = crawler.settings
+        if not settings.getbool('THROTTLE_ENABLED'):
+            raise NotConfigured
+        if settings.getbool('AUTOTHROTTLE_ENABLED'):
+            logger.warning(f"AUTOTHROTTLE_ENABLED, AdaptiveThrottleMiddleware is disabled "
+                           f"(DOWNLOAD_DELAY {settings.getfloat('DOWNLOAD_DELAY')}s)")
+            raise NotConfigured('AdaptiveThrottleMiddleware and AutoThrottle would fight over the download delay')
+
+        default = settings.getdict('THROTTLE_DEFAULT')
+        for key, name in (('start_delay', 'THROTTLE_START_DELAY'), ('target_latency', 'THROTTLE_TARGET_LATENCY')):
+            if settings.get(name) is not None:
+                default.setdefault(key, settings.getfloat(name))
+        middleware = cls(
+            crawler,
+            hosts=settings.getdict('THROTTLE_HOSTS'),
+            default=default,
+            backoff_codes=[int(code) for code in settings.getlist('THROTTLE_BACKOFF_CODES', [429, 503])],
+            randomize_delay=settings.getbool('RANDOMIZE_DOWNLOAD_DELAY'),
+        )
+        return middleware
+
+    @staticmethod
+    def slot_key(request) -> str:
+        """Download slot of a request, as the downloader names it (without
+        CONCURRENT_REQUESTS_PER_IP)."""
+        return request.meta.get('download_slot') or urlparse_cached(request).hostname or ''
+
+    def get_slot(self, request):
+        key = self.slot_key(request)
+        return key, self.crawler.engine.downloader.slots.get(key)
 
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        """Applies the throttle of the host to its slot before the request is
+        queued. Missing slots are created with it instead of DOWNLOAD_DELAY."""
+        key, slot = self.get_slot(request)
+        throttle = self.throttles.get(key)
+        if throttle is None:
+            host = urlparse_cached(request).hostname or key
+            throttle = self.throttles[key] = HostThrottle(host, **self.budget(host))
+        if slot is None:
+            slot = self.crawler.engine.downloader.slots[key] = Slot(
+                throttle.concurrency, throttle.delay, self.randomize_delay)
+            self.apply(throttle, slot, spider)
+        elif slot.concurrency != throttle.concurrency or slot.delay != throttle.delay:
+            self.apply(throttle, slot, spider)
         return None
 
+    def budget(self, host:str) -> dict:
+        """THROTTLE_DEFAULT updated with the budget of the host or of its closest
+        parent domain in THROTTLE_HOSTS."""
+        labels = host.split('.')
+        for i in range(len(labels) - 1):
+            domain = '.'.join(labels[i:])
+            if domain in self.hosts:
+                return dict(self.default, **self.hosts[domain])
+        return dict(self.default)
+
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+        key, slot = self.get_slot(request)
+        throttle = self.throttles.get(key)
+        if throttle is None or slot is None:
+            return response
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        throttle.count_response()
+        if response.status in self.backoff_codes:
+            self.backoff(throttle, slot, spider, self.retry_after(response))
+        elif 'download_latency' in request.meta:
+            throttle.success(request.meta['download_latency'])
+            self.apply(throttle, slot, spider)
         return response
 
     def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+        if not isinstance(exception, (TimeoutError, TCPTimedOutError)):
+            return None
+        key, slot = self.get_slot(request)
+        throttle = self.throttles.get(key)
+        if throttle is not None and slot is not None:
+            self.backoff(throttle, slot, spider)
+        return None
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+    def backoff(self, throttle, slot, spider, retry_after=None):
+        wait = throttle.backoff(retry_after)
+        self.apply(throttle, slot, spider)
+        # The downloader waits slot.delay since slot.lastseen before sending the next request.
+        slot.lastseen = max(slot.lastseen, time.time() + wait - slot.delay)
+        self.stats.inc_value(f'throttle/{throttle.host}/backoff', spider=spider)
+        logger.info(f"Backing off {throttle.host} for {wait:.1f}s (concurrency {throttle.concurrency}, delay {throttle.delay:.2f}s)")
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+    def apply(self, throttle, slot, spider):
+        slot.concurrency = throttle.concurrency
+        slot.delay = throttle.delay
+        prefix = f'throttle/{throttle.host}'
+        self.stats.set_value(f'{prefix}/concurrency', throttle.concurrency, spider=spider)
+        self.stats.set_value(f'{prefix}/delay', round(throttle.delay, 3), spider=spider)
+        self.stats.set_value(f'{prefix}/rate', round(throttle.rate, 2), spider=spider)
+        self.stats.max_value(f'{prefix}/max_delay', round(throttle.delay, 3), spider=spider)
+
+    @staticmethod
+    def retry_after(response):
+        """Seconds in the Retry-After header of a response (delta or HTTP date), None if missing."""
+        value = response.headers.get(b'Retry-After')
+        if not value:
+            return None
+        value = value.decode('latin-1').strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class PartialDownloadMiddleware:
+    """Stops the download of a page once the part its callback parses is in.
+
+    Requests with meta['stop_at'] (a list of pieces of the page, see
+    games_full.stop_markers) are downloaded until the first of them arrives,
+    the rest of the body is not read: the response gets what was received, with
+    the 'download_stopped' flag. Bodies are scanned as they arrive
+    (bytes_received signal), gzip and deflate ones decompressed on the fly.
+    Those requests are sent without br in Accept-Encoding, a truncated brotli
+    body can't be decoded. Stopped downloads are counted in the
+    partial_downloads/stopped stat.
+    """
+
+    ACCEPT_ENCODING = b'gzip, deflate'
+
+    def __init__(self, stats):
+        self.stats = stats
+        # request -> [decompressor or None, encoded markers, tail of the previous chunk]
+        self.scans = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('PARTIAL_DOWNLOADS_ENABLED'):
+            raise NotConfigured
+        middleware = cls(crawler.stats)
+        crawler.signals.connect(middleware.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(middleware.bytes_received, signal=signals.bytes_received)
+        return middleware
+
+    def process_request(self, request, spider):
+        if request.meta.get('stop_at'):
+            # Before HttpCompressionMiddleware, which only sets it if missing.
+            request.headers.setdefault('Accept-Encoding', self.ACCEPT_ENCODING)
+        return None
+
+    def headers_received(self, headers, body_length, request, spider):
+        markers = request.meta.get('stop_at')
+        if not markers:
+            return
+        encoding = (headers.get(b'Content-Encoding') or b'identity').strip().lower()
+        if encoding == b'identity':
+            decompressor = None
+        elif encoding in (b'gzip', b'x-gzip'):
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == b'deflate':
+            decompressor = zlib.decompressobj()
+        else:
+            self.stats.inc_value('partial_downloads/unsupported_encoding', spider=spider)
+            return
+        self.scans[request] = [decompressor, [marker.encode('utf-8') for marker in markers], b'']
+
+    def bytes_received(self, data, request, spider):
+        scan = self.scans.get(request)
+        if scan is None:
+            return
+        decompressor, markers, tail = scan
+        if decompressor is not None:
+            try:
+                data = decompressor.decompress(data)
+            except zlib.error:
+                # Raw deflate or a broken body, downloaded whole.
+                del self.scans[request]
+                return
+        window = tail + data
+        if any(marker in window for marker in markers):
+            del self.scans[request]
+            self.stats.inc_value('partial_downloads/stopped', spider=spider)
+            raise StopDownload(fail=False)
+        # Markers split between two chunks are found in the next one.
+        scan[2] = window[-max(len(marker) for marker in markers):]
+
+    def process_response(self, request, response, spider):
+        self.scans.pop(request, None)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self.scans.pop(request, None)
+        return None
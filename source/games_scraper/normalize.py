@@ -0,0 +1,240 @@
+"""Post-crawl normalization of the localized strings of the spiders' outputs.
+
+The store is crawled in Spanish (DEFAULT_REQUEST_HEADERS), so feeds hold
+prices like "1.234,56€", dates like "12 ABR 2023" and counts like "(1.234)".
+Items of the current spiders already have numeric prices and counts, older
+feeds have the strings. This stage parses whole columns with pandas string
+and regex operations:
+
+    prices    -> <column>_cents, integer cents (Int64)
+    counts    -> integers (Int64), thousands separators ignored
+    discounts -> integer percentages (Int64), "-35%" -> 35
+    dates     -> ISO dates ("2023-04-12"), unknown formats are null
+
+Files are read and written in chunks of rows, so memory depends on the chunk
+size and not on the size of the file.
+
+Usage (from the source folder):
+    python -m games_scraper.normalize data/games_full.jsonl data/games_full.parquet [--chunk-size 100000]
+"""
+import argparse
+import itertools
+import os
+import re
+from datetime import date
+
+import pandas as pd
+
+from games_scraper.data_io import iter_records, write_records
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+PRICE_COLUMNS = ('price', 'offert_price', 'discount_original_price', 'discount_final_price')
+COUNT_COLUMNS = ('reviews_number', 'recent_reviews_count', 'all_reviews_count', 'metacritic_score')
+PERCENT_COLUMNS = ('offert', 'discount')
+DATE_COLUMNS = ('date', 'release_date')
+
+# Month abbreviations of the store in Spanish and English.
+MONTHS = {
+    'ene': 1, 'jan': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7,
+    'ago': 8, 'aug': 8, 'sep': 9, 'set': 9, 'oct': 10, 'nov': 11, 'dic': 12, 'dec': 12,
+}
+# "12 ABR 2023", "12 abr. 2023", "12 de abril de 2023" and "12 Apr, 2023".
+_DAY_FIRST = r"(?P<day>[0-9]{1,2}) +(?:de +)?(?P<month>[a-z]{3})[a-z]*\.?,? +(?:de +)?(?P<year>[0-9]{4})"
+# "Apr 12, 2023"
+_MONTH_FIRST = r"(?P<month2>[a-z]{3})[a-z]*\.? +(?P<day2>[0-9]{1,2}),? +(?P<year2>[0-9]{4})"
+_DATE = re.compile(f"{_DAY_FIRST}|{_MONTH_FIRST}")
+# First number of a price and its decimals: the digits after its last "," or
+# "." unless there are three ("1.234€"). RE2 has no lookahead, the number ends
+# where no digit or separator followed by a digit does.
+_PRICE = r"(?P<units>[0-9][0-9.,]*?)(?:[.,](?P<cents>[0-9]{1,2}))?(?:[^0-9.,]|[.,][^0-9]|[.,]?$)"
+# Strings are parsed with pyarrow's (RE2) kernels when pyarrow is installed.
+# pandas runs str.extract in a Python loop, _extract calls pyarrow instead.
+_STRING = 'string[pyarrow]' if pa is not None else 'string'
+
+
+def _extract(text:pd.Series, pattern:str) -> pd.DataFrame:
+    """Named groups of the first match of pattern in every string, as str.extract."""
+    if pa is None:
+        return text.str.extract(pattern)
+    matches = pc.extract_regex(pa.array(text), pattern)
+    parts = {}
+    for index, name in enumerate(re.compile(pattern).groupindex):
+        group = pd.Series(pc.struct_field(matches, [index]), index=text.index, dtype=_STRING)
+        # RE2 gives "" for the groups that don't take part in the match.
+        parts[name] = group.mask(group.eq(""))
+    return pd.DataFrame(parts)
+
+
+def _split(values:pd.Series):
+    """Mask of the string values of a column, and its other values as numbers."""
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.Series(False, index=values.index), pd.to_numeric(values)
+    if pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        is_text = values.notna()
+    else:
+        is_text = values.map(type).eq(str)
+    return is_text, pd.to_numeric(values.where(~is_text), errors='coerce')
+
+
+def _to_int(digits:pd.Series) -> pd.Series:
+    """Strings of digits (or empty) as Int64."""
+    digits = digits.mask(digits.eq(""))
+    if pa is not None:
+        # An Arrow cast, an order of magnitude faster than to_numeric.
+        return digits.astype('int64[pyarrow]').astype('Int64')
+    return pd.to_numeric(digits, errors='coerce').astype('Int64')
+
+
+def price_cents(values) -> pd.Series:
+    """Prices in cents, as extractors.parse_price: "1.234,56€", "$1,234.56"
+    and 1234.56 -> 123456. The last "," or "." is the decimal separator
+    unless three digits follow it. Free games ("Gratuito", "Free To Play")
+    are 0, prices without digits null."""
+    values = pd.Series(values)
+    is_text, numbers = _split(values)
+    cents = (numbers * 100).round().astype('Int64')
+    if is_text.any():
+        text = values[is_text].astype(_STRING)
+        parts = _extract(text, _PRICE)
+        units = _to_int(parts['units'].str.replace(r"[.,]", "", regex=True))
+        decimals = _to_int(parts['cents'].str.pad(2, side='right', fillchar='0')).fillna(0)
+        parsed = units * 100 + decimals
+        no_price = parsed.isna()
+        parsed[no_price] = text[no_price].str.contains("grat|free", case=False, regex=True).map({True: 0, False: None})
+        cents[is_text] = parsed
+    return cents
+
+
+def counts(values) -> pd.Series:
+    """Integers in localized texts, ignoring anything but digits: "(1.234)" -> 1234."""
+    values = pd.Series(values)
+    is_text, numbers = _split(values)
+    result = numbers.round().astype('Int64')
+    if is_text.any():
+        result[is_text] = _to_int(values[is_text].astype(_STRING).str.replace(r"[^0-9]+", "", regex=True))
+    return result
+
+
+def percents(values) -> pd.Series:
+    """Discount percentages: "-35%" and -35 -> 35."""
+    return counts(values).abs()
+
+
+def iso_dates(values) -> pd.Series:
+    """Release dates as ISO strings: "12 ABR 2023" -> "2023-04-12". Dates that
+    are not a day ("Próximamente", "Q2 2023") are null."""
+    text = pd.Series(values).astype(_STRING).str.lower()
+    parts = _extract(text, _DATE.pattern)
+    components = pd.DataFrame({
+        'year': _to_int(parts['year'].fillna(parts['year2'])),
+        'month': parts['month'].fillna(parts['month2']).map(MONTHS),
+        'day': _to_int(parts['day'].fillna(parts['day2'])),
+    }, index=text.index).astype('float64')
+    dates = pd.to_datetime(components, errors='coerce')
+    return dates.dt.strftime('%Y-%m-%d').astype(_STRING)
+
+
+def parse_date(value:str) -> str:
+    """iso_dates for a single value, None if it is not a day."""
+    match = _DATE.search(value.lower()) if value else None
+    if match is None:
+        return None
+    groups = match.groupdict()
+    month = MONTHS.get(groups['month'] or groups['month2'])
+    try:
+        return date(int(groups['year'] or groups['year2']), month, int(groups['day'] or groups['day2'])).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_frame(frame:pd.DataFrame) -> pd.DataFrame:
+    """Normalized copy of a frame of items. Columns it doesn't know are kept
+    as they are, price columns are replaced by <column>_cents."""
+    frame = frame.copy()
+    for column in PRICE_COLUMNS:
+        if column in frame:
+            frame.insert(frame.columns.get_loc(column), f"{column}_cents", price_cents(frame.pop(column)))
+    for column in COUNT_COLUMNS:
+        if column in frame:
+            frame[column] = counts(frame[column])
+    for column in PERCENT_COLUMNS:
+        if column in frame:
+            frame[column] = percents(frame[column])
+    for column in DATE_COLUMNS:
+        if column in frame:
+            frame[column] = iso_dates(frame[column])
+    return frame
+
+
+def iter_chunks(path:str, chunk_size:int = 100000):
+    """Frames of chunk_size rows of a feed: a JSON array or JSON lines file (see
+    data_io) or a Parquet file or folder of files."""
+    if path.endswith('.parquet') or os.path.isdir(path):
+        if pq is None:
+            raise ImportError("Reading Parquet requires pyarrow")
+        files = [path] if not os.path.isdir(path) else sorted(
+            os.path.join(path, name) for name in os.listdir(path) if name.endswith('.parquet')
+        )
+        for file in files:
+            for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_size):
+                yield batch.to_pandas()
+        return
+    records = iter_records(path)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return
+        yield pd.DataFrame.from_records(chunk)
+
+
+def normalize_file(input_path:str, output_path:str, chunk_size:int = 100000) -> int:
+    """Normalizes a feed chunk by chunk into a JSON lines (atomically written)
+    or a Parquet file.
+
+    The Parquet schema is the one of the first chunk, columns without values
+    in it are strings.
+
+    Returns:
+        int: Number of rows.
+    """
+    chunks = (normalize_frame(chunk) for chunk in iter_chunks(input_path, chunk_size))
+    if not output_path.endswith('.parquet'):
+        return write_records(output_path, (
+            {key: value for key, value in record.items() if value is not None}
+            for chunk in chunks for record in chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+        ))
+
+    if pq is None:
+        raise ImportError("Writing Parquet requires pyarrow")
+    rows = 0
+    writer = schema = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Table.from_pandas(chunk, preserve_index=False).schema
+                schema = pa.schema([
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema
+                ])
+                writer = pq.ParquetWriter(output_path, schema, compression='zstd')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalizes the prices, counts and dates of a feed")
+    parser.add_argument("input", help="JSON, JSON lines or Parquet feed")
+    parser.add_argument("output", help="JSON lines or .parquet file")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{normalize_file(args.input, args.output, args.chunk_size)} rows written to {args.output}")
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class ParseOffload:
+    """Extension running the spiders' extraction functions in a pool of processes,
+    so parsing doesn't block the reactor and can use more than one core.
+
+    Spiders call extraction functions through offload(). While this extension is
+    enabled (PARSE_OFFLOAD_ENABLED) those calls are sent to PARSE_OFFLOAD_WORKERS
+    processes, with at most PARSE_OFFLOAD_MAX_INFLIGHT of them queued or running.
+    Callbacks waiting for a free slot keep their responses in the scraper, and
+    scrapy stops downloading when too many responses are waiting (see
+    SCRAPER_SLOT_MAX_ACTIVE_SIZE). Requires the asyncio reactor.
+    """
+
+    def __init__(self, stats, workers:int = None, max_inflight:int = None):
+        self.stats = stats
+        self.workers = workers
+        self.max_inflight = max_inflight or 2 * (workers or 1)
+        self.executor = None
+        self.slots = None
+        self.inflight = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PARSE_OFFLOAD_ENABLED'):
+            raise NotConfigured
+        ext = cls(
+            crawler.stats,
+            workers=settings.getint('PARSE_OFFLOAD_WORKERS') or None,
+            max_inflight=settings.getint('PARSE_OFFLOAD_MAX_INFLIGHT') or None,
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.slots = asyncio.Semaphore(self.max_inflight)
+        spider.parse_offload = self
+        logger.info(f"Parsing in {self.workers or os.cpu_count()} processes, up to {self.max_inflight} pages in flight")
+
+    def spider_closed(self, spider):
+        spider.parse_offload = None
+        self.executor.shutdown(wait=True)
+
+    async def run(self, func, *args):
+        """Runs func(*args) in a worker process.
+
+        Args:
+            func (callable): Module level function (it is pickled).
+
+        Returns:
+            Whatever func returns.
+        """
+        async with self.slots:
+            self.inflight += 1
+            self.stats.max_value('parse_offload/max_inflight', self.inflight)
+            try:
+                result = await asyncio.wrap_future(self.executor.submit(func, *args))
+            finally:
+                self.inflight -= 1
+        self.stats.inc_value('parse_offload/pages')
+        return result
+
+
+async def offload(spider, func, *args):
+    """Runs an extraction function in the spider's ParseOffload pool if it is
+    enabled, otherwise in the calling thread.
+
+    Args:
+        spider (Spider): Spider whose response is parsed.
+        func (callable): Module level function, its arguments and result must be picklable.
+
+    Returns:
+        Whatever func returns.
+    """
+    parse_offload = getattr(spider, 'parse_offload', None)
+    if parse_offload is None:
+        return func(*args)
+    return await parse_offload.run(func, *args)
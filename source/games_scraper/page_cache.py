@@ -0,0 +1,110 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+# Parts of the store pages that change on every request (session ids, CSP
+# nonces, server time), blanked before hashing.
+VOLATILE = re.compile(rb'(g_sessionID\s*=\s*"|name="sessionid" value="|[?&]sessionid=|nonce="|g_ServerTime\s*=\s*)'
+                      rb'[\w+/=-]*')
+
+
+class PageCache:
+    """Validators (ETag, Last-Modified) and body hash of the last downloaded
+    version of every app page, kept in a SQLite file.
+
+    Only a few dozen bytes are stored per page, the bodies are not. The cache is
+    bounded to max_entries pages, the ones not seen for longest are evicted.
+    """
+
+    def __init__(self, path:str, max_entries:int = 200000, commit_every:int = 500):
+        """
+        Args:
+            path (str): SQLite file, created if it doesn't exist.
+            max_entries (int): Pages kept after evict(). 0 means no limit.
+            commit_every (int): Updates written in each transaction.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self._pending = 0
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " app_id INTEGER PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " body_hash BLOB,"
+            " seen_at REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_seen_at ON pages (seen_at)")
+
+    @staticmethod
+    def hash(body:bytes) -> bytes:
+        return hashlib.blake2b(body, digest_size=16).digest()
+
+    @staticmethod
+    def content_hash(body:bytes) -> bytes:
+        """Hash of a page without its per request tokens (VOLATILE)."""
+        return PageCache.hash(VOLATILE.sub(rb"\1", body))
+
+    def get(self, app_id:int):
+        """Stored entry of a page.
+
+        Returns:
+            tuple: (etag, last_modified, body_hash) or None if the page is not cached.
+        """
+        return self.db.execute(
+            "SELECT etag, last_modified, body_hash FROM pages WHERE app_id = ?", (app_id,)
+        ).fetchone()
+
+    def put(self, app_id:int, etag:str = None, last_modified:str = None, body_hash:bytes = None):
+        """Stores the current version of a page."""
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages (app_id, etag, last_modified, body_hash, seen_at) VALUES (?, ?, ?, ?, ?)",
+            (app_id, etag, last_modified, body_hash, time.time()),
+        )
+        self._written()
+
+    def touch(self, app_id:int):
+        """Marks a page as seen now, so it is not evicted."""
+        self.db.execute("UPDATE pages SET seen_at = ? WHERE app_id = ?", (time.time(), app_id))
+        self._written()
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.db.commit()
+            self._pending = 0
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def evict(self) -> int:
+        """Deletes the least recently seen pages above max_entries.
+
+        Returns:
+            int: Number of evicted pages.
+        """
+        if not self.max_entries:
+            return 0
+        cursor = self.db.execute(
+            "DELETE FROM pages WHERE app_id IN ("
+            " SELECT app_id FROM pages ORDER BY seen_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.db.commit()
+        return cursor.rowcount
+
+    def close(self):
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
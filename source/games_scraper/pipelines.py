@@ -3,31 +3,444 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from importlib.util import find_spec
+from io import BytesIO
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
-from games_scraper.spiders import Categories, GamesReduced
-import pandas as pd
-import logging
+from scrapy.exceptions import NotConfigured
+from scrapy.pipelines.files import FileException, FilesPipeline, FSFilesStore
+from scrapy.settings import Settings
+from twisted.internet import defer, threads
+from twisted.python.threadpool import ThreadPool
+
+from games_scraper import image_store
+from games_scraper.game_db import GameDatabase, game_record
+from games_scraper.image_store import ImageIndex, content_path, image_extension, process_image
+
+logger = logging.getLogger(__name__)
+
+# Spiders with a schema in item_schemas(). The pipeline is loaded for every
+# spider, pyarrow is only imported for these.
+PARQUET_SPIDERS = ('games_reduced', 'games_full')
+
+
+def item_schemas() -> dict:
+    """Arrow schema of the items of every spider exported to Parquet.
+
+    Returns:
+        dict: spider name -> pyarrow.Schema
+    """
+    import pyarrow as pa
+
+    strings = pa.list_(pa.string())
+    price = pa.decimal128(12, 2)
+    images = pa.list_(pa.struct([
+        ('url', pa.string()),
+        ('path', pa.string()),
+        ('checksum', pa.string()),
+        ('status', pa.string()),
+    ]))
+    crawled_at = ('crawled_at', pa.timestamp('s', tz='UTC'))
+    return {
+        'games_reduced': pa.schema([
+            ('id', pa.int64()),
+            ('name', pa.string()),
+            ('url', pa.string()),
+            ('img_src', pa.string()),
+            ('description', pa.string()),
+            ('tags', strings),
+            ('reviews_category', pa.string()),
+            ('reviews_number', pa.int64()),
+            ('date', pa.string()),
+            ('platforms', strings),
+            ('price', price),
+            ('offert', pa.int64()),
+            ('offert_price', price),
+            ('image_urls', strings),
+            ('images', images),
+            crawled_at,
+        ]),
+        'games_full': pa.schema([
+            ('app_id', pa.int64()),
+            # True for the pages skipped by the incremental crawl, other fields are null.
+            ('unchanged', pa.bool_()),
+            ('name', pa.string()),
+            ('is_dlc', pa.bool_()),
+            ('img_src', pa.string()),
+            ('short_description', pa.string()),
+            ('recent_reviews', pa.string()),
+            ('recent_reviews_count', pa.int64()),
+            ('all_reviews', pa.string()),
+            ('all_reviews_count', pa.int64()),
+            ('reviews_anomally', pa.bool_()),
+            ('release_date', pa.string()),
+            ('developer', pa.string()),
+            ('developer_url', pa.string()),
+            ('publisher', pa.string()),
+            ('publisher_url', pa.string()),
+            ('tags', strings),
+            ('discount_original_price', price),
+            ('discount_final_price', price),
+            ('discount', pa.int64()),
+            ('price', price),
+            ('game_content', pa.list_(pa.struct([('name', pa.string()), ('price', price)]))),
+            ('languages', pa.list_(pa.struct([
+                ('name', pa.string()),
+                ('interface', pa.bool_()),
+                ('voices', pa.bool_()),
+                ('subtitles', pa.bool_()),
+            ]))),
+            ('content_video', strings),
+            ('content_image', strings),
+            ('genre', pa.string()),
+            ('website', pa.string()),
+            ('metacritic_score', pa.int64()),
+            ('metacritic_url', pa.string()),
+            ('regional_prices', pa.list_(pa.struct([
+                ('locale', pa.string()),
+                ('currency', pa.string()),
+                ('price', price),
+                ('discount', pa.int64()),
+                ('final_price', price),
+            ]))),
+            ('field_groups', strings),
+            ('image_urls', strings),
+            ('images', images),
+            crawled_at,
+        ]),
+    }
+
+
+class ParquetPipeline:
+    """Exports the items of the spiders in item_schemas() to Parquet files.
+
+    Items are buffered as columns and written as a row group every
+    PARQUET_ROW_GROUP_SIZE items, so memory does not grow with the crawl. A new
+    file is started when the current one reaches PARQUET_MAX_FILE_SIZE bytes or
+    its first item is PARQUET_MAX_FILE_SECONDS old. Files are written to
+    PARQUET_DIR/<spider name>/ and can be loaded together with
+    pyarrow.parquet.read_table(folder). Fields not in the schema are dropped.
+    Items of other spiders are passed through.
+
+    A Parquet file can only be read once its footer is written on close, files
+    are written under a hidden temporary name (".<name>.tmp", skipped by
+    read_table) and renamed when closed. A crash only loses the items of the
+    current file.
+
+    Requires pyarrow.
+    """
+
+    def __init__(self, stats, folder:str, row_group_size:int = 10000, max_file_size:int = 256 * 2 ** 20,
+                 compression:str = 'zstd', max_file_seconds:float = 600):
+        self.stats = stats
+        self.folder = folder
+        self.row_group_size = row_group_size
+        self.max_file_size = max_file_size
+        self.max_file_seconds = max_file_seconds
+        self.compression = compression
+
+        self.schema = None
+        self.columns = None
+        self.rows = 0
+        self.writer = None
+        self.path = None
+        self.tmp_path = None
+        self.part = 0
+        self.started = None
+        # Monotonic time of the first item of the current file.
+        self.file_started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PARQUET_ENABLED'):
+            raise NotConfigured
+        if find_spec('pyarrow') is None:
+            logger.warning("pyarrow is not installed, items are not exported to Parquet")
+            raise NotConfigured('pyarrow is required by ParquetPipeline')
+        return cls(
+            crawler.stats,
+            folder=settings.get('PARQUET_DIR', 'data/parquet'),
+            row_group_size=settings.getint('PARQUET_ROW_GROUP_SIZE', 10000),
+            max_file_size=settings.getint('PARQUET_MAX_FILE_SIZE', 256 * 2 ** 20),
+            compression=settings.get('PARQUET_COMPRESSION', 'zstd'),
+            max_file_seconds=settings.getfloat('PARQUET_MAX_FILE_SECONDS', 600),
+        )
 
-class GamesScraperPipeline:
-    df = pd.DataFrame()
     def open_spider(self, spider):
-        pass
-        # if isinstance(spider, GamesReduced):
-        #     logging.warning("YEEEEEEES 222222222222222")
-        #     logging.warning("\n\n\n")
+        if spider.name not in PARQUET_SPIDERS:
+            return
+        self.schema = item_schemas()[spider.name]
+        self.started = time.strftime("%Y%m%dT%H%M%S")
+        self.columns = {name: [] for name in self.schema.names}
 
     def process_item(self, item, spider):
-        # logging.warning("\n\n\n")
-        # logging.warning(f"PIPELINE: {spider}")
-        # logging.warning(spider.name)
-        # logging.warning("\n\n\n")
-        # logging.warning(item)
-        # logging.warning(type(item))
+        if self.schema is None:
+            return item
+
+        adapter = ItemAdapter(item)
+        for name, column in self.columns.items():
+            column.append(adapter.get(name))
+        self.columns['crawled_at'][-1] = datetime.now(timezone.utc)
+        self.rows += 1
+        if self.file_started is None:
+            self.file_started = time.monotonic()
+        if time.monotonic() - self.file_started >= self.max_file_seconds:
+            self.checkpoint(spider)
+        elif self.rows >= self.row_group_size:
+            self.flush(spider)
+        return item
+
+    def flush(self, spider):
+        """Writes the buffered items as a row group."""
+        if not self.rows:
+            return
+        import pyarrow as pa
+
+        table = pa.Table.from_pydict(self.columns, schema=self.schema)
+        if self.writer is None:
+            self.open_file(spider)
+        self.writer.write_table(table)
+        self.stats.inc_value('parquet/items', self.rows, spider=spider)
+        self.stats.inc_value('parquet/row_groups', spider=spider)
+        for column in self.columns.values():
+            column.clear()
+        self.rows = 0
+
+        if os.path.getsize(self.tmp_path) >= self.max_file_size:
+            self.close_file()
+
+    def open_file(self, spider):
+        import pyarrow.parquet as pq
+
+        folder = os.path.join(self.folder, spider.name)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.part += 1
+        name = f"{self.started}-{self.part:04d}.parquet"
+        self.path = os.path.join(folder, name)
+        self.tmp_path = os.path.join(folder, f".{name}.tmp")
+        self.writer = pq.ParquetWriter(self.tmp_path, self.schema, compression=self.compression)
+        self.stats.inc_value('parquet/files', spider=spider)
+
+    def close_file(self):
+        """Writes the footer of the current file and gives it its final name."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            os.replace(self.tmp_path, self.path)
+        self.file_started = None
+
+    def checkpoint(self, spider):
+        """Writes the buffered items and closes the current file, whose rows can
+        only be read once it has its footer. The next items start a new file."""
+        if self.schema is None:
+            return
+        self.flush(spider)
+        self.close_file()
+
+    def close_spider(self, spider):
+        if self.schema is None:
+            return
+        self.flush(spider)
+        self.close_file()
 
-        # if isinstance(spider, GamesReduced):
-        #     logging.warning("YEEEEEEES 222222222222222")
-        #     logging.warning("\n\n\n")
 
+class SQLitePipeline:
+    """Stores the games of games_reduced and games_full in a GameDatabase
+    (SQLITE_FILE): current values upserted on app id, tags, platforms, DLCs and
+    a price_history row whenever prices or review counts change.
+
+    Items are written in transactions of SQLITE_BATCH_SIZE items. Other items
+    are passed through.
+    """
+
+    def __init__(self, stats, path:str, batch_size:int = 1000):
+        self.stats = stats
+        self.path = path
+        self.batch_size = batch_size
+        self.db = None
+        self.batch = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('SQLITE_ENABLED'):
+            raise NotConfigured
+        return cls(
+            crawler.stats,
+            path=settings.get('SQLITE_FILE', 'data/games.db'),
+            batch_size=settings.getint('SQLITE_BATCH_SIZE', 1000),
+        )
+
+    def open_spider(self, spider):
+        self.db = GameDatabase(self.path)
+
+    def process_item(self, item, spider):
+        record = game_record(item)
+        if record is None:
+            return item
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush(spider)
         return item
+
+    def checkpoint(self, spider):
+        if self.db is not None:
+            self.flush(spider)
+
+    def flush(self, spider):
+        """Writes the buffered items in a transaction."""
+        if not self.batch:
+            return
+        written = self.db.write(self.batch)
+        self.batch = []
+        self.stats.inc_value('sqlite/games', written['games'], spider=spider)
+        self.stats.inc_value('sqlite/history_rows', written['history'], spider=spider)
+        self.stats.inc_value('sqlite/batches', spider=spider)
+
+    def close_spider(self, spider):
+        if self.db is None:
+            return
+        self.flush(spider)
+        self.db.close()
+        self.db = None
+
+
+class ContentImagesPipeline(FilesPipeline):
+    """Downloads the images of the items (IMAGES_URLS_FIELD) to a content
+    addressed store under IMAGES_STORE, see games_scraper.image_store.
+
+    Every content is stored once, named by its SHA-1, however many urls serve
+    it. IMAGES_INDEX_FILE (SQLite) keeps the content of every url across runs:
+    urls fetched less than IMAGES_EXPIRES days ago are not downloaded again.
+    Hashing, decoding and the IMAGES_THUMBS thumbnails run in a pool of
+    IMAGES_THREADS threads, and so do the writes to a filesystem store; the
+    reactor thread only touches the index.
+
+    Results (IMAGES_RESULT_FIELD) are {'url', 'path', 'checksum', 'status'},
+    status is "uptodate" (not downloaded), "downloaded" (new content) or
+    "duplicate" (content already stored). Pillow is optional: without it
+    images are stored unchecked and no thumbnails are made.
+    """
+
+    DEFAULT_FILES_URLS_FIELD = 'image_urls'
+    DEFAULT_FILES_RESULT_FIELD = 'images'
+
+    def __init__(self, store_uri, download_func=None, settings=None):
+        if isinstance(settings, dict) or settings is None:
+            settings = Settings(settings)
+        super().__init__(store_uri, download_func=download_func, settings=settings)
+        self.expires = settings.getint('IMAGES_EXPIRES', self.EXPIRES)
+        self.files_urls_field = settings.get('IMAGES_URLS_FIELD', self.DEFAULT_FILES_URLS_FIELD)
+        self.files_result_field = settings.get('IMAGES_RESULT_FIELD', self.DEFAULT_FILES_RESULT_FIELD)
+        self.index_file = settings.get('IMAGES_INDEX_FILE', 'data/images.db')
+        self.thumbs = {name: tuple(size) for name, size in (settings.getdict('IMAGES_THUMBS') or {}).items()}
+        if self.thumbs and image_store.Image is None:
+            logger.warning("Pillow is not installed, IMAGES_THUMBS thumbnails are not made")
+            self.thumbs = {}
+        self.pool = ThreadPool(1, max(1, settings.getint('IMAGES_THREADS', 4)), name='images')
+        self.index = None
+        self.reactor = None
+        # checksum -> path of the contents being written, for duplicates
+        # downloaded at the same time.
+        self.writing = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        # Stores and their credentials are set up by FilesPipeline from FILES_STORE.
+        settings = Settings(settings.copy_to_dict())
+        settings.set('FILES_STORE', settings.get('IMAGES_STORE'))
+        return super().from_settings(settings)
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        from twisted.internet import reactor
+
+        self.reactor = reactor
+        self.index = ImageIndex(self.index_file)
+        self.pool.start()
+
+    def close_spider(self, spider):
+        self.pool.stop()
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def media_to_download(self, request, info, *, item=None):
+        stored = self.index.lookup(request.url)
+        if stored is None:
+            return None
+        checksum, path, fetched_at = stored
+        if time.time() - fetched_at > self.expires * 86400:
+            return None
+        self.inc_stats(info.spider, 'uptodate')
+        self.crawler.stats.inc_value('images/url_hits', spider=info.spider)
+        return {'url': request.url, 'path': path, 'checksum': checksum, 'status': 'uptodate'}
+
+    def media_downloaded(self, response, request, info, *, item=None):
+        if response.status != 200:
+            logger.warning(f"Image (code: {response.status}): error downloading {request.url}")
+            raise FileException('download-error')
+        if not response.body:
+            logger.warning(f"Image (empty-content): empty file from {request.url}")
+            raise FileException('empty-content')
+        self.inc_stats(info.spider, 'downloaded')
+
+        content_type = response.headers.get('Content-Type', b'').decode('latin-1')
+        extension = image_extension(request.url, content_type)
+        dfd = threads.deferToThreadPool(
+            self.reactor, self.pool, process_image, response.body, self.thumbs
+        )
+        dfd.addCallback(self._store, response.body, extension, request, info)
+        dfd.addErrback(self._failed, request)
+        return dfd
+
+    @defer.inlineCallbacks
+    def _store(self, image, body, extension, request, info):
+        stats = self.crawler.stats
+        checksum = image['checksum']
+        path = self.writing.get(checksum) or self.index.content(checksum)
+        if path is not None:
+            stats.inc_value('images/duplicates', spider=info.spider)
+            status = 'duplicate'
+        else:
+            path = content_path(checksum, extension)
+            self.writing[checksum] = path
+            files = {path: body}
+            for name, thumb in image['thumbs'].items():
+                files[content_path(checksum, '.jpg', f"thumbs/{name}")] = thumb
+            try:
+                yield self._persist(files, info)
+            finally:
+                del self.writing[checksum]
+            self.index.add_content(checksum, path, len(body), image['width'], image['height'])
+            stats.inc_value('images/new_contents', spider=info.spider)
+            stats.inc_value('images/stored_bytes', sum(map(len, files.values())), spider=info.spider)
+            stats.inc_value('images/thumbnails', len(image['thumbs']), spider=info.spider)
+            status = 'downloaded'
+        self.index.add_url(request.url, checksum)
+        return {'url': request.url, 'path': path, 'checksum': checksum, 'status': status}
+
+    def _persist(self, files:dict, info):
+        """Writes the files to the store, in the pool if it is a filesystem store."""
+        if isinstance(self.store, FSFilesStore):
+            def write():
+                for path, data in files.items():
+                    self.store.persist_file(path, BytesIO(data), info)
+            return threads.deferToThreadPool(self.reactor, self.pool, write)
+        return defer.DeferredList(
+            [defer.maybeDeferred(self.store.persist_file, path, BytesIO(data), info) for path, data in files.items()],
+            fireOnOneErrback=True, consumeErrors=True,
+        )
+
+    def _failed(self, failure, request):
+        if failure.check(FileException):
+            return failure
+        logger.warning(f"Image (error): error processing {request.url}: {failure.value!r}")
+        raise FileException(str(failure.value))
@@ -0,0 +1,179 @@
+import os
+import struct
+import sys
+from array import array
+
+from games_scraper.data_io import atomic_write
+from games_scraper.id_index import IdBitmap
+
+
+class SeenIds:
+    """Set of already crawled game IDs with O(1) membership.
+
+    IDs are kept in memory in a compact index (games_scraper.id_index, a bitmap
+    by default) and, when a path is given, persisted as an append-only binary
+    log of little-endian unsigned 32 bit integers (4 bytes per ID). New IDs are
+    appended to the log as they are added, so nothing has to be rewritten when
+    the spider closes and a crash only loses the IDs that were still in the
+    write buffer (none with write_through).
+
+    IDs can also be added to memory only (add(id, persist=False)) and logged
+    later with persist, once whatever depends on them is safely written.
+
+    On close the index is saved to "<path>.index" with the number of log
+    records it holds, the next open loads it and only adds the newer records.
+    """
+
+    _record = struct.Struct("<I")
+    _index_header = struct.Struct("<4s8sQ")
+
+    def __init__(self, path: str = None, ids=(), write_through: bool = False, index=None):
+        """
+        Args:
+            path (str, optional): Log file. If None the store only lives in memory.
+            ids (iterable, optional): IDs to be added on creation (i.e. migrating
+                an old state list). They are appended to the log if not present.
+            write_through (bool): Write every ID to the log as it is added
+                instead of buffering them.
+            index (optional): Empty IdBitmap or BloomFilter, IdBitmap() if None.
+        """
+        self.path = path
+        self._ids = index if index is not None else IdBitmap()
+        self._file = None
+        self._logged = 0
+        # IDs added to memory only, not logged yet.
+        self._unlogged = set()
+        # Last added ID, the last one of the log when it is loaded.
+        self.last = None
+
+        if path is not None:
+            logged = self._read_log(path)
+            for id in logged[self._load_index(len(logged)):]:
+                self._ids.add(id)
+            self._logged = len(logged)
+            if logged:
+                self.last = logged[-1]
+            folder = os.path.dirname(path)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            self._file = open(path, "ab", buffering=0 if write_through else -1)
+            # Dropping a partial record left by a crash so new ones stay aligned.
+            self._file.truncate(len(logged) * self._record.size)
+
+        for id in ids:
+            self.add(id)
+
+    @staticmethod
+    def _read_log(path: str) -> array:
+        """Reads every ID stored in a log file.
+
+        Args:
+            path (str): Log file, it may not exist.
+
+        Returns:
+            array: IDs in insertion order.
+        """
+        ids = array("I")
+        if not os.path.isfile(path):
+            return ids
+
+        with open(path, "rb") as log_file:
+            data = log_file.read()
+        # A crash while writing may leave a partial record at the end.
+        data = data[:len(data) - len(data) % SeenIds._record.size]
+        ids.frombytes(data)
+        if sys.byteorder == "big":
+            ids.byteswap()
+        return ids
+
+    @property
+    def index_path(self) -> str:
+        return f"{self.path}.index"
+
+    def _load_index(self, logged: int) -> int:
+        """Loads the saved index if it matches the log.
+
+        Args:
+            logged (int): Records in the log.
+
+        Returns:
+            int: Log records already in the index.
+        """
+        if not os.path.isfile(self.index_path):
+            return 0
+        with open(self.index_path, "rb") as index_file:
+            data = index_file.read()
+        try:
+            magic, kind, records = self._index_header.unpack_from(data)
+            if magic != b"SIDX" or kind.rstrip(b"\0").decode() != self._ids.kind or records > logged:
+                return 0
+            self._ids.load_bytes(data[self._index_header.size:])
+        except (struct.error, ValueError):
+            return 0
+        return records
+
+    def _save_index(self):
+        with atomic_write(self.index_path, "wb") as index_file:
+            index_file.write(self._index_header.pack(b"SIDX", self._ids.kind.encode(), self._logged))
+            index_file.write(self._ids.to_bytes())
+
+    def add(self, id: int, persist: bool = True) -> bool:
+        """Adds an ID to the store.
+
+        Args:
+            id (int): Game ID.
+            persist (bool): Append it to the log now. If False it is only kept in
+                memory until persist(id) is called, a crash before forgets it.
+
+        Returns:
+            bool: True if the ID was not in the store yet.
+        """
+        if not self._ids.add(id):
+            return False
+        if persist:
+            self._log(id)
+        elif self._file is not None:
+            self._unlogged.add(id)
+        return True
+
+    def persist(self, id: int):
+        """Appends an ID added with persist=False to the log."""
+        if id in self._unlogged:
+            self._unlogged.remove(id)
+            self._log(id)
+
+    def _log(self, id: int):
+        self.last = id
+        if self._file is not None:
+            self._file.write(self._record.pack(id))
+            self._logged += 1
+
+    def __contains__(self, id) -> bool:
+        return id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        """IDs in insertion order when the store is persisted, arbitrary order otherwise."""
+        if self.path is None:
+            return iter(self._ids)
+        self.flush()
+        return iter(self._read_log(self.path))
+
+    def flush(self):
+        """Writes buffered IDs to the log."""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """Flushes and closes the log and saves the index. The in-memory index is still usable."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            if not self._unlogged:
+                self._save_index()
+            elif os.path.isfile(self.index_path):
+                # The index holds IDs that are not in the log, the next open
+                # rebuilds it from the log.
+                os.remove(self.index_path)
@@ -28,6 +28,8 @@ ROBOTSTXT_OBEY = True
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
+# The delay and concurrency of every host are set by AdaptiveThrottleMiddleware, see THROTTLE_*.
+# DOWNLOAD_DELAY only applies when it is disabled (THROTTLE_ENABLED = False or AUTOTHROTTLE_ENABLED).
 DOWNLOAD_DELAY = 2.5
 # The download delay setting will honor only one of:
 #CONCURRENT_REQUESTS_PER_DOMAIN = 16
@@ -47,14 +49,16 @@ DOWNLOAD_DELAY = 2.5
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
+# Enabled in the custom settings below
 #SPIDER_MIDDLEWARES = {
-#    "games_scraper.middlewares.GamesScraperSpiderMiddleware": 543,
+#    "games_scraper.middlewares.InstrumentationMiddleware": 950,
 #}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
+# Enabled in the custom settings below
 #DOWNLOADER_MIDDLEWARES = {
-#    "games_scraper.middlewares.GamesScraperDownloaderMiddleware": 543,
+#    "games_scraper.middlewares.BrowserPoolMiddleware": 800,
 #}
 
 # Enable or disable extensions
@@ -98,15 +102,20 @@ FEED_EXPORT_ENCODING = "utf-8"
 # CUSTOM SETTINGS 
 LINKS = {
     "index": "https://store.steampowered.com/",
+    "app": "https://store.steampowered.com/app/%APP_ID%",
     "profile": "https://steamcommunity.com/profiles/%PROFILE_ID%/",
     "robots": "https://store.steampowered.com/robots.txt",
+    # Paged JSON listing of a category and the basic details (short description)
+    # of an app, used by games_reduced when engine=json. %CC% and %LANGUAGE% are
+    # those of the crawl locale (see LOCALES).
+    "category_listing": "https://store.steampowered.com/contenthub/querypaginated/category/TopSellers/render/?query=&start=%START%&count=%COUNT%&cc=%CC%&l=%LANGUAGE%&v=4&tag=&category=%CATEGORY%",
+    "app_details": "https://store.steampowered.com/api/appdetails?appids=%APP_ID%&filters=basic&cc=%CC%&l=%LANGUAGE%",
 }
 
+# Not created here: settings are loaded by every scrapy command, the pipelines
+# and logs create their folders when they write the first file.
 DATA_FOLDER = os.path.join(pathlib.Path().resolve(), "data")
 
-if not os.path.isdir(DATA_FOLDER):
-            os.mkdir(DATA_FOLDER)
-
 
 # HEADERS = {
 #     'user-agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36"
@@ -117,20 +126,115 @@ if not os.path.isdir(DATA_FOLDER):
 SELENIUM_DRIVER_NAME = 'firefox'
 SELENIUM_DRIVER_EXECUTABLE_PATH = "C:\\geckodriver\\geckodriver.exe"
 SELENIUM_BROWSER_EXECUTABLE_PATH = "C:\\Program Files\\Mozilla Firefox\\firefox.exe"
-SELENIUM_DRIVER_ARGUMENTS=[]  
-# SELENIUM_DRIVER_ARGUMENTS=['-headless']
+# Browsers run headless, leave the list empty to watch them render.
+SELENIUM_DRIVER_ARGUMENTS = ['-headless']
   
 DOWNLOADER_MIDDLEWARES = {
-     'scrapy_selenium.SeleniumMiddleware': 800
+     'games_scraper.middlewares.IncrementalMiddleware': 580,
+     'games_scraper.middlewares.PartialDownloadMiddleware': 585,
+     'games_scraper.middlewares.AdaptiveThrottleMiddleware': 610,
+     'games_scraper.middlewares.BrowserPoolMiddleware': 800
      }
 
-# JOBDIR = "crawls/test"
+SPIDER_MIDDLEWARES = {
+     'games_scraper.middlewares.SeenIdsMiddleware': 50,
+     'games_scraper.middlewares.InstrumentationMiddleware': 950,
+     }
 
-# SCHEDULER_DEBUG = True
+# Browsers kept open to render SeleniumRequests concurrently. Each one is
+# replaced after BROWSER_POOL_MAX_PAGES pages or if it crashes.
+BROWSER_POOL_SIZE = 4
+BROWSER_POOL_MAX_PAGES = 50
+BROWSER_POOL_PAGE_TIMEOUT = 30
+# Not loading images and web fonts, they are not needed to get the page source.
+BROWSER_POOL_BLOCK_MEDIA = True
 
-ITEM_PIPELINES = {
-    'games_scraper.pipelines.GamesScraperPipeline': 300,
+# Per host concurrency and delay, adapted to latency and 429/503 responses.
+# THROTTLE_HOSTS budgets override THROTTLE_DEFAULT for their host.
+THROTTLE_ENABLED = True
+THROTTLE_START_DELAY = 2.5
+THROTTLE_TARGET_LATENCY = 2.0
+THROTTLE_BACKOFF_CODES = [429, 503]
+THROTTLE_DEFAULT = {"max_concurrency": 4, "min_delay": 0.5, "max_delay": 60}
+THROTTLE_HOSTS = {
+    "store.steampowered.com": {"max_concurrency": 8, "min_delay": 0.25},
+    "steamcommunity.com": {"max_concurrency": 2, "min_delay": 1.0},
+}
+
+# Parsing pages in a pool of processes instead of the reactor thread.
+# PARSE_OFFLOAD_WORKERS = None uses one process per core.
+EXTENSIONS = {
+    'games_scraper.offload.ParseOffload': 500,
+}
+PARSE_OFFLOAD_ENABLED = False
+PARSE_OFFLOAD_WORKERS = None
+PARSE_OFFLOAD_MAX_INFLIGHT = 16
+
+# Incremental crawl of app pages: conditional requests (ETag, Last-Modified)
+# and skipping pages whose body didn't change since the last run. With
+# INCREMENTAL_EMIT_UNCHANGED games_full yields GamesFullItem(app_id, unchanged=True)
+# for those pages instead of nothing.
+INCREMENTAL_ENABLED = False
+INCREMENTAL_CACHE_FILE = "data/page_cache.db"
+INCREMENTAL_CACHE_MAX_ENTRIES = 200000
+INCREMENTAL_EMIT_UNCHANGED = True
+
+# Field groups of the app pages read by games_full (core, reviews, pricing, dlc,
+# languages, media), -a field_groups=core,dlc overrides them. Without core,
+# app pages are downloaded and parsed only up to the last group selected
+# (PARTIAL_DOWNLOADS_ENABLED).
+GAMES_FULL_FIELD_GROUPS = ["core", "reviews", "pricing", "dlc"]
+PARTIAL_DOWNLOADS_ENABLED = True
+
+# Distributed games_full crawl (-a queue=data/work_queue.db): ids are split in
+# WORK_QUEUE_SHARDS shards, leased by the workers for WORK_QUEUE_LEASE_TTL
+# seconds and renewed while they are crawled.
+WORK_QUEUE_SHARDS = 64
+WORK_QUEUE_LEASE_TTL = 300
+
+# Index of the crawled ids of both spiders (see games_scraper.id_index): "bitmap"
+# (exact, one bit per possible id) or "bloom" (SEEN_IDS_CAPACITY ids at
+# SEEN_IDS_FP_RATE false positives, for sparse ids). SeenIdsMiddleware drops
+# requests of crawled games (meta['app_id']) before they are scheduled.
+SEEN_IDS_INDEX = "bitmap"
+SEEN_IDS_CAPACITY = 5_000_000
+SEEN_IDS_FP_RATE = 0.001
+SEEN_IDS_FILTER_ENABLED = True
+
+# Histograms of queue wait, download, render and parse times and of the items
+# yielded per response (InstrumentationMiddleware), exported every
+# INSTRUMENTATION_INTERVAL seconds as JSON and Prometheus text, None disables
+# a file. %(spider)s is the spider name. Off by default, enable it for the
+# crawls to monitor (-s INSTRUMENTATION_ENABLED=True).
+INSTRUMENTATION_ENABLED = False
+INSTRUMENTATION_INTERVAL = 60
+INSTRUMENTATION_JSON_FILE = "data/metrics/%(spider)s.json"
+INSTRUMENTATION_PROMETHEUS_FILE = "data/metrics/%(spider)s.prom"
+# Sampling profiler of the callbacks, the hottest functions run inside
+# INSTRUMENTATION_PROFILE_FUNCTIONS are logged when the spider closes.
+INSTRUMENTATION_PROFILE = False
+INSTRUMENTATION_PROFILE_FUNCTIONS = ["parse", "parse_game"]
+INSTRUMENTATION_PROFILE_INTERVAL = 0.005
+INSTRUMENTATION_PROFILE_TOP = 25
+INSTRUMENTATION_PROFILE_FILE = "data/metrics/%(spider)s.profile.txt"
+
+# Persistent connections (see games_scraper.handlers): one TLS context per host,
+# TLS sessions resumed, reuse counted in the connection_pool/* stats. Hosts in
+# CONNECTION_POOL_HTTP2_HOSTS are requested over HTTP/2 if h2 is installed.
+# DNS lookups are cached by scrapy (DNSCACHE_*).
+DOWNLOAD_HANDLERS = {
+    'http': 'games_scraper.handlers.PooledDownloadHandler',
+    'https': 'games_scraper.handlers.PooledDownloadHandler',
 }
+CONNECTION_POOL_MAX_PER_HOST = None
+CONNECTION_POOL_IDLE_TIMEOUT = 240
+CONNECTION_POOL_HTTP2_HOSTS = []
+DNSCACHE_ENABLED = True
+DNSCACHE_SIZE = 10000
+
+# JOBDIR = "crawls/test"
+
+# SCHEDULER_DEBUG = True
 
 # LOGGING
 LOG_FILE = "scrapy.log" # output file
@@ -143,6 +247,55 @@ USER_AGENT="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 F
 # As we are using some language-dependant data acquisition methods, spanish language is required.
 DEFAULT_REQUEST_HEADERS = {'Accept-Language': 'es-ES,es;q=0.8,en-US;q=0.5,en;q=0.3'}
 
-ITEM_PIPELINES = {'scrapy.pipelines.images.ImagesPipeline': 1}
+# Store regions of the games_full multi-locale mode (-a locales=es,us,gb) and
+# of the games_reduced JSON listings (-a locale=es, the default). cc (region)
+# and language are sent as the cc and l parameters of the app pages and
+# listings, language also as the Steam_Language cookie. Locales with the
+# currency of a previous one share its page. dlc_label is the breadcrumb of
+# DLC pages in the language of the locale.
+LOCALES = {
+    "es": {"cc": "ES", "language": "spanish", "currency": "EUR",
+           "accept_language": "es-ES,es;q=0.8,en-US;q=0.5,en;q=0.3", "dlc_label": "Contenido descargable"},
+    "de": {"cc": "DE", "language": "german", "currency": "EUR",
+           "accept_language": "de-DE,de;q=0.8,en-US;q=0.5,en;q=0.3", "dlc_label": "Zusatzinhalte"},
+    "us": {"cc": "US", "language": "english", "currency": "USD",
+           "accept_language": "en-US,en;q=0.8", "dlc_label": "Downloadable Content"},
+    "gb": {"cc": "GB", "language": "english", "currency": "GBP",
+           "accept_language": "en-GB,en;q=0.8", "dlc_label": "Downloadable Content"},
+}
+
+ITEM_PIPELINES = {
+    'games_scraper.pipelines.ContentImagesPipeline': 1,
+    'games_scraper.pipelines.SQLitePipeline': 700,
+    'games_scraper.pipelines.ParquetPipeline': 800,
+}
+# Images of the items (download_images=True) are stored once per content in
+# IMAGES_STORE/full/ab/cd/<sha1>.<ext>, thumbnails in thumbs/<name>/ (require
+# Pillow). IMAGES_INDEX_FILE maps the urls to their content across runs, urls
+# fetched less than IMAGES_EXPIRES days ago are not downloaded again.
 IMAGES_STORE = 'images/'
 IMAGES_URLS_FIELD = 'image_urls'
+IMAGES_RESULT_FIELD = 'images'
+IMAGES_INDEX_FILE = "data/images.db"
+IMAGES_EXPIRES = 90
+IMAGES_THUMBS = {"small": (116, 44)}
+IMAGES_THREADS = 4
+
+# Items of games_reduced and games_full are exported to PARQUET_DIR/<spider>/
+# in row groups of PARQUET_ROW_GROUP_SIZE items (requires pyarrow). Files are
+# readable once closed, a new one is started every PARQUET_MAX_FILE_SIZE bytes
+# or PARQUET_MAX_FILE_SECONDS seconds. Off by default (-s PARQUET_ENABLED=True).
+PARQUET_ENABLED = False
+PARQUET_DIR = "data/parquet"
+PARQUET_ROW_GROUP_SIZE = 10000
+PARQUET_MAX_FILE_SIZE = 256 * 2 ** 20
+PARQUET_MAX_FILE_SECONDS = 600
+PARQUET_COMPRESSION = "zstd"
+
+# Games of games_reduced and games_full are upserted into SQLITE_FILE, with a
+# price_history row for every change of their prices or review counts
+# (see games_scraper.game_db). Items are written in transactions of
+# SQLITE_BATCH_SIZE items. Off by default (-s SQLITE_ENABLED=True).
+SQLITE_ENABLED = False
+SQLITE_FILE = "data/games.db"
+SQLITE_BATCH_SIZE = 1000
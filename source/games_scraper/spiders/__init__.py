@@ -2,5 +2,3 @@
 #
 # Please refer to the documentation for information on how to create and manage
 # your spiders.
-from .categories import Categories
-from .games_reduced import GamesReduced
\ No newline at end of file
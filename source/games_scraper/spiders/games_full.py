@@ -1,7 +1,236 @@
 import scrapy
-from bs4 import BeautifulSoup
-import pandas as pd
 import os
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from scrapy.utils.job import job_dir
+from twisted.internet import task
+from w3lib.url import add_or_replace_parameters
+
+from games_scraper.data_io import checkpoint_outputs
+from games_scraper.extractors import (Field, FieldTable, attr, exists, parse_html, parse_int, parse_percent,
+                                     parse_price, stripped, text, truncate_at)
+from games_scraper.id_index import id_index_from_settings
+from games_scraper.id_log import IdLogReader
+from games_scraper.items import GamesFullItem
+from games_scraper.offload import offload
+from games_scraper.seen_ids import SeenIds
+from games_scraper.work_queue import default_worker_name, open_work_queue
+
+
+def get_game_content(el) -> list:
+    """Name and price of every DLC in the .gameDlcBlocks element"""
+    return [
+        {
+            "name": content_el.findall("div")[0].text_content().strip(),
+            "price": content_el.findall("div")[1].text_content().strip()
+        }
+        for content_el in el.findall("a")
+    ]
+
+
+def get_langs(els) -> list:
+    """Supported languages from the rows of the languages table"""
+    res = []
+    for el in els:
+        chl = el.findall("td")
+        if len(chl) < 4:
+            continue
+        res.append({
+            'name': chl[0].text_content().strip(),
+            'interface' : True if chl[1].findall("span") else False,
+            'voices': True if chl[2].findall("span") else False,
+            'subtitles': True if chl[3].findall("span") else False,
+        })
+    return res
+
+
+def get_web(el) -> str:
+    res = None
+    try: 
+        res = el.attrib['href'].split("url=")[1]
+    except:
+        pass
+    
+    return res
+
+
+# Breadcrumb of DLC pages in the language of DEFAULT_REQUEST_HEADERS, other
+# languages set theirs in LOCALES.
+DLC_LABEL = "Contenido descargable"
+
+# Groups of fields of the app pages, selected per run (-a field_groups=core,dlc
+# or GAMES_FULL_FIELD_GROUPS), in the order their elements have in the page.
+# 'end' are pieces of the page that come after every element of the group:
+# when the selected groups don't need what follows, pages are only downloaded
+# and parsed up to the first of them. core is spread over the whole page.
+FIELD_GROUPS = {
+    'media': {
+        'fields': ('content_video', 'content_image'),
+        'end': ('class="game_header_image_ctn"',),
+    },
+    'reviews': {
+        'fields': ('recent_reviews', 'recent_reviews_count', 'all_reviews', 'all_reviews_count', 'reviews_anomally'),
+        'end': ('class="release_date"',),
+    },
+    'pricing': {
+        'fields': ('discount_original_price', 'discount_final_price', 'discount', 'price'),
+        'end': ('class="game_area_dlc_section', 'id="game_area_description"'),
+    },
+    'dlc': {
+        'fields': ('game_content',),
+        'end': ('id="game_area_description"',),
+    },
+    'languages': {
+        'fields': ('languages',),
+        'end': ('id="genresAndManufacturer"', 'class="details_block"'),
+    },
+    'core': {
+        'fields': ('is_dlc', 'img_src', 'short_description', 'release_date', 'developer', 'developer_url',
+                   'publisher', 'publisher_url', 'tags', 'name', 'genre', 'website', 'metacritic_score',
+                   'metacritic_url'),
+        'end': None,
+    },
+}
+# What the spider read before the groups, languages and media are left out.
+DEFAULT_FIELD_GROUPS = ('core', 'reviews', 'pricing', 'dlc')
+
+
+def app_page_fields(dlc_label:str = DLC_LABEL, groups = DEFAULT_FIELD_GROUPS) -> FieldTable:
+    """Fields of the given groups of an app page in a store language. Only
+    is_dlc depends on it: it looks for the DLC category of that language in
+    the breadcrumbs."""
+    names = {name for group in groups for name in FIELD_GROUPS[group]['fields']}
+    return FieldTable([field for field in [
+        Field('is_dlc', ".blockbg", required=True, value=lambda el: dlc_label in text(el)),
+        Field('img_src', ".game_header_image_full", attr("src"), required=True),
+        Field('short_description', ".game_description_snippet", stripped),
+        Field('recent_reviews', "#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(1)", stripped),
+        Field('recent_reviews_count', "#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(2)", stripped),
+        Field('all_reviews', "#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(1)", stripped),
+        Field('all_reviews_count', "#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(2)", stripped),
+        Field('reviews_anomally', "span.review_anomaly_icon:nth-child(3)", exists, default=False),
+        Field('release_date', ".date"),
+        Field('developer', "#developers_list > a:nth-child(1)"),
+        Field('developer_url', "#developers_list > a:nth-child(1)", attr("href")),
+        Field('publisher', "div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)"),
+        Field('publisher_url', "div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)", attr("href")),
+        Field('tags', "a.app_tag", lambda els: [stripped(tag) for tag in els], many=True),
+        Field('content_video', "#highlight_player_area video", lambda els: [el.attrib["src"] for el in els], many=True),
+        Field('content_image', "#highlight_player_area img", lambda els: [el.attrib["src"] for el in els[1:]], many=True),
+        Field('discount_original_price', "div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(1)"),
+        Field('discount_final_price', "div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(2)"),
+        Field('discount', "div.discount_block:nth-child(1) > div:nth-child(1)"),
+        Field('price', "div.game_purchase_action_bg:nth-child(1) > div:nth-child(1)", stripped),
+        Field('game_content', ".gameDlcBlocks", get_game_content),
+        Field('languages', ".game_language_options > tbody:nth-child(1) > tr", get_langs, many=True),
+        Field('name', "#appHubAppName", required=True),
+        Field('genre', "#genresAndManufacturer > span:nth-child(4) > a:nth-child(1)", required=True),
+        Field('website', "a.linkbar:nth-child(1)", get_web),
+        Field('metacritic_score', ".score", stripped),
+        Field('metacritic_url', "#game_area_metalink > a:nth-child(1)", attr("href")),
+    ] if field.name in names])
+
+
+def parse_field_groups(names) -> tuple:
+    """Field groups from a comma separated string or a list, in page order.
+
+    Raises:
+        ValueError: If a group doesn't exist.
+    """
+    if isinstance(names, str):
+        names = names.split(",")
+    names = {name.strip() for name in names if name.strip()}
+    unknown = names - set(FIELD_GROUPS)
+    if unknown:
+        raise ValueError(f"Unknown field groups {sorted(unknown)}, use some of {list(FIELD_GROUPS)}")
+    if not names:
+        raise ValueError(f"No field groups selected, use some of {list(FIELD_GROUPS)}")
+    return tuple(group for group in FIELD_GROUPS if group in names)
+
+
+def stop_markers(groups) -> tuple:
+    """Pieces of the page after which none of the groups has fields, None if
+    the whole page is needed."""
+    ends = [FIELD_GROUPS[group]['end'] for group in FIELD_GROUPS if group in groups]
+    if not ends or None in ends:
+        return None
+    # Groups are in page order, the last one ends the latest.
+    return ends[-1]
+
+
+# Fields of an app page. Compiled once, each selector is evaluated once per page.
+APP_PAGE_FIELDS = app_page_fields()
+# (dlc_label, groups) -> FieldTable, compiled once per process (ParseOffload workers too).
+_PAGE_FIELDS = {(DLC_LABEL, DEFAULT_FIELD_GROUPS): APP_PAGE_FIELDS}
+# The fields read from the pages of the other regions of a multi-locale crawl.
+PRICE_FIELDS = app_page_fields(groups=('pricing',))
+PRICE_STOP_AT = stop_markers(('pricing',))
+
+
+def page_fields(dlc_label:str, groups:tuple) -> FieldTable:
+    """app_page_fields of a language and groups, compiled on first use."""
+    key = (dlc_label, groups)
+    if key not in _PAGE_FIELDS:
+        _PAGE_FIELDS[key] = app_page_fields(dlc_label, groups)
+    return _PAGE_FIELDS[key]
+
+
+def parse_prices(fields:dict) -> dict:
+    """Parses the price fields read by APP_PAGE_FIELDS or PRICE_FIELDS, in place."""
+    fields['discount'] = parse_percent(fields['discount'])
+    # The price element of discounted games holds the whole discount block.
+    if fields['discount'] is not None:
+        fields['price'] = fields['discount_original_price']
+    for name in ('price', 'discount_original_price', 'discount_final_price'):
+        fields[name] = parse_price(fields[name])
+    return fields
+
+
+def regional_price(fields) -> dict:
+    """Entry of GamesFullItem.regional_prices, without locale and currency, from
+    the parsed price fields (a dict or an ItemAdapter)."""
+    final_price = fields.get('discount_final_price')
+    return {
+        'price': fields.get('price'),
+        'discount': fields.get('discount'),
+        'final_price': final_price if final_price is not None else fields.get('price'),
+    }
+
+
+def app_page_item(fields:dict) -> GamesFullItem:
+    """Item from the fields read by app_page_fields, with the numbers parsed.
+    Fields of the groups not read keep their defaults."""
+    for name in ('recent_reviews_count', 'all_reviews_count', 'metacritic_score'):
+        if name in fields:
+            fields[name] = parse_int(fields[name])
+    if 'price' in fields:
+        parse_prices(fields)
+    for name in ('tags', 'content_video', 'content_image', 'languages'):
+        if name in fields:
+            fields[name] = fields[name] or []
+    if 'game_content' in fields:
+        fields['game_content'] = [
+            {'name': content['name'], 'price': parse_price(content['price'])}
+            for content in fields['game_content'] or []
+        ]
+    return GamesFullItem(**fields)
+
+
+def extract_app_page(body:str, dlc_label:str = DLC_LABEL, groups:tuple = DEFAULT_FIELD_GROUPS) -> GamesFullItem:
+    """Item of an app page with the fields of the given groups, only the part
+    of the page they are in is parsed. Module level so it can run in a
+    ParseOffload process."""
+    item = app_page_item(page_fields(dlc_label, groups).extract(parse_html(truncate_at(body, stop_markers(groups)))))
+    item.field_groups = list(groups)
+    return item
+
+
+def extract_prices(body:str) -> dict:
+    """regional_price of an app page, in the currency of the page."""
+    body = truncate_at(body, PRICE_STOP_AT)
+    return regional_price(parse_prices(PRICE_FIELDS.extract(parse_html(body))))
+
 
 class GamesFull(scrapy.Spider):
     name="games_full"
@@ -11,127 +240,391 @@ class GamesFull(scrapy.Spider):
         'lastagecheckage': "1-0-1995"
         }
     state = {}
+    seen_file = None
+    # If True, keep reading new ids from input_file until the games_reduced
+    # spider writing it closes.
+    follow = False
+    # Distributed mode: ids are leased by shards from this work queue (see
+    # games_scraper.work_queue) instead of read from input_file. input_file, if
+    # given, is added to the queue. worker names this process in the leases.
+    queue = None
+    worker = None
+    lease = None
+    # If True, img_src is downloaded by the ContentImagesPipeline.
+    download_images = False
+    # Multi-locale mode: comma separated LOCALES names (-a locales=es,us,gb),
+    # see setup_locales. The first one gives the fields of the items.
+    locales = None
+    # Comma separated FIELD_GROUPS read from the app pages (-a field_groups=core,dlc),
+    # GAMES_FULL_FIELD_GROUPS if not given. See setup_field_groups.
+    field_groups = None
+    # Crawled ids are stored every checkpoint_seconds seconds, once the feeds
+    # and pipelines have written their items (see checkpoint).
+    checkpoint_seconds = 30
 
     def __init__(self, *args, **kwargs):
         super(GamesFull, self).__init__(*args, **kwargs)
-        if not hasattr(self, 'input_file'):
+        if hasattr(self, 'input_file'):
+            self.ids_reader = IdLogReader(self.input_file)
+        elif self.queue is None:
             self.logger.warning("No input file given, unable to crawl games IDs")
+        self.follow = str(self.follow) == "True"
+        self.download_images = str(self.download_images) == "True"
+        self.checkpoint_seconds = float(self.checkpoint_seconds)
+        # Ids of the items scraped since the last checkpoint.
+        self.scraped = []
+        # Every app page is requested with the same cookies, the header is built
+        # once and CookiesMiddleware is skipped (dont_merge_cookies).
+        self.cookie_header = "; ".join(f"{name}={value}" for name, value in self.cookie.items())
 
     def start_requests(self):
         """ Scrapy method to set urls to be crawled. Setting them from game ids directly.
         We are getting game ids from self.input_file"""
 
-        ids = [id for id in self.get_input_file_ids() if id not in self.state.get("crawled_ids", [])]
+        # Old JOBDIR states kept crawled ids in state["crawled_ids"], those are moved to the store.
+        self.seen = SeenIds(self.get_seen_file(), ids=self.state.pop("crawled_ids", []),
+                            index=id_index_from_settings(self.settings))
+        self.checkpointer = task.LoopingCall(self.checkpoint)
+        self.checkpointer.start(self.checkpoint_seconds, now=False)
+        if self.queue is None:
+            yield from self.new_requests()
+            return
+
+        self.work_queue = open_work_queue(self.queue, self.settings.getint('WORK_QUEUE_SHARDS', 64))
+        self.worker = self.worker or default_worker_name()
+        self.lease_ttl = self.settings.getfloat('WORK_QUEUE_LEASE_TTL', 300)
+        if hasattr(self, 'ids_reader'):
+            added = self.work_queue.add(self.get_input_file_ids())
+            self.logger.info(f"{added} new ids added to the work queue {self.queue}")
+        self.renewer = task.LoopingCall(self.renew_lease)
+        self.renewer.start(self.lease_ttl / 3, now=False)
+        yield from self.shard_requests()
+
+    def new_requests(self):
+        """Requests for the ids added to self.input_file since the last call
+        that haven't been crawled yet."""
+        return self.requests_for(self.get_input_file_ids())
+
+    def setup_locales(self):
+        """Multi-locale mode. Every app is requested in each of the given LOCALES
+        at once, their pages set the cc (region) and l (language) parameters and
+        send the Cookie and Accept-Language headers of their locale. The page
+        of the first locale is parsed as usual with the extraction table of its
+        language, the prices of the others are added to its item as
+        regional_prices, the item is yielded when every page of the app is in.
+
+        Prices only depend on the currency: locales with the currency of a
+        previous one don't request their page, they get its prices. With
+        INCREMENTAL_ENABLED the pages of the other regions are requested once
+        the first one is in, and not at all if it is unchanged (IncrementalMiddleware
+        keeps one page per app).
+        """
+        self.merging = None
+        self.dlc_label = DLC_LABEL
+        if not self.locales:
+            return
+        configured = self.settings.getdict('LOCALES')
+        self.locales = [name.strip() for name in str(self.locales).split(",") if name.strip()]
+        unknown = [name for name in self.locales if name not in configured]
+        if unknown:
+            raise ValueError(f"Unknown locales {unknown}, use some of {list(configured)}")
+        self.locale_settings = {name: configured[name] for name in self.locales}
+        self.dlc_label = self.locale_settings[self.locales[0]]['dlc_label']
+        # currency -> locale whose page gives its prices, the first one with it.
+        self.price_locales = {}
+        for name in self.locales:
+            self.price_locales.setdefault(self.locale_settings[name]['currency'], name)
+        # Each locale has its own cookies, built once as the default ones.
+        self.locale_headers = {
+            name: {
+                'Cookie': f"{self.cookie_header}; Steam_Language={locale['language']}",
+                'Accept-Language': locale['accept_language'],
+            }
+            for name, locale in self.locale_settings.items()
+        }
+        # app_id -> {'item', 'prices': {locale: regional_price}, 'waiting': pages}
+        self.merging = {}
+        self.regions_after_main = self.settings.getbool('INCREMENTAL_ENABLED')
+        self.logger.info(f"Crawling locales {self.locales}, {len(self.price_locales)} pages per app")
+
+    def setup_field_groups(self):
+        """Field groups of the items, in page order. The multi-locale mode needs
+        pricing, it is added if missing. When the groups end before the page
+        does (no core), app pages are requested with meta['stop_at'] and only
+        downloaded up to there (PartialDownloadMiddleware).
+        """
+        groups = parse_field_groups(self.field_groups or self.settings.getlist('GAMES_FULL_FIELD_GROUPS')
+                                    or DEFAULT_FIELD_GROUPS)
+        if self.merging is not None and 'pricing' not in groups:
+            groups = parse_field_groups(groups + ('pricing',))
+        self.field_groups = groups
+        self.stop_at = stop_markers(groups)
+        self.logger.info(f"Reading field groups {list(groups)}"
+                         + (f", app pages read up to {self.stop_at}" if self.stop_at else ""))
+
+    def requests_for(self, ids):
+        """Requests for the given ids that haven't been crawled yet. Ids are
+        marked as crawled once their item is written (see checkpoint), so the ids
+        of failed requests and items are requested again in the next run."""
         for id in ids:
-            self.state["crawled_ids"] = self.state.get("crawled_ids", []) + [id]
+            if id in self.seen:
+                continue
+            if self.merging is not None:
+                yield from self.locale_requests(id)
+                continue
             url = self.get_url(id)
-            yield scrapy.Request(url=url, callback=self.parse, cookies=self.cookie)
+            yield scrapy.Request(url=url, callback=self.parse, headers={'Cookie': self.cookie_header},
+                                 meta={'app_id': id, 'stop_at': self.stop_at, 'dont_merge_cookies': True})
 
-    def parse(self, response):
-        """Scrapy default parse method. Just using css selectors to get the game info from response"""
-        soup = BeautifulSoup(response.text, features="lxml")
-        
-        def get_game_content(el):
-            content = el.findChildren("a", recursive=False)
-            return [
-                {
-                    "name": content_el.findChildren("div", recursive=False)[0].text.strip(),
-                    "price": content_el.findChildren("div", recursive=False)[1].text.strip()
-                }
-                for content_el in content
-            ]
-
-        def get_langs():
-            els = soup.select(".game_language_options > tbody:nth-child(1) > tr")
-            res = []
-            for el in els:
-                chl = el.findChildren("td", recursive=False)
-                if len(chl) < 4:
-                    continue
-                res.append({
-                    'name': chl[0].text.strip(),
-                    'interface' : True if chl[1].findChildren("span", recursive=False) else False,
-                    'voices': True if chl[2].findChildren("span", recursive=False) else False,
-                    'subtitles': True if chl[3].findChildren("span", recursive=False) else False,
-                })
-            return res
-        
-        def get_web():
-            res = None
-            try: 
-                res =  soup.select_one("a.linkbar:nth-child(1)").attrs['href'].split("url=")[1]
-            except:
-                pass
-            
-            return res
-
-        item = {
-            'is_dlc': True if "Contenido descargable" in soup.select_one(".blockbg").text else False, # Warning: language spanish required.
-            'img_src': soup.select_one(".game_header_image_full").attrs["src"],
-            'short_description': soup.select_one(".game_description_snippet").text.strip()
-                if soup.select_one(".game_description_snippet") else None,
-            'recent_reviews': soup.select_one("#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(1)").text.strip()
-                if soup.select_one("#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(1)") else None,
-            'recent_reviews_count': soup.select_one("#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(2)").text.strip()
-                if soup.select_one("#userReviews > div:nth-child(1) > div:nth-child(2) > span:nth-child(2)") else None,
-            'all_reviews': soup.select_one("#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(1)").text.strip()
-                if soup.select_one("#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(1)") else None,
-            'all_reviews_count': soup.select_one("#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(2)").text.strip()
-                if soup.select_one("#userReviews > div:nth-child(2) > div:nth-child(2) > span:nth-child(2)") else None,
-            'reviews_anomally': True if soup.select_one("span.review_anomaly_icon:nth-child(3)") else False,
-            'release_date': soup.select_one(".date").text
-                if soup.select_one(".date") else None,
-            'developer': soup.select_one("#developers_list > a:nth-child(1)").text
-                if soup.select_one("#developers_list > a:nth-child(1)") else None,
-            'developer_url': soup.select_one("#developers_list > a:nth-child(1)").attrs['href']
-                if soup.select_one("#developers_list > a:nth-child(1)") else None,
-            'publisher': soup.select_one("div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)").text
-                if soup.select_one("div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)") else None,
-            'publisher_url': soup.select_one("div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)").attrs["href"]
-                if soup.select_one("div.dev_row:nth-child(4) > div:nth-child(2) > a:nth-child(1)") else None,
-            'tags': [tag.text.strip() for tag in soup.select("a.app_tag")]
-                if soup.select("a.app_tag") else None,
-            # 'content_video': [el.attrs["src"] for el in soup.select_one("#highlight_player_area").findChildren("video", recursive=True)],
-            # 'content_image': [el.attrs["src"] for el in soup.select_one("#highlight_player_area").findChildren("img", recursive=True)[1:]],
-            'discount_original_price': soup.select_one("div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(1)").text
-                if soup.select_one("div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(1)") else None,   
-            'discount_final_price': soup.select_one("div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(2)").text
-                if soup.select_one("div.discount_block:nth-child(1) > div:nth-child(2) > div:nth-child(2)") else None,
-            'discount': soup.select_one("div.discount_block:nth-child(1) > div:nth-child(1)").text
-                if soup.select_one("div.discount_block:nth-child(1) > div:nth-child(1)") else None,
-            'price': soup.select_one("div.game_purchase_action_bg:nth-child(1) > div:nth-child(1)").text.strip()
-                if soup.select_one("div.game_purchase_action_bg:nth-child(1) > div:nth-child(1)") else None,
-            'game_content': get_game_content(soup.select_one(".gameDlcBlocks"))
-                if soup.select_one(".gameDlcBlocks") else None,
-            # 'lang': get_langs(),
-            'name': soup.select_one("#appHubAppName").text,
-            'genre': soup.select_one("#genresAndManufacturer > span:nth-child(4) > a:nth-child(1)").text,
-            'website': get_web(),
-            'metacritic_score': soup.select_one(".score").text.strip()
-                if soup.select_one(".score") else None,
-            'metacritic_url': soup.select_one("#game_area_metalink > a:nth-child(1)").attrs['href']
-                if soup.select_one("#game_area_metalink > a:nth-child(1)") else None,
-        }
-        
-        yield item
+    def locale_requests(self, id):
+        """Requests of an app in the multi-locale mode: the page of the first
+        locale and the one of every other currency (see region_requests)."""
+        if id in self.merging:
+            return
+        main = self.locales[0]
+        self.merging[id] = {'item': None, 'prices': {}, 'waiting': 1}
+        yield scrapy.Request(url=self.get_url(id, main), callback=self.parse, errback=self.page_failed,
+                             headers=self.locale_headers[main],
+                             meta={'app_id': id, 'locale': main, 'stop_at': self.stop_at,
+                                   'dont_merge_cookies': True})
+        if not self.regions_after_main:
+            yield from self.region_requests(id)
 
-    
-    def get_input_file_ids(self) -> list[int]:
-        """Get the list of game IDs written in self.input_file.
+    def region_requests(self, id):
+        """Requests of the pages of the other currencies of an app, multi-locale mode."""
+        main, *others = self.price_locales.values()
+        self.merging[id]['waiting'] += len(others)
+        for locale in others:
+            self.crawler.stats.inc_value('locales/region_requests', spider=self)
+            # Not 'app_id', IncrementalMiddleware and SeenIdsMiddleware are for the main page.
+            yield scrapy.Request(url=self.get_url(id, locale), callback=self.parse_region,
+                                 errback=self.region_failed, headers=self.locale_headers[locale],
+                                 meta={'region_of': id, 'locale': locale, 'stop_at': PRICE_STOP_AT,
+                                       'dont_merge_cookies': True})
+        shared = len(self.locales) - len(self.price_locales)
+        if shared:
+            self.crawler.stats.inc_value('locales/shared_pages', shared, spider=self)
+
+    def merge(self, app_id:int, locale:str, prices:dict, item:GamesFullItem = None):
+        """Adds a page of an app to its record: the prices read in a locale (None
+        if its page failed) and, for the main page, its item (None if it failed
+        or is not yielded).
 
         Returns:
-            list[int]: Contains all game ids.
+            GamesFullItem: The item with its regional_prices once every page of
+                the app is in, None before (or if there is no item).
+        """
+        entry = self.merging[app_id]
+        entry['waiting'] -= 1
+        entry['prices'][locale] = prices
+        if locale == self.locales[0]:
+            entry['item'] = item
+        if entry['waiting']:
+            return None
+        del self.merging[app_id]
+        item = entry['item']
+        if item is None:
+            return None
+        for name in self.locales:
+            currency = self.locale_settings[name]['currency']
+            prices = entry['prices'].get(self.price_locales[currency])
+            if prices is not None:
+                item.regional_prices.append(dict(locale=name, currency=currency, **prices))
+        return item
+
+    def shard_requests(self):
+        """Leases the next pending shard of the work queue and returns the requests
+        of its ids. Shards without ids left to crawl are acknowledged at once."""
+        while True:
+            self.lease = self.work_queue.lease(self.worker, self.lease_ttl)
+            if self.lease is None:
+                return []
+            self.crawler.stats.inc_value('work_queue/leased_shards', spider=self)
+            requests = list(self.requests_for(self.work_queue.ids(self.lease.shard)))
+            self.logger.info(f"Leased shard {self.lease.shard}, {len(requests)} ids to crawl")
+            if requests:
+                return requests
+            self.ack_lease()
+
+    def ack_lease(self):
+        self.work_queue.ack(self.lease)
+        self.crawler.stats.inc_value('work_queue/acked_shards', spider=self)
+        self.lease = None
+
+    def renew_lease(self):
+        """Called every WORK_QUEUE_LEASE_TTL / 3 seconds."""
+        if self.lease is not None and not self.work_queue.renew(self.lease, self.lease_ttl):
+            self.logger.warning(f"Lease of shard {self.lease.shard} expired, another worker may crawl it")
+            self.crawler.stats.inc_value('work_queue/lost_leases', spider=self)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        """With this method we connect spider_closed and spider_idle signals to
+        self.spider_closed and self.spider_idle methods"""
+        spider = super(GamesFull, cls).from_crawler(crawler, *args, **kwargs)
+        spider.setup_locales()
+        spider.setup_field_groups()
+        crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(spider.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(spider.item_scraped, signal=signals.item_dropped)
+        return spider
+
+    def item_scraped(self, item, spider):
+        """item_scraped (and item_dropped) handler. The id is crawled for this run
+        and stored on the next checkpoint. Items failing in a pipeline keep their
+        ids out, they are crawled again next run."""
+        app_id = ItemAdapter(item).get('app_id')
+        if app_id is not None and self.seen.add(app_id, persist=False):
+            self.scraped.append(app_id)
+
+    def checkpoint(self, pipelines:bool = True):
+        """Writes the items scraped so far (see games_scraper.data_io.checkpoint_outputs),
+        then stores their ids.
+
+        Args:
+            pipelines (bool): Checkpoint the pipelines too, False once they are closed.
+        """
+        if not self.scraped:
+            return
+        checkpoint_outputs(self.crawler, self, pipelines)
+        for app_id in self.scraped:
+            self.seen.persist(app_id)
+        self.seen.flush()
+        self.scraped = []
+
+    def spider_idle(self, spider):
+        """In distributed mode, acknowledges the crawled shard and leases the next
+        one. When following the input file, schedules the ids written since the last
+        read and keeps the spider open until the file is done."""
+        if self.queue is not None:
+            return self.next_shard()
+        if not self.follow or not hasattr(self, 'ids_reader'):
+            return
+
+        # Checking done before reading, ids written before closing are read now.
+        done = self.ids_reader.done
+        scheduled = 0
+        for request in self.new_requests():
+            self.crawler.engine.crawl(request)
+            scheduled += 1
+        if scheduled:
+            self.logger.info(f"{scheduled} new ids read from {self.input_file}")
+        if scheduled or not done:
+            raise DontCloseSpider
+
+    def next_shard(self):
+        """Every request of the leased shard is done: acknowledges it and schedules
+        the next one. While other workers hold leases the spider stays open, their
+        shards are reclaimed if they die."""
+        if self.lease is not None:
+            # The ids of the shard are stored before it is done.
+            self.checkpoint()
+            self.ack_lease()
+        requests = self.shard_requests()
+        for request in requests:
+            self.crawler.engine.crawl(request)
+        if requests or self.work_queue.status()['leased']:
+            raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        """Flushing crawled ids when spider_closed signal arrives. A shard still
+        leased (the crawl was stopped) is given back to the work queue."""
+        if hasattr(self, 'seen'):
+            if self.checkpointer.running:
+                self.checkpointer.stop()
+            self.checkpoint(pipelines=False)
+            self.seen.close()
+        if hasattr(self, 'work_queue'):
+            if self.renewer.running:
+                self.renewer.stop()
+            if self.lease is not None:
+                self.work_queue.release(self.lease)
+            self.work_queue.close()
+
+    async def parse(self, response):
+        """Scrapy default parse method. Just using css selectors (app_page_fields of the field groups) to get the game info from response.
+        Pages marked as unchanged by IncrementalMiddleware are not parsed. Ids are
+        marked as crawled once their item is scraped (see item_scraped)."""
+        app_id = response.meta.get('app_id')
+        if response.meta.get('page_unchanged'):
+            item = None
+            if self.settings.getbool('INCREMENTAL_EMIT_UNCHANGED'):
+                item = GamesFullItem(app_id=app_id, unchanged=True)
+            elif app_id is not None:
+                # Nothing to write, the page is already stored.
+                self.seen.add(app_id)
+        else:
+            item = await offload(self, extract_app_page, response.text, self.dlc_label, self.field_groups)
+            item.app_id = app_id
+            if self.download_images and item.img_src:
+                item.image_urls = [item.img_src]
+        if self.merging is not None:
+            if self.regions_after_main and response.meta.get('page_unchanged'):
+                # Prices are only read again from changed pages.
+                self.crawler.stats.inc_value('locales/skipped_region_pages', len(self.price_locales) - 1,
+                                             spider=self)
+            elif self.regions_after_main:
+                for request in self.region_requests(app_id):
+                    yield request
+            prices = regional_price(ItemAdapter(item)) if item is not None and not item.unchanged else None
+            item = self.merge(app_id, response.meta['locale'], prices, item)
+        if item is not None:
+            yield item
+
+    async def parse_region(self, response):
+        """Prices of an app page in another region, multi-locale mode."""
+        prices = await offload(self, extract_prices, response.text)
+        item = self.merge(response.meta['region_of'], response.meta['locale'], prices)
+        if item is not None:
+            yield item
+
+    def page_failed(self, failure):
+        """Errback of the main page in multi-locale mode, its app is dropped
+        (and requested again in the next run)."""
+        self.merge(failure.request.meta['app_id'], failure.request.meta['locale'], None)
+
+    def region_failed(self, failure):
+        """Errback of the pages of the other regions, their locales are left out
+        of regional_prices."""
+        request = failure.request
+        self.logger.warning(f"Prices of {request.meta['locale']} not read for app {request.meta['region_of']}: "
+                            f"{failure.value!r}")
+        self.crawler.stats.inc_value('locales/failed_pages', spider=self)
+        item = self.merge(request.meta['region_of'], request.meta['locale'], None)
+        if item is not None:
+            yield item
+
+    def get_input_file_ids(self):
+        """Get the game IDs written in self.input_file since the last call. The file
+        is read line by line (see games_scraper.id_log).
+
+        Returns:
+            Iterator[int]: New game ids.
         """
         if not hasattr(self, 'input_file'):
             self.logger.warning("No input file given, unable to crawl games IDs")
-            return []
+            return iter([])
         
-        with open(self.input_file, 'r') as input_file:
-            self.logger.info(f"Getting IDs from {self.input_file}")
-            
-            return eval(input_file.read())
-
-    @staticmethod
-    def get_url(game_id:int) -> str:
-        return f"https://store.steampowered.com/app/{game_id}"
+        self.logger.info(f"Getting IDs from {self.input_file}")
+        return self.ids_reader.read_new()
+
+    def get_seen_file(self) -> str:
+        """Path of the crawled ids store. If no seen_file argument is given ids are
+        persisted in JOBDIR (if any), so they are only kept between runs of the same job.
+
+        Returns:
+            str: Path to the store or None to keep crawled ids in memory.
+        """
+        if self.seen_file:
+            return self.seen_file
+        jobdir = job_dir(self.settings)
+        return os.path.join(jobdir, "crawled_ids.bin") if jobdir else None
+
+    def get_url(self, game_id:int, locale:str = None) -> str:
+        url = self.settings["LINKS"]["app"].replace("%APP_ID%", str(game_id))
+        if locale is None:
+            return url
+        settings = self.locale_settings[locale]
+        return add_or_replace_parameters(url, {'cc': settings['cc'], 'l': settings['language']})
     
@@ -1,20 +1,161 @@
 import scrapy
 import os
 import re
+import html
 import json
+from itertools import zip_longest
 
-from bs4 import BeautifulSoup
-from scrapy_selenium import SeleniumRequest
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
+from itemadapter import ItemAdapter
 from scrapy import signals
+from twisted.internet import task
+
+from games_scraper.data_io import checkpoint_outputs, iter_records
+from games_scraper.extractors import (Field, FieldTable, MissingFieldError, attr, compile_css, parse_html,
+                                     parse_percent, parse_price, text)
+from games_scraper.id_index import id_index_from_settings
+from games_scraper.id_log import IdLogReader, IdLogWriter
+from games_scraper.items import GamesReducedItem
+from games_scraper.offload import offload
+from games_scraper.seen_ids import SeenIds
+from games_scraper.state_journal import StateJournal
+
+
+GAME_CARDS = compile_css(".salepreviewwidgets_SaleItemBrowserRow_y9MSd")
+EMPTY_RESULTS = compile_css(".saleitembrowser_EmptyResults_3_IxA")
+
+# Every field of a game card is under these elements. Selectors are relative to the card.
+CARD_BASE = "div:nth-child(1) > div:nth-child(1) > div:nth-child(1)"
+CARD_INFO = f"{CARD_BASE} > div:nth-child(2)"
+
+GAME_CARD_URL = FieldTable([
+    Field('url', f"{CARD_BASE} > div:nth-child(1) > a:nth-child(1)", attr("href"), required=True),
+], prefix="descendant::")
+
+GAME_CARD_FIELDS = FieldTable([
+    Field('img_src', f"{CARD_BASE} > div:nth-child(1) > a:nth-child(1) > div:nth-child(1) > div:nth-child(2) > img:nth-child(1)",
+          attr("src"), required=True),
+    Field('name', f"{CARD_INFO} > div:nth-child(2) > a:nth-child(1) > div:nth-child(1)", required=True),
+    Field('description', f"{CARD_INFO} > div:nth-child(4)", required=True),
+    Field('tags', f"{CARD_INFO} > div:nth-child(3) > div:nth-child(1) > a",
+          lambda els: [text(tag) for tag in els], many=True),
+    Field('date', f"{CARD_INFO} > div:nth-child(3) > div:nth-child(2) > div:nth-child(1)", required=True),
+    # Platforms are svg icons, identified by their class (see PLATFORM_ICONS)
+    Field('platforms', f"{CARD_INFO} > div:nth-child(3) > div:nth-child(2) > span:nth-child(2) > svg",
+          lambda els: [icon_class(el) for el in els], many=True),
+    Field('reviews_category', f"{CARD_INFO} > div:nth-child(3) > a:nth-child(3) > div:nth-child(1) > div:nth-child(1)"),
+    Field('reviews_number', f"{CARD_INFO} > div:nth-child(3) > a:nth-child(3) > div:nth-child(1) > div:nth-child(2)"),
+    # Price or, if the game is discounted, the discount ("-35%")
+    Field('price', f"{CARD_INFO} > div:nth-child(5) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1)"),
+    Field('discount_original_price', "div.salepreviewwidgets_Discounted_35-Ub:nth-child(2) > div:nth-child(2) > div:nth-child(1)"),
+    Field('discount_final_price', "div.salepreviewwidgets_Discounted_35-Ub:nth-child(2) > div:nth-child(2) > div:nth-child(2)"),
+], prefix="descendant::")
+
+# Capsule images of the listing rows and of the category page cards.
+LISTING_CAPSULE = "capsule_184x69"
+CARD_CAPSULE = "capsule_231x87"
+
+PLATFORM_ICONS = {
+    "SVGIcon_Button SVGIcon_WindowsLogo": "windows",
+    "SVGIcon_Button SVGIcon_AppleLogo": "mac",
+    "SVGIcon_Button SVGIcon_SteamLogo": "steam",
+    "SVGIcon_Button": "vr",
+    "": "linux",
+}
+
+
+def icon_class(el) -> str:
+    """Normalized class of a platform icon, None if it has no class attribute"""
+    cls = el.get("class")
+    return " ".join(cls.split()) if cls is not None else None
+
+
+def parse_reviews_number(value:str) -> int:
+    """Number of reviews from its text in a game card ("| 1.234 ...")"""
+    return int(value.split(" ")[1].replace(".", ""))
+
+
+# Numbers of a review summary tooltip, the percentage is followed by "%".
+TOOLTIP_NUMBER = re.compile(r"(\d[\d.,]*\d|\d)(\s*%)?")
+
+
+def parse_tooltip_reviews(value:str) -> int:
+    """Number of reviews from the text of a review summary tooltip ("El 92 % de las
+    1.234 reseñas..."), None if it has none"""
+    for match in TOOLTIP_NUMBER.finditer(value):
+        if match.group(2) is None:
+            return int(re.sub(r"\D", "", match.group(1)))
+    return None
+
+
+def app_id_from_url(url:str) -> int:
+    """Game ID of a store url (".../app/<id>/...")"""
+    return int(url.split("app/")[1].split("/")[0])
+
+
+def read_game_card(game, seen=None) -> dict:
+    """Raw fields of a game card (GAME_CARD_URL and GAME_CARD_FIELDS). The names of
+    the fields not found are listed in 'missing'.
+
+    Args:
+        game (HtmlElement): Game card.
+        seen (container, optional): Crawled ids. Only the url of their cards is read.
+
+    Raises:
+        MissingFieldError: If a required field is not found.
+    """
+    missing = []
+    card = GAME_CARD_URL.extract(game, missing.append)
+    if seen is not None and app_id_from_url(card['url']) in seen:
+        return {'url': card['url'], 'seen': True, 'missing': missing}
+    card.update(GAME_CARD_FIELDS.extract(game, missing.append))
+    card['missing'] = missing
+    return card
+
+
+def extract_listing(body:str, seen=None) -> dict:
+    """Game cards of a rendered category page. Module level so it can run in a
+    ParseOffload process.
+
+    Args:
+        body (str): Html of the page.
+        seen (container, optional): Crawled ids, see read_game_card.
+
+    Returns:
+        dict: As follows:
+            {
+                'empty': bool, # True if the page has the "no results" element
+                'cards': list, # read_game_card of every card, or {'error': str, 'missing': list}
+                               # for cards missing a required field.
+            }
+    """
+    root = parse_html(body)
+    cards = []
+    for game in GAME_CARDS(root):
+        try:
+            cards.append(read_game_card(game, seen))
+        except MissingFieldError as e:
+            cards.append({'error': str(e), 'missing': [e.field]})
+    return {'empty': bool(EMPTY_RESULTS(root)), 'cards': cards}
 
 
 class GamesReduced(scrapy.Spider):
     name="games_reduced"
     n_pages_per_cat = 4
+    # Pages of a category requested before the previous ones confirm that there are more games.
+    # Once a JSON listing tells the number of games of a category, up to
+    # CONCURRENT_REQUESTS_PER_DOMAIN of its pages are requested at once instead.
+    pages_ahead = 1
+    # Snapshot of the state, changes go to "<state_file>.journal" (see games_scraper.state_journal)
     state_file = "data/games_reduced_state.json"
-    ids_file = "data/games_ids.json"
+    # The state journal is flushed every journal_flush_items games or journal_flush_seconds seconds
+    journal_flush_items = 100
+    journal_flush_seconds = 5
+    # Crawled ids are stored (and the pages of their games marked as done) every
+    # checkpoint_seconds seconds, once the feeds and pipelines have written their items.
+    checkpoint_seconds = 30
+    # Found ids are appended here as they are found, one per line (see games_scraper.id_log)
+    ids_file = "data/games_ids.txt"
+    seen_file = "data/games_reduced_seen_ids.bin"
     state = {}
     use_test_dict = False
 
@@ -26,20 +167,66 @@ class GamesReduced(scrapy.Spider):
 
     download_images = False
 
+    # "json" gets listings from the store paged JSON endpoint (LINKS["category_listing"])
+    # with plain requests, and the description of every new game from its basic
+    # details (LINKS["app_details"]). It falls back to selenium for pages that
+    # can't be read that way. "selenium" renders every category page in the browser.
+    # Both yield the same items (see tests/test_listing_engines.py).
+    engine = "json"
+    engines = ("json", "selenium")
+    # LOCALES name of the JSON listings and details, their cc and l parameters.
+    locale = "es"
+
+    # Steam platform icons in listing rows, by class.
+    listing_platforms = {
+        "win": "windows",
+        "mac": "mac",
+        "linux": "linux",
+        "vr_supported": "vr",
+        "vr_required": "vr",
+        "steamplay": "steam",
+    }
+
     def __init__(self, *args, **Kwargs):
         super(GamesReduced, self).__init__(*args, **Kwargs)
         
-        # As selenium requests can't be serialized with pickle, our own state 
-        # management has been implemented. 
+        # Selenium requests can't be pickled for JOBDIR, the state is kept in
+        # our own journal instead: for each category the last requested page
+        # (-10 once its end is reached), the last page of the run (plan/<cat>)
+        # and the requested pages not parsed yet (pending/<cat>). A run that
+        # didn't finish is resumed from there by the next one.
+        self.journal_flush_items = int(self.journal_flush_items)
+        self.journal_flush_seconds = float(self.journal_flush_seconds)
+        self.checkpoint_seconds = float(self.checkpoint_seconds)
         if not os.path.isfile(self.state_file):
             self.logger.warning("No state file used, starting from scratch")
-        else:
-            with open(self.state_file) as state_file:
-                self.state = json.load(state_file)
-        
+        self.journal = StateJournal(
+            self.state_file,
+            flush_items=self.journal_flush_items,
+            flush_seconds=self.journal_flush_seconds,
+        )
+        if self.journal.replayed:
+            self.logger.info(f"Replayed {self.journal.replayed} changes of the state journal")
+        self.state = self.journal.state
+
+        # A game id is only stored as crawled once its item is written, a crash
+        # before yields the game again. Ids of yielded items and of the listed
+        # ones waiting for their details (id -> category),
+        # ids of the items scraped since the last checkpoint and journal changes
+        # waiting for the items of their category to be written
+        # ([waiting ids, change]), see checkpoint.
+        self.unsaved = {}
+        self.scraped = []
+        self.deferred = []
+        # Categories whose end has been found, not journaled yet.
+        self.finished = set()
+
         # Loading the rest of possible attributes.
         self.n_pages_per_cat = int(self.n_pages_per_cat)
+        if self.engine not in self.engines:
+            raise ValueError(f"Unknown engine {self.engine}, use one of {self.engines}")
         self.use_test_dict = eval(self.use_test_dict)
+        self.download_images = str(self.download_images) == "True"
         if self.use_test_dict:
             self.cat_dict = self.test_dict
         else:
@@ -49,63 +236,436 @@ class GamesReduced(scrapy.Spider):
         """Urls are generated from categories. To have categories url categories spider must have been
         executed first, creating an output file that mast be introduced as self.input_file"""
         cat_dict = self.cat_dict
+        # Changes are flushed while no games are coming too.
+        self.flusher = task.LoopingCall(self.journal.flush)
+        self.flusher.start(self.journal_flush_seconds, now=False)
+        self.checkpointer = task.LoopingCall(self.checkpoint)
+        self.checkpointer.start(self.checkpoint_seconds, now=False)
+
+        # Categories are crawled at once, round-robin. A category gets its next
+        # page when the previous one has games (see follow_category).
+        self.in_flight = {}
+        # Last page of the categories whose number of games is known.
+        self.last_page = {}
+        # Moving average of new games per page of each category, it is the
+        # priority of its requests. New categories start with the maximum.
+        self.new_games_rate = {}
+        categories = []
+        for cat in cat_dict:
+            last = self.state.get(cat, 0)
+            if last < 0:
+                self.logger.warning(f"Category {cat} limited reached, not crawling")
+                continue
+
+            pending = list(self.state.get(f"pending/{cat}", []))
+            plan = self.state.get(f"plan/{cat}")
+            if plan is None or (last >= plan and not pending):
+                plan = last + self.n_pages_per_cat
+                self.journal.set(f"plan/{cat}", plan)
+            else:
+                self.logger.info(f"Resuming category {cat}: {len(pending)} pending pages, up to page {plan}")
+
+            self.in_flight[cat] = len(pending)
+            for page in pending:
+                yield self.page_request(cat, page)
+            categories.append(cat)
+
+        for requests in zip_longest(*(self.follow_category(cat) for cat in categories)):
+            for request in requests:
+                if request is not None:
+                    yield request
+
+    def follow_category(self, cat:str):
+        """Requests the next pages of a category, up to pages_ahead pages in flight
+        (more if its last page is known) and the last page of the run.
+
+        Args:
+            cat (str): Category name.
+
+        Yields:
+            Request: See page_request.
+        """
+        pages_ahead = self.pages_ahead
+        plan = self.state.get(f"plan/{cat}", 0)
+        if cat in self.last_page:
+            pages_ahead = max(pages_ahead, self.settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN"))
+            plan = min(plan, self.last_page[cat])
+        while self.in_flight.get(cat, 0) < pages_ahead:
+            last = self.state.get(cat, 0)
+            if last < 0 or last >= plan or cat in self.finished:
+                return
+            self.journal.set(cat, last + 1)
+            self.journal.add(f"pending/{cat}", last + 1)
+            self.in_flight[cat] = self.in_flight.get(cat, 0) + 1
+            yield self.page_request(cat, last + 1)
+
+    def page_request(self, cat:str, page:int):
+        """Request of a category page with the spider engine. Categories yielding
+        more new games per page get higher priorities."""
+        url = self.go_to_page(self.cat_dict[cat], page)
+        priority = round(self.new_games_rate.get(cat, 12))
+        if self.engine == "json":
+            return self.listing_request(cat, url, page, priority)
+        return self.selenium_request(url, cat, page, priority)
+
+    def page_done(self, cat:str, page:int, new:int = 0, duplicates:int = 0):
+        """Records in the state journal that a category page has been parsed and
+        counts its games in the stats.
+
+        Args:
+            cat (str): Category name.
+            page (int): Page number, None for requests without it (those are not journaled).
+            new (int): Games yielded from the page.
+            duplicates (int): Games of the page already crawled.
+        """
+        if page is not None:
+            self.after_items(cat, lambda: self.journal.discard(f"pending/{cat}", page))
+            self.in_flight[cat] = self.in_flight.get(cat, 1) - 1
+        self.journal.tick(new)
+        self.new_games_rate[cat] = (self.new_games_rate.get(cat, new) + new) / 2
+        self.inc_stat(f"games_reduced/categories/{cat}/pages")
+        self.inc_stat(f"games_reduced/categories/{cat}/new_ids", new)
+        self.inc_stat(f"games_reduced/categories/{cat}/duplicate_ids", duplicates)
+
+    def category_end(self, cat:str, page:int = None, wasted:bool = False):
+        """Marks a category as finished, its pending pages are not requested again.
+
+        Args:
+            cat (str): Category name.
+            page (int, optional): Page that found the end.
+            wasted (bool): The page was past the end, it had no games.
+        """
+        if wasted:
+            self.inc_stat("games_reduced/wasted_requests")
+            self.inc_stat(f"games_reduced/categories/{cat}/wasted_requests")
+        if self.state.get(cat, 0) < 0 or cat in self.finished:
+            return
+        self.logger.warning(f"Category {cat} limited reached at page {page or self.state.get(cat, 'ERROR_PAGE')}")
+        self.finished.add(cat)
+
+        def end():
+            self.journal.set(cat, -10)
+            self.journal.delete(f"pending/{cat}")
+        self.after_items(cat, end)
+
+    def after_items(self, cat:str, change):
+        """Defers a change of the state journal until the items yielded so far
+        from a category are written (see checkpoint), so that a crash before
+        parses their pages again.
+
+        Args:
+            cat (str): Category name.
+            change (callable): Writes the change to the journal.
+        """
+        waiting = {id for id, id_cat in self.unsaved.items() if id_cat == cat}
+        self.deferred.append([waiting, change])
 
-        for cat, url in cat_dict.items():
-            count = 0
-            while count < self.n_pages_per_cat:
-                if(self.state.get(cat, 0)) < 0:
-                    self.logger.warning(f"Category {cat} limited reached, not crawling")
-                    break
-                self.state[cat] = self.state.get(cat, 0) + 1
-                url = self.go_to_page(url, self.state[cat])                
-                count +=1
-
-                # Sending a SeleniumRequest that scrolls 2600 px and waits until games have been charged (or 15 seconds)
-                yield SeleniumRequest(
-                    url=url, 
-                    callback=self.parse,
-                    script="scroll(0, 2600)",
-                    wait_time = 15,
-                    wait_until=EC.presence_of_element_located((By.CLASS_NAME, "salepreviewwidgets_SaleItemBrowserRow_y9MSd")),
-                )
-
-    def parse(self, response):
+    def found(self, item, cat:str):
+        """Tracks the id of an item, yielded or waiting for its details, until it is scraped.
+
+        Args:
+            item (GamesReducedItem): New game.
+            cat (str): Category of the page.
+
+        Returns:
+            GamesReducedItem: The item.
+        """
+        self.unsaved[item.id] = cat
+        return item
+
+    def item_scraped(self, item, spider):
+        """item_scraped (and item_dropped) handler, the id is stored on the next checkpoint.
+        Items failing in a pipeline keep their ids unsaved, they are crawled again next run."""
+        id = ItemAdapter(item).get('id')
+        if self.unsaved.pop(id, None) is not None:
+            self.scraped.append(id)
+
+    def checkpoint(self, pipelines:bool = True):
+        """Writes the items scraped so far (see games_scraper.data_io.checkpoint_outputs),
+        then stores their ids and applies the journal changes that were waiting
+        for them.
+
+        Args:
+            pipelines (bool): Checkpoint the pipelines too, False once they are closed.
+        """
+        if self.scraped or self.deferred:
+            checkpoint_outputs(self.crawler, self, pipelines)
+        for id in self.scraped:
+            self.seen.persist(id)
+            self.ids_log.write(id)
+        committed = set(self.scraped)
+        self.scraped = []
+
+        deferred = []
+        for waiting, change in self.deferred:
+            # The later changes of a category wait for the ids of the earlier ones
+            # too, they are applied in order.
+            waiting -= committed
+            if waiting:
+                deferred.append([waiting, change])
+            else:
+                change()
+        self.deferred = deferred
+        self.journal.flush()
+
+    def page_failed(self, failure):
+        """Errback of category pages. The page stays pending for the next run."""
+        request = failure.request
+        self.logger.warning(f"Category page {request.url} failed ({failure.value!r})")
+        self.inc_stat("games_reduced/failed_pages")
+        cat = request.meta["cat"]
+        if request.meta.get("page") is not None:
+            self.in_flight[cat] -= 1
+        yield from self.follow_category(cat)
+
+    def selenium_request(self, url:str, cat:str = None, page:int = None, priority:int = 0) -> scrapy.Request:
+        """Sending a SeleniumRequest that scrolls 2600 px and waits until games have been charged (or 15 seconds).
+        selenium is imported here, crawls that never need a browser don't load it."""
+        from scrapy_selenium import SeleniumRequest
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
+        return SeleniumRequest(
+            url=url, 
+            callback=self.parse,
+            errback=self.page_failed,
+            priority=priority,
+            script="scroll(0, 2600)",
+            wait_time = 15,
+            wait_until=EC.presence_of_element_located((By.CLASS_NAME, "salepreviewwidgets_SaleItemBrowserRow_y9MSd")),
+            meta={"cat": cat, "page": page},
+        )
+
+    def store_link(self, name:str, **fields) -> str:
+        """Url of LINKS[name] in the spider locale, with the other %FIELD%s
+        replaced by the given values (app_id=10 fills %APP_ID%)."""
+        locale = self.settings.getdict('LOCALES').get(self.locale)
+        if locale is None:
+            raise ValueError(f"Unknown locale {self.locale}, use one of {list(self.settings.getdict('LOCALES'))}")
+        fields = dict(cc=locale['cc'], language=locale['language'], **fields)
+        url = self.settings["LINKS"][name]
+        for field, value in fields.items():
+            url = url.replace(f"%{field.upper()}%", str(value))
+        return url
+
+    def listing_request(self, cat:str, url:str, page:int, priority:int = 0) -> scrapy.Request:
+        """Plain request to the JSON listing of a category page.
+
+        Args:
+            cat (str): Category name.
+            url (str): Category page url, used if we have to fall back to selenium.
+            page (int): Page to go (will be multiplied by 12 as it is the number of games per page)
+            priority (int): Request priority.
+
+        Returns:
+            scrapy.Request: Request whose response will be parsed by self.parse_listing
+        """
+        slug = url.split("?")[0].rstrip("/").split("/")[-1]
+        listing_url = self.store_link("category_listing", category=slug, start=page * 12, count=12)
+        return scrapy.Request(
+            url=listing_url,
+            callback=self.parse_listing,
+            errback=self.listing_failed,
+            priority=priority,
+            meta={"cat": cat, "page": page, "page_url": url, "start": page * 12},
+        )
+
+    def parse_listing(self, response):
+        """Parses a JSON listing response. Its "results_html" holds one row per game,
+        the description of each new game is requested (see details_request).
+        Whatever can't be read this way is requested again with selenium."""
+        try:
+            data = json.loads(response.text)
+        except ValueError:
+            data = {}
+
+        if not data.get("success") or "results_html" not in data:
+            self.logger.warning(f"Unexpected listing response from {response.url}, falling back to selenium")
+            yield self.selenium_request(response.meta["page_url"], response.meta["cat"], response.meta["page"],
+                                        response.request.priority)
+            return
+
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(data["results_html"], features="lxml")
+        rows = soup.select("a.tab_item")
+        cat, page = response.meta["cat"], response.meta["page"]
+        total = data.get("total_count")
+        if len(rows) == 0:
+            if total is not None and response.meta["start"] >= int(total):
+                self.category_end(cat, page, wasted=True)
+            else:
+                self.logger.warning(f"No games in listing {response.url}, falling back to selenium")
+                yield self.selenium_request(response.meta["page_url"], cat, page, response.request.priority)
+            return
+
+        items = 0
+        for row in rows:
+            res = self.parse_listing_row(row)
+            if res is not None:
+                items += 1
+                yield self.details_request(self.found(res, cat), response)
+        self.page_done(cat, page, items, len(rows) - items)
+        if total is not None:
+            self.last_page[cat] = (int(total) - 1) // 12
+        if total is not None and response.meta["start"] + len(rows) >= int(total):
+            # Last page, no need to find the end with one more request.
+            self.category_end(cat, page)
+        yield from self.follow_category(cat)
+
+    def details_request(self, item, listing) -> scrapy.Request:
+        """Request of the basic details of a listed game, its item is yielded
+        with the description once they arrive (see parse_details).
+
+        Args:
+            item (GamesReducedItem): Item of the listing row.
+            listing (Response): Listing response of the row.
+        """
+        return scrapy.Request(
+            url=self.store_link("app_details", app_id=item.id),
+            callback=self.parse_details,
+            errback=self.details_failed,
+            priority=listing.request.priority,
+            cb_kwargs={"item": item},
+            meta={"cat": listing.meta["cat"], "page_url": listing.meta["page_url"]},
+        )
+
+    def parse_details(self, response, item):
+        """Sets the description of a listed game from its basic details and yields its item."""
+        try:
+            details = json.loads(response.text).get(str(item.id)) or {}
+        except ValueError:
+            details = {}
+        if not details.get("success") or "short_description" not in details.get("data", {}):
+            self.logger.warning(f"Unexpected details response from {response.url}, falling back to selenium")
+            yield from self.describe_with_selenium(item, response.request)
+            return
+        if item.id in self.seen:
+            # Yielded meanwhile from a page rendered by selenium.
+            return
+        item.description = html.unescape(details["data"]["short_description"]).strip()
+        # Saving id in crawled ids, it is stored once its item is written (see checkpoint)
+        self.seen.add(item.id, persist=False)
+        yield item
+
+    def details_failed(self, failure):
+        """Errback of details requests, see describe_with_selenium."""
+        request = failure.request
+        self.logger.warning(f"Details request {request.url} failed ({failure.value!r}), falling back to selenium")
+        yield from self.describe_with_selenium(request.cb_kwargs["item"], request)
+
+    def describe_with_selenium(self, item, request):
+        """Requests the category page of a game without details with selenium, the
+        game is read from its card there. Until then its listing page is kept
+        pending, a crash before lists it again."""
+        if item.id not in self.seen:
+            self.unsaved.pop(item.id, None)
+        self.inc_stat("games_reduced/failed_details")
+        # Without page, the listing already counted it.
+        yield self.selenium_request(request.meta["page_url"], request.meta["cat"], None, request.priority)
+
+    def listing_failed(self, failure):
+        """Errback of listing requests, the page is requested with selenium instead."""
+        request = failure.request
+        self.logger.warning(f"Listing request {request.url} failed ({failure.value!r}), falling back to selenium")
+        yield self.selenium_request(request.meta["page_url"], request.meta["cat"], request.meta["page"],
+                                        request.priority)
+
+    async def parse(self, response):
         """Method used to parse response and obtain 12 games dict in each page"""
 
-        soup = BeautifulSoup(response.text, features="lxml")
+        # Known games are skipped before reading their fields. The store can't
+        # be sent to a ParseOffload process, there every card is read.
+        seen = self.seen if getattr(self, 'parse_offload', None) is None else None
+        listing = await offload(self, extract_listing, response.text, seen)
         
-        games = soup.find_all(class_="salepreviewwidgets_SaleItemBrowserRow_y9MSd")
-        if soup.select_one(".saleitembrowser_EmptyResults_3_IxA") and len(games) == 0:
+        games = listing['cards']
+        cat = response.meta.get("cat") or self.get_cat_from_url(response.url)
+        if listing['empty'] and len(games) == 0:
             # If this element is detected that means that we arrived to the end
-            cat = self.get_cat_from_url(response.url)
-            self.logger.warning(f"Category {cat} limited reached at page {self.state.get(cat, 'ERROR_PAGE')}")
-            self.state[cat] = -10
+            self.category_end(cat, response.meta.get("page"), wasted=True)
             return
 
-        for game in games:
-            res = self.parse_game(game)
-            yield(res)
+        items = 0
+        duplicates = 0
+        for card in games:
+            for field in card['missing']:
+                self.count_missing(field)
+            if 'error' in card:
+                self.logger.warning(f"Skipping game in {response.url}: {card['error']}")
+                continue
+            res = self.game_item(card)
+            if res is not None:
+                items += 1
+                yield self.found(res, cat)
+            else:
+                duplicates += 1
         
         if len(games) == 0:
-            yield({"NO GAMES": "YES! There is an error with JOBDIR and selenium requests"})
+            # Neither games nor the end of the category (a blank or blocked page).
+            self.logger.warning(f"No games nor end of category in {response.url}")
+            self.inc_stat("games_reduced/blank_pages")
+        self.page_done(cat, response.meta.get("page"), items, duplicates)
+        for request in self.follow_category(cat):
+            yield request
 
     @classmethod
     def from_crawler(cls, crawler, *args, **kwargs):
         """With this method we connect spider_closed signal to self.spider_closed method"""
         spider = super(GamesReduced, cls).from_crawler(crawler, *args, **kwargs)
+        spider.open_id_stores(id_index_from_settings(crawler.settings))
         crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(spider.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(spider.item_scraped, signal=signals.item_dropped)
         return spider   
 
+    def open_id_stores(self, index=None):
+        """Opens the crawled ids store and the ids log.
+
+        Args:
+            index (optional): Empty index of the crawled ids, see games_scraper.id_index.
+        """
+        # Crawled ids live in their own append-only store. Old state files kept
+        # them in state['ids'], those are moved to the store. Ids are written
+        # through on checkpoints, once their items are written.
+        self.seen = SeenIds(self.seen_file, ids=self.state.get('ids', []), write_through=True, index=index)
+        self.journal.delete('ids')
+
+        # games_full can follow the ids log while we are crawling. A new log
+        # starts with the ids crawled in previous runs.
+        new_log = not os.path.isfile(self.ids_file)
+        last_logged = IdLogReader.last_id(self.ids_file)
+        self.ids_log = IdLogWriter(self.ids_file)
+        if new_log:
+            for id in self.seen:
+                self.ids_log.write(id)
+        elif self.seen.last is not None and last_logged != self.seen.last and last_logged is not None:
+            # Killed between adding the ids of a checkpoint to the store and logging them.
+            ids = list(self.seen)
+            start = ids.index(last_logged) + 1 if last_logged in ids else len(ids) - 1
+            for id in ids[start:]:
+                self.ids_log.write(id)
+
     def spider_closed(self, spider):
         """This method will be called when spider_closed signal arrives.
-        In here we save state and all ids we have got"""
+        In here we compact the state journal and mark the ids log as done"""
+        stats = self.crawler.stats
+        for cat in self.cat_dict:
+            new = stats.get_value(f"games_reduced/categories/{cat}/new_ids", 0)
+            duplicates = stats.get_value(f"games_reduced/categories/{cat}/duplicate_ids", 0)
+            if new + duplicates:
+                stats.set_value(f"games_reduced/categories/{cat}/new_ids_ratio", round(new / (new + duplicates), 3))
+
         self.logger.info(f"Saving state in {self.state_file}")
-        with open(self.state_file, "w") as state_file:
-            json.dump(self.state, state_file)
+        if hasattr(self, 'flusher') and self.flusher.running:
+            self.flusher.stop()
+        if hasattr(self, 'checkpointer') and self.checkpointer.running:
+            self.checkpointer.stop()
+        self.checkpoint(pipelines=False)
+        self.journal.close()
 
-        self.logger.info(f"Saving ids in {self.ids_file}")
-        with open(self.ids_file, "w") as ids_file:
-            ids_file.write(str(self.state.get("ids", [])))
+        self.seen.close()
+        self.ids_log.close()
 
     @staticmethod
     def next_page(url:str) -> str:
@@ -156,11 +716,17 @@ class GamesReduced(scrapy.Spider):
         return None
             
     def load_cat_dict(self):
-        """Loads cat_dict from self.input_file (json file). This dict has an structure as follows:
-            {
-                'name': 'category_name', 
-                'url': 'url_pointing_to_category_base_page'
-            }
+        """Loads cat_dict from self.input_file (json file), the output of the categories spider.
+        It is a list of Category items:
+            [
+                {
+                    'name': 'category_name', 
+                    'url': 'url_pointing_to_category_base_page'
+                },
+                ...
+            ]
+            or the same records as JSON lines, see games_scraper.data_io.
+            Files of older versions, a list with one {name: url} dict, are also accepted.
             In case no self.input_file an error will be raised.
         """
         if not hasattr(self, 'input_file'):
@@ -169,138 +735,175 @@ class GamesReduced(scrapy.Spider):
         
         self.logger.info(f"Getting categories from {self.input_file}")
 
-        with open(self.input_file, "r") as input_file:
-            self.cat_dict = json.load(input_file)[0]
+        # Categories are streamed, the output can be a JSON array or JSON lines (and compressed).
+        self.cat_dict = {}
+        for category in iter_records(self.input_file):
+            if 'url' in category:
+                self.cat_dict[category['name']] = category['url']
+            else:
+                self.cat_dict.update(category)
     
     def parse_game(self, game):
         """Gets all the info from a game container in a category steam page. 
+        Fields not found are counted in the games_reduced/missing/<field> stats.
 
         Args:
-            game (WebElement): Element containing all game info.
+            game (HtmlElement): Element containing all game info.
 
         Returns:
-            dict: As follows:
-                {
-                    'id': int
-                    'name': str,
-                    'link': str,
-                    'img_link': str,
-                    'description': str,
-                    'categories': list,
-                    'reviews': tuple,
-                    'date': str,
-                    'plataforms': list,
-                }
+            GamesReducedItem: See game_item
+
+        Raises:
+            MissingFieldError: If url, image, name, description or date are not found.
         """
+        card = read_game_card(game)
+        for field in card['missing']:
+            self.count_missing(field)
+        return self.game_item(card)
 
-        base_selector = "div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > "
-        def clean_selector(sel):
-            return sel.replace(base_selector, "")        
+    def game_item(self, card:dict):
+        """Builds the item of a game from the fields read by read_game_card.
 
-        # Getting url and id. If id in crawled ids return.
-        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > a:nth-child(1)")
-        url = game.select_one(selector).attrs["href"]
-        id = int(url.split("app/")[1].split("/")[0])
-        if id in self.state.get('ids', []):
-            return
+        Args:
+            card (dict): Fields of the game card.
 
+        Returns:
+            GamesReducedItem: None if the game has already been crawled.
+        """
+        # Getting id. If id in crawled ids return.
+        url = card['url']
+        id = app_id_from_url(url)
+        if id in self.seen:
+            return
 
-        # Getting image url
-        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > a:nth-child(1) > div:nth-child(1) > div:nth-child(2) > img:nth-child(1)")
-        img_src = game.select_one(selector).attrs["src"]
         image_urls = []
         if self.download_images:
-            image_urls = [img_src]
-
-        # Getting name
-        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(2) > a:nth-child(1) > div:nth-child(1)")
-        name = game.select_one(selector).text
-        
-        # Getting description
-        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(4)")
-        description = game.select_one(selector).text
-        
-        # Getting tags
-        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > div:nth-child(1) > a")
-        tags = [tag.text for tag in game.select(selector)]
-        
-        # Getting date
-        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > div:nth-child(1)")
-        date = game.select_one(selector).text
-
-        # Getting platforms
-        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > div:nth-child(2) > span:nth-child(2) > svg")
-        plat_logos_class_dict = {
-                "SVGIcon_Button SVGIcon_WindowsLogo": "windows",
-                "SVGIcon_Button SVGIcon_AppleLogo": "mac",
-                "SVGIcon_Button SVGIcon_SteamLogo": "steam",
-                "SVGIcon_Button": "vr",
-                "": "linux",
-            }
+            image_urls = [card['img_src']]
 
-        
         platforms = []
-        for plat in game.select(selector):
-            icon_class = " ".join(plat.attrs["class"])
+        for icon_class in card['platforms'] or []:
+            if icon_class in PLATFORM_ICONS:
+                platforms.append(PLATFORM_ICONS[icon_class])
+            else:
+                self.count_missing('platform_icon')
+                self.logger.debug(f"No icon found in game {card['name']} with class {icon_class}")
+
+        rev_number = None
+        if card['reviews_number'] is not None:
             try:
-                platforms.append(
-                        plat_logos_class_dict[icon_class]
-                    )
-            except Exception as e:
-                print(e)
-                print(f"No icon found in game {name} with class {icon_class}")
-
-        # Getting reviews
-        rev_category = None
-        try:
-            selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > a:nth-child(3) > div:nth-child(1) > div:nth-child(1)")
-            rev_category = game.select_one(selector).text
-        except Exception as e:
-            self.logger.error(e)
-            self.logger.warning(f"rev_category not found for game {id}")
+                rev_number = parse_reviews_number(card['reviews_number'])
+            except (IndexError, ValueError):
+                self.count_missing('reviews_number')
 
-        rev_number = 0
-        try:
-            selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(3) > a:nth-child(3) > div:nth-child(1) > div:nth-child(2)")
-            rev_number = game.select_one(selector).text
-            rev_number = int(rev_number.split(" ")[1].replace(".", ""))
-        except Exception as e:
-            self.logger.error(e)
-            self.logger.warning(f"rev_number not found for game {id}")
-
-        # Getting prices
+        # Getting prices. If price is a discount ("-35%") prices are in the discount block.
+        price = card['price']
         offert = None
         offert_price = None
-
-        selector = clean_selector("div.salepreviewwidgets_SaleItemBrowserRow_y9MSd:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(5) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1)")
-        price = game.select_one(selector).text if game.select_one(selector) else None
-
         if price and "%" in price:
-            offert = price
-            selector = clean_selector("div.salepreviewwidgets_Discounted_35-Ub:nth-child(2) > div:nth-child(2) > div:nth-child(1)")
-            price = game.select_one(selector).text
-            selector = clean_selector("div.salepreviewwidgets_Discounted_35-Ub:nth-child(2) > div:nth-child(2) > div:nth-child(2)")
-            offert_price = game.select_one(selector).text
-        
+            offert = parse_percent(price)
+            price = card['discount_original_price']
+            offert_price = parse_price(card['discount_final_price'])
         
-        # Saving id in crawled ids
-        self.state['ids'] = self.state.get('ids', []) + [id]
-
-        return {
-            "id": id,
-            'image_urls': image_urls,
-            'name': name,
-            'url': url,
-            'img_src': img_src,
-            'description': description,
-            'tags': tags,
-            'reviews_category': rev_category,
-            'reviews_number': rev_number,
-            'date': date,
-            'platforms': platforms,
-            'price': price,
-            'offert': offert,
-            'offert_price':offert_price
-        }
+        # Saving id in crawled ids, it is stored once its item is written (see checkpoint)
+        self.seen.add(id, persist=False)
+
+        return GamesReducedItem(
+            id=id,
+            image_urls=image_urls,
+            name=card['name'],
+            url=url,
+            img_src=card['img_src'],
+            description=card['description'],
+            tags=card['tags'] or [],
+            reviews_category=card['reviews_category'],
+            reviews_number=rev_number,
+            date=card['date'],
+            platforms=platforms,
+            price=parse_price(price),
+            offert=offert,
+            offert_price=offert_price,
+        )
+
+    def count_missing(self, field:str):
+        """Counts a field not found in a game card in the crawler stats."""
+        self.inc_stat(f"games_reduced/missing/{field}")
+
+    def inc_stat(self, key:str, count:int = 1):
+        """Increments a value of the crawler stats (if the spider has a crawler)."""
+        if hasattr(self, 'crawler'):
+            self.crawler.stats.inc_value(key, count, spider=self)
+
+    def parse_listing_row(self, row):
+        """Gets the info of a game row in a JSON listing. The description is not
+        part of listing rows, it is set from the game details (see parse_details).
+
+        Args:
+            row (Tag): "a.tab_item" element of the listing html.
+
+        Returns:
+            GamesReducedItem: Same as parse_game without description, None if the
+                game has already been crawled or is being described.
+        """
+        url = row.attrs["href"]
+        id = int(row.attrs.get("data-ds-appid") or app_id_from_url(url))
+        if id in self.seen or id in self.unsaved:
+            return
+
+        img = row.select_one("img.tab_item_cap_img")
+        # Rows show the small capsule, cards (and parse_game) the 231x87 one.
+        img_src = img.attrs["src"].replace(LISTING_CAPSULE, CARD_CAPSULE) if img else None
+        image_urls = []
+        if self.download_images and img_src:
+            image_urls = [img_src]
+
+        name = row.select_one(".tab_item_name").text
+        tags = [tag.text.lstrip(", ") for tag in row.select(".tab_item_top_tags .top_tag")]
+
+        platforms = []
+        for plat in row.select(".tab_item_details span.platform_img"):
+            for icon_class in plat.attrs.get("class", []):
+                if icon_class in self.listing_platforms:
+                    platforms.append(self.listing_platforms[icon_class])
+
+        offert = None
+        offert_price = None
+        discount = row.select_one(".discount_pct")
+        final_price = row.select_one(".discount_final_price")
+        price = final_price.text if final_price else None
+        if discount and discount.text.strip():
+            offert = parse_percent(discount.text)
+            price = row.select_one(".discount_original_price").text
+            offert_price = parse_price(final_price.text)
+
+        released = row.select_one(".search_released")
+        date = released.text.strip() if released else None
+        if date is None:
+            self.count_missing('date')
+
+        # The review summary is in its tooltip: "<category><br><percent> % of the <number> reviews..."
+        reviews_category = None
+        rev_number = None
+        summary = row.select_one(".search_review_summary")
+        if summary is not None and summary.attrs.get("data-tooltip-html"):
+            reviews_category, _, reviews_text = summary.attrs["data-tooltip-html"].partition("<br>")
+            rev_number = parse_tooltip_reviews(reviews_text)
+            if rev_number is None:
+                self.count_missing('reviews_number')
+
+        return GamesReducedItem(
+            id=id,
+            image_urls=image_urls,
+            name=name,
+            url=url,
+            img_src=img_src,
+            tags=tags,
+            reviews_category=reviews_category,
+            reviews_number=rev_number,
+            date=date,
+            platforms=platforms,
+            price=parse_price(price),
+            offert=offert,
+            offert_price=offert_price,
+        )
 
    
\ No newline at end of file
@@ -0,0 +1,151 @@
+import json
+import os
+import time
+
+from games_scraper.data_io import read_json, write_json
+
+
+class StateJournal:
+    """Crawl state (a dict of JSON values) persisted as a snapshot plus an
+    append-only write-ahead journal.
+
+    Every change is appended to "<path>.journal" as a JSON line. The journal is
+    flushed every flush_items items (see tick) or flush_seconds seconds, so a
+    crash only loses the changes of the last interval. It is compacted into the
+    snapshot (path, a plain JSON dict written to a temporary file and renamed
+    over the old one) on open, on close and every compact_every records, so
+    replaying it at startup is bounded by compact_every lines.
+
+    Changes are idempotent (set a value, add or remove a member of a list), a
+    crash between renaming the snapshot and truncating the journal only
+    replays changes that are already in the snapshot. A partial last line
+    left by a crash is ignored.
+
+    Args:
+        path (str): Snapshot file. Old state files (a JSON dict) are snapshots.
+        flush_items (int): Items between flushes.
+        flush_seconds (float): Seconds between flushes.
+        compact_every (int): Journal records between compactions.
+        fsync (bool): Also fsync the journal on flush. Flushing is enough to
+            survive the process being killed, fsync survives the machine
+            crashing. Snapshots are always fsynced.
+    """
+
+    def __init__(self, path:str, flush_items:int = 100, flush_seconds:float = 5, compact_every:int = 10000,
+                 fsync:bool = False):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.flush_items = flush_items
+        self.flush_seconds = flush_seconds
+        self.compact_every = compact_every
+        self.fsync = fsync
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        self.state = {}
+        self.replayed = 0
+        if os.path.isfile(path):
+            self.state = read_json(path)
+        self.replay()
+
+        self._file = None
+        self.records = 0
+        self.items = 0
+        self.flushed_at = time.monotonic()
+        self.compact()
+
+    def replay(self):
+        """Applies the records of the journal to self.state."""
+        if not os.path.isfile(self.journal_path):
+            return
+        with open(self.journal_path, "rb") as journal:
+            for line in journal:
+                if not line.endswith(b"\n"):
+                    break
+                self.apply(json.loads(line))
+                self.replayed += 1
+
+    def apply(self, record:list):
+        op, key = record[0], record[1]
+        if op == "set":
+            self.state[key] = record[2]
+        elif op == "del":
+            self.state.pop(key, None)
+        elif op == "add":
+            members = self.state.setdefault(key, [])
+            if record[2] not in members:
+                members.append(record[2])
+        elif op == "discard":
+            members = self.state.get(key)
+            if members is not None and record[2] in members:
+                members.remove(record[2])
+                if not members:
+                    del self.state[key]
+        else:
+            raise ValueError(f"Unknown journal record {record}")
+
+    def write(self, *record):
+        self.apply(record)
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.records += 1
+        if self.records >= self.compact_every:
+            self.compact()
+        else:
+            self.flush_if_due()
+
+    def get(self, key:str, default=None):
+        return self.state.get(key, default)
+
+    def set(self, key:str, value):
+        self.write("set", key, value)
+
+    def delete(self, key:str):
+        if key in self.state:
+            self.write("del", key)
+
+    def add(self, key:str, member):
+        """Adds a member to the list in key."""
+        self.write("add", key, member)
+
+    def discard(self, key:str, member):
+        """Removes a member from the list in key, the key goes when it is empty."""
+        if member in self.state.get(key, ()):
+            self.write("discard", key, member)
+
+    def tick(self, items:int = 1):
+        """Counts processed items, flushing the journal when it is due."""
+        self.items += items
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if self.items >= self.flush_items or time.monotonic() - self.flushed_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records to the journal."""
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.items = 0
+        self.flushed_at = time.monotonic()
+
+    def compact(self):
+        """Writes the state as the new snapshot and empties the journal."""
+        if self._file is not None:
+            self._file.close()
+        write_json(self.path, self.state)
+        self._file = open(self.journal_path, "w")
+        self.records = 0
+        self.items = 0
+        self.flushed_at = time.monotonic()
+
+    def close(self):
+        """Compacts the journal and closes it."""
+        if self._file is not None:
+            self.compact()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,289 @@
+"""Work queue shared by the workers of a distributed games_full crawl.
+
+App IDs are partitioned into shards by jump consistent hashing. A worker leases
+a shard, crawls its IDs and acknowledges it. Leases expire if they are not
+renewed, so the shards of a dead worker are crawled again by another one.
+
+Usage (from the source folder):
+    python -m games_scraper.work_queue add data/work_queue.db data/games_ids.txt [--shards 64]
+    python -m games_scraper.work_queue status data/work_queue.db
+"""
+import argparse
+import os
+from abc import ABC, abstractmethod
+import socket
+import sqlite3
+import time
+
+
+def shard_of(app_id:int, shards:int) -> int:
+    """Jump consistent hash (Lamping & Veach) of an ID. Growing the number of
+    shards only moves IDs to the new shards.
+
+    Args:
+        app_id (int): Game ID.
+        shards (int): Number of shards.
+
+    Returns:
+        int: Shard in [0, shards).
+    """
+    key = app_id & 0xFFFFFFFFFFFFFFFF
+    b, j = -1, 0
+    while j < shards:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def default_worker_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease:
+    """A shard leased by a worker until expires_at (epoch seconds). version
+    changes when IDs are added to the shard."""
+
+    def __init__(self, shard:int, worker:str, expires_at:float, version:int = 0):
+        self.shard = shard
+        self.worker = worker
+        self.expires_at = expires_at
+        self.version = version
+
+    def __repr__(self):
+        return f"Lease(shard={self.shard}, worker={self.worker!r})"
+
+
+class WorkQueue(ABC):
+    """Interface of the work queue backends.
+
+    A backend must make lease() atomic between workers of different machines:
+    a pending shard is given to one worker only. SqliteWorkQueue does it with a
+    write transaction. A Redis backend would keep one set of IDs per shard, the
+    pending shards in a list and the leases in a sorted set scored by expiry
+    (moved atomically with a Lua script). A backend missing a method can't be
+    instantiated.
+    """
+
+    @abstractmethod
+    def add(self, ids) -> int:
+        """Adds IDs to their shards. Done shards that get new IDs are pending again.
+
+        Returns:
+            int: Number of IDs that were not in the queue.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def lease(self, worker:str, ttl:float) -> Lease:
+        """Leases a pending shard (expired leases are reclaimed first).
+
+        Returns:
+            Lease: None if no shard is pending.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def renew(self, lease:Lease, ttl:float) -> bool:
+        """Extends a lease.
+
+        Returns:
+            bool: False if the lease expired and was reclaimed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def ack(self, lease:Lease):
+        """Marks the shard of a lease as done. If IDs were added to it since it
+        was leased it is pending again instead."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def release(self, lease:Lease):
+        """Gives back an unfinished shard, so other workers can lease it."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def reclaim(self) -> int:
+        """Makes the shards of expired leases pending again.
+
+        Returns:
+            int: Number of reclaimed shards.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def ids(self, shard:int) -> list:
+        """IDs of a shard."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def status(self) -> dict:
+        """Number of shards by state (pending, leased, done)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteWorkQueue(WorkQueue):
+    """WorkQueue in a SQLite file, for workers sharing a filesystem (processes
+    of one machine or a network share with working locks).
+
+    Args:
+        path (str): Database file, created if it doesn't exist.
+        shards (int): Number of shards of a new queue. An existing queue keeps
+            the number it was created with.
+    """
+
+    def __init__(self, path:str, shards:int = 64):
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.path = path
+        # Transactions are handled explicitly, see transaction().
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.transaction():
+            self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS ids (app_id INTEGER PRIMARY KEY, shard INTEGER NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS ids_shard ON ids (shard)")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS shards ("
+                " shard INTEGER PRIMARY KEY,"
+                " state TEXT NOT NULL DEFAULT 'pending',"
+                " worker TEXT,"
+                " expires_at REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " version INTEGER NOT NULL DEFAULT 0)"
+            )
+            self.db.execute("INSERT OR IGNORE INTO meta VALUES ('shards', ?)", (shards,))
+        self.shards = self.db.execute("SELECT value FROM meta WHERE key = 'shards'").fetchone()[0]
+
+    def transaction(self):
+        return _Transaction(self.db)
+
+    def add(self, ids) -> int:
+        added = 0
+        with self.transaction():
+            for app_id in ids:
+                shard = shard_of(app_id, self.shards)
+                cursor = self.db.execute("INSERT OR IGNORE INTO ids VALUES (?, ?)", (app_id, shard))
+                if cursor.rowcount:
+                    added += 1
+                    self.db.execute(
+                        "INSERT INTO shards (shard) VALUES (?) "
+                        "ON CONFLICT (shard) DO UPDATE SET version = version + 1,"
+                        " state = CASE state WHEN 'done' THEN 'pending' ELSE state END",
+                        (shard,),
+                    )
+        return added
+
+    def lease(self, worker:str, ttl:float) -> Lease:
+        now = time.time()
+        with self.transaction():
+            self._reclaim(now)
+            row = self.db.execute(
+                "SELECT shard, version FROM shards WHERE state = 'pending' ORDER BY attempts, shard LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                "UPDATE shards SET state = 'leased', worker = ?, expires_at = ?, attempts = attempts + 1 WHERE shard = ?",
+                (worker, now + ttl, row[0]),
+            )
+        return Lease(row[0], worker, now + ttl, row[1])
+
+    def renew(self, lease:Lease, ttl:float) -> bool:
+        expires_at = time.time() + ttl
+        with self.transaction():
+            cursor = self.db.execute(
+                "UPDATE shards SET expires_at = ? WHERE shard = ? AND state = 'leased' AND worker = ?",
+                (expires_at, lease.shard, lease.worker),
+            )
+        if cursor.rowcount:
+            lease.expires_at = expires_at
+        return bool(cursor.rowcount)
+
+    def ack(self, lease:Lease):
+        with self.transaction():
+            self.db.execute(
+                "UPDATE shards SET state = CASE version WHEN ? THEN 'done' ELSE 'pending' END,"
+                " worker = NULL, expires_at = NULL WHERE shard = ? AND worker = ?",
+                (lease.version, lease.shard, lease.worker),
+            )
+
+    def release(self, lease:Lease):
+        with self.transaction():
+            self.db.execute(
+                "UPDATE shards SET state = 'pending', worker = NULL, expires_at = NULL WHERE shard = ? AND worker = ?",
+                (lease.shard, lease.worker),
+            )
+
+    def reclaim(self) -> int:
+        with self.transaction():
+            return self._reclaim(time.time())
+
+    def _reclaim(self, now:float) -> int:
+        return self.db.execute(
+            "UPDATE shards SET state = 'pending', worker = NULL, expires_at = NULL "
+            "WHERE state = 'leased' AND expires_at < ?",
+            (now,),
+        ).rowcount
+
+    def ids(self, shard:int) -> list:
+        return [row[0] for row in self.db.execute("SELECT app_id FROM ids WHERE shard = ? ORDER BY app_id", (shard,))]
+
+    def status(self) -> dict:
+        status = {'pending': 0, 'leased': 0, 'done': 0}
+        status.update(self.db.execute("SELECT state, COUNT(*) FROM shards GROUP BY state").fetchall())
+        return status
+
+    def close(self):
+        self.db.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, taking the write lock at the start so two
+    workers can't lease the same shard."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+def open_work_queue(uri:str, shards:int = 64) -> WorkQueue:
+    """Opens the queue backend of a URI. Only SQLite files ("sqlite:///path" or
+    just the path) are implemented."""
+    if uri.startswith("sqlite:///"):
+        uri = uri[len("sqlite:///"):]
+    elif "://" in uri:
+        raise ValueError(f"No work queue backend for {uri}")
+    return SqliteWorkQueue(uri, shards)
+
+
+if __name__ == "__main__":
+    from games_scraper.id_log import IdLogReader
+
+    parser = argparse.ArgumentParser(description="Work queue of the distributed games_full crawl")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Adds the IDs of an ids file (games_reduced output)")
+    add.add_argument("queue")
+    add.add_argument("ids_file")
+    add.add_argument("--shards", type=int, default=64, help="Shards of a new queue")
+    status = commands.add_parser("status", help="Shards by state")
+    status.add_argument("queue")
+    args = parser.parse_args()
+
+    work_queue = open_work_queue(args.queue, getattr(args, "shards", 64))
+    if args.command == "add":
+        added = work_queue.add(IdLogReader(args.ids_file).read_new())
+        print(f"{added} new IDs in {work_queue.shards} shards")
+    print(work_queue.status())
+    work_queue.close()
@@ -0,0 +1,199 @@
+"""BrowserPoolMiddleware against a local static server: requests fail at once
+when no browser can be started, workers are given back whatever their page
+raises (with fake drivers), and pages are rendered headless when geckodriver
+and Firefox are installed."""
+import asyncio
+import functools
+import os
+import shutil
+import threading
+import time
+import types
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import selenium
+from scrapy import Spider
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.test import get_crawler
+from scrapy_selenium import SeleniumRequest
+from selenium.common.exceptions import WebDriverException
+
+from games_scraper import middlewares, settings
+from games_scraper.middlewares import BrowserPoolMiddleware
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=FIXTURES))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def new_pool(driver_executable_path:str, **settings) -> tuple:
+    crawler = get_crawler(Spider, dict({
+        "SELENIUM_DRIVER_NAME": "firefox",
+        "SELENIUM_DRIVER_EXECUTABLE_PATH": driver_executable_path,
+        "SELENIUM_BROWSER_EXECUTABLE_PATH": None,
+        "BROWSER_POOL_SIZE": 2,
+        "BROWSER_POOL_PAGE_TIMEOUT": 30,
+    }, **settings))
+    spider = crawler._create_spider("browser_pool")
+    return BrowserPoolMiddleware.from_crawler(crawler), spider
+
+
+def wait_started(pool:BrowserPoolMiddleware, timeout:float = 60):
+    deadline = time.monotonic() + timeout
+    while pool.starting and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+class FakeDriver:
+    """Browser serving an empty page, get raises error if given."""
+
+    def __init__(self, error:Exception = None, **kwargs):
+        self.error = error
+        self.kwargs = kwargs
+        self.current_url = None
+        self.page_source = "<html><body></body></html>"
+        self.quitted = False
+
+    def set_page_load_timeout(self, timeout):
+        pass
+
+    def get(self, url):
+        if self.error is not None:
+            raise self.error
+        self.current_url = url
+
+    def execute_script(self, script):
+        pass
+
+    def quit(self):
+        self.quitted = True
+
+
+class FakeOptions:
+    def __init__(self):
+        self.arguments = []
+        self.preferences = {}
+        self.binary_location = None
+
+    def add_argument(self, argument):
+        self.arguments.append(argument)
+
+    def set_preference(self, name, value):
+        self.preferences[name] = value
+
+
+def fake_pool(new_driver, **settings) -> tuple:
+    pool, spider = new_pool("geckodriver", BROWSER_POOL_SIZE=1, **settings)
+    pool.new_driver = new_driver
+    pool.start()
+    wait_started(pool)
+    return pool, spider
+
+
+def fail_wait(driver):
+    raise ValueError("Not a WebDriverException")
+
+
+def test_settings_run_browsers_headless():
+    assert "-headless" in settings.SELENIUM_DRIVER_ARGUMENTS
+
+
+def test_requests_fail_at_once_without_browsers(server, tmp_path):
+    pool, spider = new_pool(str(tmp_path / "missing" / "geckodriver"))
+    pool.start()
+    try:
+        wait_started(pool)
+        assert not pool.alive
+
+        request = SeleniumRequest(url=f"{server}/category_action_0.html")
+        t0 = time.monotonic()
+        with pytest.raises(IgnoreRequest):
+            pool.render(request)
+        with pytest.raises(IgnoreRequest):
+            asyncio.run(pool.process_request(request, spider))
+        # Instead of page_timeout * pool_size (60 s) each.
+        assert time.monotonic() - t0 < 5
+        assert pool.stats.get_value("browser_pool/no_workers") == 1
+    finally:
+        pool.spider_closed(spider)
+
+
+def test_worker_is_released_after_any_error(server):
+    pool, spider = fake_pool(FakeDriver)
+    try:
+        worker = pool.workers[0]
+        with pytest.raises(ValueError):
+            pool.render(SeleniumRequest(url=f"{server}/category_action_0.html", wait_time=1, wait_until=fail_wait))
+        assert pool.idle.get_nowait() is worker
+        pool.idle.put(worker)
+
+        response, index, render_time = pool.render(SeleniumRequest(url=f"{server}/category_action_0.html"))
+        assert response.url == f"{server}/category_action_0.html"
+        assert pool.workers[0].pages == 1
+    finally:
+        pool.spider_closed(spider)
+
+
+def test_crashed_worker_is_replaced(server):
+    drivers = []
+
+    def new_driver():
+        # The first browser crashes, its replacement works.
+        drivers.append(FakeDriver(WebDriverException("crashed") if not drivers else None))
+        return drivers[-1]
+
+    pool, spider = fake_pool(new_driver)
+    try:
+        with pytest.raises(WebDriverException):
+            pool.render(SeleniumRequest(url=f"{server}/category_action_0.html"))
+        assert drivers[0].quitted
+        assert pool.idle.get_nowait().driver is drivers[1]
+    finally:
+        pool.spider_closed(spider)
+
+
+@pytest.mark.parametrize("version, service", [("3.141.0", False), ("4.10.0", True)])
+def test_drivers_of_each_selenium_version(monkeypatch, version, service):
+    module = types.SimpleNamespace(WebDriver=FakeDriver, Options=FakeOptions, Service=lambda **kwargs: kwargs)
+    monkeypatch.setattr(middlewares, "import_module", lambda name: module)
+    monkeypatch.setattr(selenium, "__version__", version)
+    pool, spider = new_pool("/usr/bin/geckodriver", SELENIUM_DRIVER_ARGUMENTS=["-headless"])
+
+    driver = pool.new_driver()
+    assert driver.kwargs["options"].arguments == ["-headless"]
+    if service:
+        assert driver.kwargs["service"] == {"executable_path": "/usr/bin/geckodriver"}
+    else:
+        assert driver.kwargs["executable_path"] == "/usr/bin/geckodriver"
+
+
+@pytest.mark.skipif(not (shutil.which("geckodriver") and shutil.which("firefox")),
+                    reason="geckodriver and Firefox are not installed")
+def test_renders_local_page(server):
+    pool, spider = new_pool(shutil.which("geckodriver"), SELENIUM_DRIVER_ARGUMENTS=["-headless"])
+    pool.start()
+    try:
+        wait_started(pool)
+        assert pool.alive
+
+        request = SeleniumRequest(url=f"{server}/category_action_0.html")
+        response, index, render_time = pool.render(request)
+        assert response.status == 200
+        assert b"salepreviewwidgets_SaleItemBrowserRow" in response.body
+        assert render_time < 30
+    finally:
+        pool.spider_closed(spider)
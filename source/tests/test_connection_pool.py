@@ -0,0 +1,57 @@
+"""PooledDownloadHandler counts the TLS sessions the server resumed, not the
+ones offered: a crawl of benchmarks.mock_store over TLS, which closes its
+connections every few requests."""
+import json
+import os
+import ssl
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.mock_store import MockStore, self_signed_cert
+
+SOURCE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = 60
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MockStore(app_padding_kb=5, certfile=self_signed_cert(str(tmp_path / "store.pem")),
+                      keepalive_requests=5).start()
+    yield store
+    store.stop()
+
+
+def crawl_pool_stats(store:MockStore, tmp_path) -> dict:
+    input_file = tmp_path / "ids.txt"
+    input_file.write_text("".join(f"{id}\n" for id in range(1000, 1000 + PAGES)))
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.connection_pool", "--child", store.url, str(input_file), "pooled", "4"],
+        capture_output=True, text=True, check=True, cwd=SOURCE,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result["items"] == PAGES
+    return result["pool"]
+
+
+def test_resumed_sessions_match_the_server(store, tmp_path):
+    pool = crawl_pool_stats(store, tmp_path)
+
+    assert store.resumed_sessions > 0
+    assert pool["tls_resumed"] == store.resumed_sessions
+    assert pool["tls_resumption_ratio"] == round(store.resumed_sessions / pool["tls_connections"], 4)
+
+
+def test_refused_sessions_are_not_resumed(store, tmp_path):
+    # No session tickets to resume.
+    context = store.socket.context
+    context.num_tickets = 0
+    context.options |= ssl.OP_NO_TICKET
+    pool = crawl_pool_stats(store, tmp_path)
+
+    assert store.resumed_sessions == 0
+    assert pool["tls_resumed"] == 0
+    # Sessions are still offered, the server does not take them.
+    assert pool["tls_resumptions_offered"] > 0
+    assert pool["tls_resumption_ratio"] == 0
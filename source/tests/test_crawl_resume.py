@@ -0,0 +1,78 @@
+"""A GamesReduced crawl of benchmarks.mock_store killed (SIGKILL) while it is
+exporting items and resumed: every game must be exported, crawled ids are only
+stored once their items are written."""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.mock_store import MockStore
+from benchmarks.state_resume import child, exported_ids, new_folder, results
+from games_scraper.id_log import IdLogReader
+
+CATEGORIES = {"category_0": (10000, 300), "category_1": (20000, 250)}
+
+
+@pytest.fixture
+def store():
+    store = MockStore(latency=0.05).start()
+    store.categories.update(CATEGORIES)
+    yield store
+    store.stop()
+
+
+def kill_when(process, condition, timeout:float = 60):
+    """Kills the crawl once condition() is true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert process.poll() is None, "The crawl ended before it could be killed"
+        assert time.monotonic() < deadline, "Timed out waiting to kill the crawl"
+        time.sleep(0.05)
+    process.send_signal(signal.SIGKILL)
+    process.wait()
+
+
+def logged_ids(folder:str) -> list:
+    return list(IdLogReader(os.path.join(folder, "ids.txt")).read_new())
+
+
+def test_killed_crawl_exports_every_game(store, tmp_path):
+    folder = new_folder(str(tmp_path), "crawl", store.categories)
+    # Categories are crawled from page 1 (offset 12).
+    expected = {id for start, total in CATEGORIES.values() for id in range(start + 12, start + total)}
+
+    # Killed twice, the second time before and after a checkpoint (1 s).
+    kill_when(child(store.url, folder, 100), lambda: len(exported_ids(folder)) >= 50)
+    exported = len(exported_ids(folder))
+    kill_when(child(store.url, folder, 100), lambda: len(exported_ids(folder)) >= exported + 200)
+    assert child(store.url, folder, 100).wait() == 0
+
+    items, ids, state = results(folder)
+    assert set(items) == expected
+    assert sorted(ids) == sorted(expected)
+    assert all(state[cat] == -10 for cat in CATEGORIES)
+    assert not any(key.startswith("pending/") for key in state)
+
+
+def test_stored_ids_have_exported_items(store, tmp_path):
+    folder = new_folder(str(tmp_path), "crawl", store.categories)
+    # Killed after a checkpoint, with items scraped since.
+    kill_when(child(store.url, folder, 100), lambda: logged_ids(folder) and
+              len(exported_ids(folder)) >= len(logged_ids(folder)) + 24)
+
+    ids = logged_ids(folder)
+    assert ids
+    assert set(ids) <= set(exported_ids(folder))
+
+
+def test_spider_does_not_import_the_pipelines():
+    # The pipelines import Pillow (image_store), loaded only when they are.
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, games_scraper.spiders.games_reduced; "
+                               "print('games_scraper.pipelines' in sys.modules, 'PIL' in sys.modules)"],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    assert loaded.split() == ["False", "False"]
@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+import pytest
+
+from games_scraper.game_db import GameDatabase, game_record
+from games_scraper.items import GamesFullItem, GamesReducedItem
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = GameDatabase(str(tmp_path / "games.db"))
+    yield db
+    db.close()
+
+
+def full_item(app_id=10, reviews=5000):
+    return GamesFullItem(app_id=app_id, name="Game", price=Decimal("19.99"), all_reviews_count=reviews,
+                         recent_reviews_count=40)
+
+
+def reduced_item(app_id=10, reviews_number=None):
+    return GamesReducedItem(id=app_id, name="Game", price=Decimal("19.99"), reviews_number=reviews_number)
+
+
+def stored_reviews(db, app_id=10):
+    return db.db.execute("SELECT reviews FROM games WHERE app_id = ?", (app_id,)).fetchone()[0]
+
+
+def test_reduced_row_without_reviews_keeps_full_count(db):
+    db.write([game_record(full_item(), observed_at=1)])
+    db.write([game_record(reduced_item(), observed_at=2)])
+
+    assert stored_reviews(db) == 5000
+    assert len(db.price_history(10)) == 1
+
+
+def test_alternating_full_and_reduced_rows_add_no_history(db):
+    for observed_at in range(1, 9):
+        item = full_item() if observed_at % 2 else reduced_item()
+        db.write([game_record(item, observed_at=observed_at)])
+
+    assert stored_reviews(db) == 5000
+    assert len(db.price_history(10)) == 1
+
+
+def test_reduced_row_with_reviews_is_tracked(db):
+    db.write([game_record(full_item(), observed_at=1)])
+    db.write([game_record(reduced_item(reviews_number=5100), observed_at=2)])
+
+    assert stored_reviews(db) == 5100
+    assert len(db.price_history(10)) == 2
+
+
+def test_reduced_record_leaves_out_missing_reviews():
+    assert 'reviews' not in game_record(reduced_item())['tracked']
+    assert game_record(reduced_item(reviews_number=0))['tracked']['reviews'] == 0
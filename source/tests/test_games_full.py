@@ -0,0 +1,87 @@
+"""GamesFull: an app is only stored as crawled once its item is written, so
+pages that fail to parse and items that fail are crawled again next run. In
+the multi-locale mode of incremental crawls, the regional pages of unchanged
+apps are not requested."""
+import asyncio
+
+import pytest
+from scrapy import signals
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from benchmarks import pages
+from games_scraper import settings
+from games_scraper.extractors import MissingFieldError
+from games_scraper.seen_ids import SeenIds
+from games_scraper.spiders.games_full import GamesFull
+
+APP_IDS = [1000, 1001]
+
+
+@pytest.fixture
+def new_spider(tmp_path):
+    input_file = tmp_path / "ids.txt"
+    input_file.write_text("".join(f"{id}\n" for id in APP_IDS))
+
+    def new_spider(locales:str = None, **kwargs) -> GamesFull:
+        crawler = get_crawler(GamesFull, dict({"LINKS": settings.LINKS, "LOCALES": settings.LOCALES}, **kwargs))
+        return GamesFull.from_crawler(crawler, input_file=str(input_file), seen_file=str(tmp_path / "seen.bin"),
+                                      locales=locales)
+    return new_spider
+
+
+def parse(spider:GamesFull, request, body:str) -> list:
+    response = HtmlResponse(request.url, body=body.encode("utf-8"), request=request)
+
+    async def results():
+        return [result async for result in request.callback(response)]
+    return asyncio.run(results())
+
+
+def scraped(spider:GamesFull, item):
+    spider.crawler.signals.send_catch_log(signals.item_scraped, item=item, response=None, spider=spider)
+
+
+def test_ids_are_stored_once_their_items_are_written(new_spider, tmp_path):
+    spider = new_spider()
+    requests = list(spider.start_requests())
+    assert [request.meta["app_id"] for request in requests] == APP_IDS
+
+    # The first page can't be read, the second one's item is not written yet.
+    with pytest.raises(MissingFieldError):
+        parse(spider, requests[0], "<html><body></body></html>")
+    item, = parse(spider, requests[1], pages.app_page(1001, padding_kb=1))
+    assert 1000 not in spider.seen and 1001 not in spider.seen
+
+    scraped(spider, item)
+    assert 1001 in spider.seen
+    assert list(SeenIds(str(tmp_path / "seen.bin"))) == []
+    spider.checkpoint()
+    assert list(SeenIds(str(tmp_path / "seen.bin"))) == [1001]
+    spider.spider_closed(spider)
+
+    # Only the failed one is requested again.
+    spider = new_spider()
+    assert [request.meta["app_id"] for request in spider.start_requests()] == [1000]
+    spider.spider_closed(spider)
+
+
+def test_unchanged_apps_skip_their_regional_pages(new_spider):
+    spider = new_spider(locales="es,us,gb", INCREMENTAL_ENABLED=True, INCREMENTAL_EMIT_UNCHANGED=True)
+    requests = list(spider.start_requests())
+    # Only the page of the first locale, the others wait for it.
+    assert [(request.meta["app_id"], request.meta["locale"]) for request in requests] == [(1000, "es"), (1001, "es")]
+
+    unchanged, changed = requests
+    unchanged.meta["page_unchanged"] = True
+    item, = parse(spider, unchanged, "")
+    assert item.unchanged and item.regional_prices == []
+    assert spider.crawler.stats.get_value("locales/skipped_region_pages") == 2
+
+    changed.meta["page_unchanged"] = False
+    regions = parse(spider, changed, pages.app_page(1001, padding_kb=1))
+    assert [request.meta["locale"] for request in regions] == ["us", "gb"]
+    assert parse(spider, regions[0], pages.localize_prices(pages.app_page(1001, padding_kb=1), "US")) == []
+    item, = parse(spider, regions[1], pages.localize_prices(pages.app_page(1001, padding_kb=1), "GB"))
+    assert [prices["locale"] for prices in item.regional_prices] == ["es", "us", "gb"]
+    spider.spider_closed(spider)
@@ -0,0 +1,97 @@
+"""IncrementalMiddleware: pages are stored once the item of their app is
+scraped, and compared without their per request tokens."""
+import pytest
+from scrapy import Spider, signals
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from benchmarks import pages
+from games_scraper.items import GamesFullItem
+from games_scraper.middlewares import IncrementalMiddleware
+
+APP_ID = 1000
+URL = f"https://store.steampowered.com/app/{APP_ID}"
+
+
+def app_page(session:str = "0a1b2c", nonce:str = "QWxh", server_time:int = 1700000000, price:str = "19,99€") -> bytes:
+    """App page with the tokens Steam changes on every request."""
+    page = pages.app_page(APP_ID, padding_kb=1, discounted=False).replace("19,99€", price)
+    tokens = (f'<script nonce="{nonce}">var g_sessionID = "{session}"; var g_ServerTime = {server_time};</script>'
+              f'<form><input type="hidden" name="sessionid" value="{session}"></form>')
+    return page.replace("</body>", tokens + "</body>").encode("utf-8")
+
+
+class Run:
+    """A crawl run with the middleware: open, download pages, close."""
+
+    def __init__(self, cache_file:str):
+        self.crawler = get_crawler(Spider, {"INCREMENTAL_ENABLED": True, "INCREMENTAL_CACHE_FILE": cache_file})
+        self.spider = self.crawler._create_spider("games_full")
+        self.middleware = IncrementalMiddleware.from_crawler(self.crawler)
+        self.middleware.spider_opened(self.spider)
+
+    def download(self, body:bytes) -> bool:
+        """Downloads the app page, returns meta['page_unchanged']."""
+        request = Request(URL, meta={"app_id": APP_ID})
+        self.middleware.process_request(request, self.spider)
+        response = HtmlResponse(URL, body=body, request=request)
+        self.middleware.process_response(request, response, self.spider)
+        return request.meta["page_unchanged"]
+
+    def scraped(self):
+        self.crawler.signals.send_catch_log(signals.item_scraped, item=GamesFullItem(app_id=APP_ID),
+                                            response=None, spider=self.spider)
+
+    def close(self):
+        self.middleware.spider_closed(self.spider)
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / "page_cache.db")
+
+
+def test_page_stored_once_its_item_is_scraped(cache_file):
+    run = Run(cache_file)
+    assert not run.download(app_page())
+    run.scraped()
+    run.close()
+
+    run = Run(cache_file)
+    assert run.download(app_page())
+    run.close()
+
+
+def test_page_without_item_is_parsed_again(cache_file):
+    # The parse failed (MissingFieldError, a crash...), no item was scraped.
+    run = Run(cache_file)
+    assert not run.download(app_page())
+    run.close()
+    assert run.crawler.stats.get_value("incremental/not_stored") == 1
+
+    run = Run(cache_file)
+    assert not run.download(app_page())
+    run.scraped()
+    run.close()
+
+
+def test_request_tokens_are_not_changes(cache_file):
+    run = Run(cache_file)
+    run.download(app_page())
+    run.scraped()
+    run.close()
+
+    run = Run(cache_file)
+    assert run.download(app_page(session="ffee99", nonce="b3RoZXI=", server_time=1700000999))
+    run.close()
+
+
+def test_content_changes_are_changes(cache_file):
+    run = Run(cache_file)
+    run.download(app_page())
+    run.scraped()
+    run.close()
+
+    run = Run(cache_file)
+    assert not run.download(app_page(session="ffee99", price="9,99€"))
+    run.close()
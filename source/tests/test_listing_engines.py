@@ -0,0 +1,148 @@
+"""Items of the two GamesReduced engines on the same category page, recorded
+from benchmarks.mock_store: the page rendered by the browser (engine=selenium,
+parse_game) and its JSON listing with the details of its games (engine=json,
+parse_listing and parse_details)."""
+import asyncio
+import os
+from urllib.parse import urlsplit
+
+import attr
+import pytest
+from scrapy.http import Request, TextResponse
+from scrapy.utils.test import get_crawler
+
+from benchmarks import pages
+from games_scraper import settings
+from games_scraper.extractors import parse_html
+from games_scraper.items import GamesReducedItem
+from games_scraper.seen_ids import SeenIds
+from games_scraper.spiders.games_reduced import GAME_CARDS, GamesReduced
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+PAGE_URL = "https://store.steampowered.com/category/action/"
+# Fields the JSON listing rows don't have in the same element as the cards.
+ROW_FIELDS = ('description', 'date', 'reviews_category', 'reviews_number')
+
+
+def fixture(name:str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as fixture_file:
+        return fixture_file.read()
+
+
+@pytest.fixture
+def new_spider(tmp_path):
+    def new_spider(**kwargs) -> GamesReduced:
+        spider = GamesReduced.from_crawler(
+            get_crawler(GamesReduced, {"LINKS": settings.LINKS, "LOCALES": settings.LOCALES}),
+            use_test_dict="True",
+            state_file=str(tmp_path / "state.json"),
+            seen_file=str(tmp_path / "seen.bin"),
+            ids_file=str(tmp_path / "ids.txt"),
+            **kwargs,
+        )
+        spider.seen = SeenIds()
+        # Crawl state start_requests sets up, parse_listing updates it.
+        spider.in_flight, spider.last_page, spider.new_games_rate = {}, {}, {}
+        return spider
+    return new_spider
+
+
+def selenium_items(spider) -> list:
+    body = fixture("category_action_0.html").decode("utf-8")
+    return [spider.parse_game(game) for game in GAME_CARDS(parse_html(body))]
+
+
+def details_response(request:Request, body:str = None) -> TextResponse:
+    app_id = request.cb_kwargs["item"].id
+    body = pages.app_details(app_id) if body is None else body
+    return TextResponse(request.url, body=body.encode("utf-8"), request=request, encoding="utf-8")
+
+
+def json_results(spider, details=details_response) -> list:
+    """Items and requests of the listing, the details requests answered by details."""
+    request = Request(PAGE_URL, meta={"cat": "action", "page": 0, "page_url": PAGE_URL, "start": 0})
+    response = TextResponse(request.url, body=fixture("listing_action_0.json"), request=request, encoding="utf-8")
+    results = []
+    for result in spider.parse_listing(response):
+        if isinstance(result, Request) and result.callback == spider.parse_details:
+            results.extend(spider.parse_details(details(result), **result.cb_kwargs))
+        else:
+            results.append(result)
+    return results
+
+
+def json_items(spider) -> list:
+    return [result for result in json_results(spider) if isinstance(result, GamesReducedItem)]
+
+
+def without_tracking(url:str) -> str:
+    """Store url without its query (snr, the referrer tag, differs between pages)."""
+    return urlsplit(url)._replace(query="").geturl()
+
+
+def fields(item:GamesReducedItem) -> dict:
+    fields = attr.asdict(item)
+    fields['url'] = without_tracking(fields['url'])
+    return fields
+
+
+def test_default_engine_is_json(new_spider):
+    assert new_spider().engine == "json"
+
+
+def test_listing_link_uses_the_crawl_locale(new_spider):
+    request = new_spider(locale="us").listing_request("action", PAGE_URL, 2)
+    assert "cc=US&l=english" in request.url
+    assert "start=24&count=12" in request.url and "category=action" in request.url
+
+
+def test_engines_yield_the_same_games(new_spider):
+    rendered = selenium_items(new_spider(engine="selenium"))
+    listed = json_items(new_spider())
+
+    assert len(rendered) == 12
+    assert [item.id for item in listed] == [item.id for item in rendered]
+
+
+def test_engines_match_every_field(new_spider):
+    rendered = selenium_items(new_spider(engine="selenium"))
+    listed = json_items(new_spider())
+
+    for rendered_item, listed_item in zip(rendered, listed):
+        assert type(listed_item) is type(rendered_item)
+        # url compared without the snr referrer tag, it differs between pages.
+        assert fields(listed_item) == fields(rendered_item)
+        assert all(getattr(listed_item, name) is not None for name in ROW_FIELDS)
+
+
+def test_failed_details_fall_back_to_selenium(new_spider):
+    spider = new_spider()
+    results = json_results(spider, lambda request: details_response(request, '{"%d": {"success": false}}'
+                                                                             % request.cb_kwargs["item"].id))
+
+    assert not [result for result in results if isinstance(result, GamesReducedItem)]
+    fallbacks = [result for result in results if isinstance(result, Request)]
+    assert {request.url for request in fallbacks} == {PAGE_URL}
+    assert all(request.meta["page"] is None for request in fallbacks)
+    # Not crawled, the selenium page yields them.
+    assert not spider.unsaved and len(spider.seen) == 0
+    assert spider.crawler.stats.get_value("games_reduced/failed_details") == 12
+
+
+def test_blank_page_keeps_the_category_going(new_spider):
+    spider = new_spider(engine="selenium", n_pages_per_cat=3)
+    spider.journal.set("plan/action", 3)
+    spider.journal.set("action", 1)
+    spider.cat_dict = {"action": PAGE_URL}
+    spider.in_flight["action"] = 1
+    request = Request(PAGE_URL, meta={"cat": "action", "page": 1})
+    response = TextResponse(request.url, body=b"<html><body></body></html>", request=request, encoding="utf-8")
+
+    async def parse():
+        return [result async for result in spider.parse(response)]
+    results = asyncio.run(parse())
+
+    # No stray item: the next page of the category is requested.
+    assert [result.meta["page"] for result in results] == [2]
+    assert spider.in_flight["action"] == 1
+    assert spider.crawler.stats.get_value("games_reduced/blank_pages") == 1
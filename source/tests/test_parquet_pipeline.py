@@ -0,0 +1,65 @@
+"""ParquetPipeline: files are only visible once complete, so a crash never
+leaves a file read_table can't read."""
+import os
+from decimal import Decimal
+
+import pyarrow.parquet as pq
+import pytest
+from scrapy.utils.test import get_crawler
+
+from games_scraper.items import GamesReducedItem
+from games_scraper.pipelines import ParquetPipeline
+from games_scraper.spiders.games_reduced import GamesReduced
+
+
+@pytest.fixture
+def spider(tmp_path):
+    return GamesReduced.from_crawler(
+        get_crawler(GamesReduced),
+        use_test_dict="True",
+        state_file=str(tmp_path / "state.json"),
+        seen_file=str(tmp_path / "seen.bin"),
+        ids_file=str(tmp_path / "ids.txt"),
+    )
+
+
+def new_pipeline(spider, folder, **kwargs) -> ParquetPipeline:
+    pipeline = ParquetPipeline(spider.crawler.stats, str(folder), **kwargs)
+    pipeline.open_spider(spider)
+    return pipeline
+
+
+def items(first:int, count:int) -> list:
+    return [GamesReducedItem(id=id, name=f"Game {id}", url=f"https://store.steampowered.com/app/{id}/",
+                             tags=["Action"], platforms=["windows"], price=Decimal("19.99"))
+            for id in range(first, first + count)]
+
+
+def read_ids(folder) -> list:
+    return sorted(pq.read_table(os.path.join(folder, "games_reduced")).column("id").to_pylist())
+
+
+def test_open_file_is_hidden_until_closed(spider, tmp_path):
+    pipeline = new_pipeline(spider, tmp_path / "parquet", row_group_size=10)
+    for item in items(1000, 25):
+        pipeline.process_item(item, spider)
+    pipeline.checkpoint(spider)
+    for item in items(2000, 15):
+        pipeline.process_item(item, spider)
+
+    # Killed here: a row group of the second file is written, without its footer.
+    assert read_ids(tmp_path / "parquet") == list(range(1000, 1025))
+
+    pipeline.close_spider(spider)
+    assert read_ids(tmp_path / "parquet") == list(range(1000, 1025)) + list(range(2000, 2015))
+    assert not [name for name in os.listdir(tmp_path / "parquet" / "games_reduced") if name.endswith(".tmp")]
+
+
+def test_files_roll_over_on_time(spider, tmp_path):
+    pipeline = new_pipeline(spider, tmp_path / "parquet", max_file_seconds=0)
+    for item in items(1000, 3):
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+
+    assert len(os.listdir(tmp_path / "parquet" / "games_reduced")) == 3
+    assert read_ids(tmp_path / "parquet") == [1000, 1001, 1002]
@@ -0,0 +1,91 @@
+"""AdaptiveThrottleMiddleware applies the host budgets to the download slots
+before requests are queued."""
+import time
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.core.engine import ExecutionEngine
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from games_scraper import settings
+from games_scraper.middlewares import AdaptiveThrottleMiddleware
+
+THROTTLE_SETTINGS = {
+    "THROTTLE_ENABLED": True,
+    "THROTTLE_START_DELAY": settings.THROTTLE_START_DELAY,
+    "THROTTLE_DEFAULT": settings.THROTTLE_DEFAULT,
+    "THROTTLE_HOSTS": settings.THROTTLE_HOSTS,
+    "DOWNLOAD_DELAY": 0,
+}
+STORE = "https://store.steampowered.com/app/10/"
+
+
+@pytest.fixture
+def crawler():
+    crawler = get_crawler(Spider, THROTTLE_SETTINGS)
+    crawler.spider = crawler._create_spider("throttle")
+    crawler.engine = ExecutionEngine(crawler, lambda _: None)
+    return crawler
+
+
+@pytest.fixture
+def middleware(crawler):
+    return AdaptiveThrottleMiddleware.from_crawler(crawler)
+
+
+def slots(crawler) -> dict:
+    return crawler.engine.downloader.slots
+
+
+def test_first_request_gets_the_budget(crawler, middleware):
+    middleware.process_request(Request(STORE), crawler.spider)
+
+    slot = slots(crawler)["store.steampowered.com"]
+    assert slot.delay == settings.THROTTLE_START_DELAY
+    assert slot.concurrency == 1
+
+
+def test_recreated_slot_keeps_the_throttle(crawler, middleware):
+    request = Request(STORE, meta={"download_latency": 0.1})
+    middleware.process_request(request, crawler.spider)
+    for _ in range(20):
+        middleware.process_response(request, Response(STORE, request=request), crawler.spider)
+    delay = slots(crawler)["store.steampowered.com"].delay
+    assert delay < settings.THROTTLE_START_DELAY
+
+    # The downloader drops slots idle for a minute.
+    del slots(crawler)["store.steampowered.com"]
+    middleware.process_request(Request(STORE), crawler.spider)
+    assert slots(crawler)["store.steampowered.com"].delay == delay
+
+
+def test_host_budget_bounds_the_slot(crawler, middleware):
+    request = Request(STORE, meta={"download_latency": 0.1})
+    middleware.process_request(request, crawler.spider)
+    for _ in range(500):
+        middleware.process_response(request, Response(STORE, request=request), crawler.spider)
+
+    slot = slots(crawler)["store.steampowered.com"]
+    assert slot.concurrency == settings.THROTTLE_HOSTS["store.steampowered.com"]["max_concurrency"]
+    assert slot.delay == settings.THROTTLE_HOSTS["store.steampowered.com"]["min_delay"]
+
+
+def test_backoff_pauses_the_host(crawler, middleware):
+    request = Request(STORE)
+    middleware.process_request(request, crawler.spider)
+    response = Response(STORE, status=429, headers={"Retry-After": "30"}, request=request)
+    middleware.process_response(request, response, crawler.spider)
+
+    slot = slots(crawler)["store.steampowered.com"]
+    assert slot.delay > settings.THROTTLE_START_DELAY
+    # The next request waits for Retry-After.
+    assert slot.lastseen + slot.delay >= time.time() + 29
+
+
+def test_autothrottle_falls_back_to_download_delay():
+    crawler = get_crawler(Spider, dict(THROTTLE_SETTINGS, AUTOTHROTTLE_ENABLED=True))
+    with pytest.raises(NotConfigured):
+        AdaptiveThrottleMiddleware.from_crawler(crawler)
+    assert settings.DOWNLOAD_DELAY > 0
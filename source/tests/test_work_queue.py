@@ -0,0 +1,165 @@
+"""Leases of the work queue (games_scraper.work_queue) and the distributed
+games_full workers crawling benchmarks.mock_store with it."""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from scrapy.utils.test import get_crawler
+
+from benchmarks.mock_store import MockStore
+from games_scraper import settings
+from games_scraper.id_log import IdLogReader
+from games_scraper.seen_ids import SeenIds
+from games_scraper.spiders.games_full import GamesFull
+from games_scraper.work_queue import SqliteWorkQueue, WorkQueue, shard_of
+
+SOURCE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def queue_file(tmp_path):
+    return str(tmp_path / "queue.db")
+
+
+def test_incomplete_backend_is_not_instantiated():
+    class LeaseOnlyQueue(WorkQueue):
+        def lease(self, worker:str, ttl:float):
+            return None
+
+    with pytest.raises(TypeError):
+        LeaseOnlyQueue()
+
+
+def test_expired_lease_is_leased_again(queue_file):
+    queue = SqliteWorkQueue(queue_file, shards=1)
+    queue.add(range(1000, 1100))
+    first = queue.lease("worker_0", ttl=0.2)
+    assert queue.lease("worker_1", ttl=60) is None
+
+    # worker_0 died, its lease is not renewed.
+    time.sleep(0.3)
+    second = queue.lease("worker_1", ttl=60)
+    assert second.shard == first.shard
+    assert not queue.renew(first, ttl=60)
+    # A late ack of the dead worker doesn't finish the shard of the new one.
+    queue.ack(first)
+    assert queue.status() == {"pending": 0, "leased": 1, "done": 0}
+    queue.ack(second)
+    assert queue.status() == {"pending": 0, "leased": 0, "done": 1}
+    queue.close()
+
+
+def test_renewed_lease_is_kept(queue_file):
+    queue = SqliteWorkQueue(queue_file, shards=1)
+    queue.add(range(1000, 1100))
+    lease = queue.lease("worker_0", ttl=0.2)
+    for _ in range(3):
+        time.sleep(0.1)
+        assert queue.renew(lease, ttl=0.2)
+    assert queue.reclaim() == 0
+    assert queue.lease("worker_1", ttl=60) is None
+    queue.close()
+
+
+def test_ids_added_to_leased_shard_keep_it_pending(queue_file):
+    queue = SqliteWorkQueue(queue_file, shards=1)
+    queue.add(range(1000, 1100))
+    lease = queue.lease("worker_0", ttl=60)
+    queue.add([2000])
+    queue.ack(lease)
+    assert queue.status()["pending"] == 1
+    assert 2000 in queue.ids(queue.lease("worker_0", ttl=60).shard)
+    queue.close()
+
+
+def test_shards_are_leased_once(queue_file):
+    SqliteWorkQueue(queue_file, shards=32).add(range(1000, 5000))
+    leased = {f"worker_{i}": [] for i in range(4)}
+
+    def work(worker:str):
+        queue = SqliteWorkQueue(queue_file)
+        while True:
+            lease = queue.lease(worker, ttl=60)
+            if lease is None:
+                break
+            leased[worker].append(lease.shard)
+        queue.close()
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in leased]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    shards = [shard for worker_shards in leased.values() for shard in worker_shards]
+    assert sorted(shards) == list(range(32))
+
+
+def test_crawled_shards_are_acked_at_once(tmp_path, queue_file):
+    ids = list(range(1000, 1040))
+    queue = SqliteWorkQueue(queue_file, shards=2)
+    queue.add(ids)
+    queue.close()
+    # Every id of shard 0, the first leased, was crawled in a previous run.
+    crawled = [id for id in ids if shard_of(id, 2) == 0]
+    SeenIds(str(tmp_path / "seen.bin"), ids=crawled).close()
+
+    spider = GamesFull.from_crawler(get_crawler(GamesFull, {"LINKS": settings.LINKS}), queue=queue_file,
+                                    worker="worker_0", seen_file=str(tmp_path / "seen.bin"))
+    try:
+        requests = list(spider.start_requests())
+        assert sorted(request.meta["app_id"] for request in requests) == sorted(set(ids) - set(crawled))
+        assert spider.lease.shard == 1
+        assert spider.work_queue.status() == {"pending": 0, "leased": 1, "done": 1}
+
+        # Every request of shard 1 done, nothing left: the spider can close.
+        spider.next_shard()
+        assert spider.lease is None
+        assert spider.work_queue.status() == {"pending": 0, "leased": 0, "done": 2}
+        assert spider.crawler.stats.get_value("work_queue/acked_shards") == 2
+    finally:
+        spider.spider_closed(spider)
+
+
+def worker(store:MockStore, queue_file:str, name:str, scraped_file:str, lease_ttl:float) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.distributed", "--child", store.url, queue_file, name, scraped_file,
+         str(lease_ttl), "2"],
+        cwd=SOURCE, stderr=subprocess.DEVNULL,
+    )
+
+
+def test_shards_of_killed_worker_are_crawled(tmp_path, queue_file):
+    store = MockStore(app_padding_kb=5, latency=0.2).start()
+    ids = list(range(1000, 1120))
+    queue = SqliteWorkQueue(queue_file, shards=6)
+    queue.add(ids)
+    try:
+        scraped_files = [str(tmp_path / f"scraped_{i}.txt") for i in range(3)]
+        # A shard (about 20 pages, 2 at a time) takes longer than a lease, they must be renewed.
+        workers = [worker(store, queue_file, f"worker_{i}", scraped_files[i], lease_ttl=1.5) for i in range(3)]
+
+        deadline = time.monotonic() + 60
+        while len(list(IdLogReader(scraped_files[0]).read_new())) < 5:
+            assert time.monotonic() < deadline, "worker_0 scraped nothing"
+            time.sleep(0.05)
+        workers[0].send_signal(signal.SIGKILL)
+        for process in workers:
+            process.wait(timeout=120)
+    finally:
+        store.stop()
+
+    scraped = [list(IdLogReader(scraped_file).read_new()) for scraped_file in scraped_files]
+    assert set(ids) == {id for worker_ids in scraped for id in worker_ids}
+    # The living workers never crawled an id twice. Only ids of the shard the
+    # killed worker was crawling are crawled again.
+    survivors = scraped[1] + scraped[2]
+    assert len(survivors) == len(set(survivors))
+    repeated = set(scraped[0]) & set(survivors)
+    assert len({shard_of(id, 6) for id in repeated}) <= 1
+    assert queue.status() == {"pending": 0, "leased": 0, "done": 6}
+    queue.close()